@@ -0,0 +1,66 @@
+# Python/benchmarks/bench_autoscale.py
+"""
+Auto-scale substitutions: fit + predict time and score of each catalog model
+against the scalable equivalent scalable_model swaps in, over growing row
+counts, and the crossover row count where the substitute becomes faster.
+
+Run from the Python/ directory:
+    python -m benchmarks.bench_autoscale --rows 1000 2000 5000 10000 20000 --features 50
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.datasets import make_classification
+from ml.models import MODEL_CATALOG, ModelFactory
+from ml.evaluation import classification_metrics
+
+# (requested, substitute) pairs: the two scalable_model makes, and approximate_knn, which it doesn't
+PAIRS = [("svm", "nystroem_svm"), ("gradient_boosting", "hist_gradient_boosting"), ("knn", "approximate_knn")]
+
+def time_model(model_type, X_train, y_train, X_test, y_test):
+    model = ModelFactory(MODEL_CATALOG["classification"]).create(model_type)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    y_pred = model.predict(X_test)
+    predict_seconds = time.perf_counter() - started
+    return fit_seconds, predict_seconds, classification_metrics(y_test, y_pred)["accuracy"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 2000, 5000, 10000, 20000])
+    parser.add_argument("--features", type=int, default=50)
+    parser.add_argument("--test-rows", type=int, default=5000)
+    parser.add_argument("--max-seconds", type=float, default=120, help="Stop timing a model once one size takes longer")
+    args = parser.parse_args()
+
+    X, y = make_classification(max(args.rows) + args.test_rows, args.features, n_informative=args.features // 2,
+                               n_classes=3, random_state=0)
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    X_test, y_test = X[-args.test_rows:], y[-args.test_rows:]
+    print(f"{args.features} features, {args.test_rows:,} predicted rows; seconds are fit + predict")
+
+    for requested, substitute in PAIRS:
+        print(f"\n{requested} -> {substitute}")
+        print(f"{'rows':>8} {requested + ' s':>18} {substitute + ' s':>26} {'accuracy':>19}")
+        crossover = None
+        skipped = set()
+        for rows in args.rows:
+            timings = {}
+            for model_type in (requested, substitute):
+                if model_type in skipped:
+                    continue
+                fit_seconds, predict_seconds, accuracy = time_model(model_type, X[:rows], y[:rows], X_test, y_test)
+                timings[model_type] = (fit_seconds + predict_seconds, accuracy)
+                if fit_seconds + predict_seconds > args.max_seconds:
+                    skipped.add(model_type)
+            original = timings.get(requested, (float("nan"), float("nan")))
+            scaled = timings.get(substitute, (float("nan"), float("nan")))
+            print(f"{rows:>8,} {original[0]:>18.3f} {scaled[0]:>26.3f} {original[1]:>9.3f} / {scaled[1]:.3f}")
+            if crossover is None and (requested in skipped or scaled[0] < original[0]):
+                crossover = rows
+        print(f"crossover: {f'{crossover:,} rows' if crossover else 'not reached'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Python/benchmarks/bench_output_assembly.py
+"""
+Memory of preprocess_data output with a string target: np.hstack into one
+object array (previous assembly) vs a typed float block plus the target column.
+
+The layout itself is checked by tests/test_output_assembly.py.
+
+Run from the Python/ directory:
+    python -m benchmarks.bench_output_assembly --rows 200000 --cols 40
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from ml.preprocess import preprocess_data
+
+def legacy_assembly(transformed_data, target_data, feature_names, target_column):
+    """The np.hstack assembly preprocess_data used before."""
+    stacked = np.hstack((transformed_data, target_data.reshape(-1, 1)))
+    return pd.DataFrame(stacked, columns=feature_names + [target_column])
+
+def make_frame(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.normal(size=rows) for i in range(cols)}
+    data["city"] = rng.choice(["north", "south", "east", "west"], rows).astype(object)
+    data["label"] = rng.choice(["cat", "dog", "bird"], rows).astype(object)
+    return pd.DataFrame(data)
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cols", type=int, default=40)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    processed = preprocess_data(df, target_column="label")
+    features = processed.drop(columns=["label"])
+    typed_mb = frame_mb(processed)
+
+    legacy = legacy_assembly(features.to_numpy(), processed["label"].to_numpy(), features.columns.tolist(), "label")
+    legacy_mb = frame_mb(legacy)
+    print(f"{args.rows:,} rows x {features.shape[1]} features, string target")
+    print(f"typed:  {typed_mb:.1f} MB ({features.dtypes.unique().tolist()} + {processed['label'].dtype})")
+    print(f"legacy: {legacy_mb:.1f} MB (object) -> {legacy_mb / typed_mb:.1f}x larger")
+
+if __name__ == "__main__":
+    main()
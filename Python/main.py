@@ -1,15 +1,42 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse, FileResponse
+import time
+_import_started = time.perf_counter()  # Before the heavy imports below, so startup time includes them
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 import os
-from ml.preprocess import preprocess_data, save_preprocessed_data, suggest_missing_strategy
-from ml.models import train_model, save_model
-from ml.utils import get_dataset_insights
+import json
+import asyncio
+from ml.ingest import save_upload, CSV_CHUNK_ROWS
+from ml.registry import dataset_registry
+from ml.pipelines import run_batch, run_upload, run_preprocess, run_train, run_update, shutdown_pool
+from ml.jobs import training_jobs, QueueFullError
+from ml.evaluation import CV_FOLDS
+from ml.leaderboard import LEADERBOARD_BUDGET
+from ml.search import SEARCH_CANDIDATES, SEARCH_BUDGET, SEARCH_MAX_FITS
+from ml.autoscale import AUTO_SCALE
+from ml.utils import dataset_analyzer
+from ml.serving import pipeline_cache, pipeline_path, parse_rows
+from ml.preprocess import preprocessed_file
+from ml.preprocess_cache import preprocess_cache
+from ml.reduction import embedding_path, embedding_shape, iter_embedding, EMBEDDING_FORMATS
+from ml.downloads import negotiate_format, negotiate_compression, convert_preprocessed, iter_file, MEDIA_TYPES, COMPRESSIONS
 from dotenv import load_dotenv
 
 load_dotenv()
-app = FastAPI()
+
+startup_seconds = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global startup_seconds
+    startup_seconds = time.perf_counter() - _import_started
+    print(f"Startup took {startup_seconds:.3f}s")
+    yield
+    shutdown_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,101 +46,256 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/health")
+async def health():
+    return {"status": "ok", "startup_seconds": startup_seconds}
+
 @app.post("/upload")
-async def upload_file(files: list[UploadFile] = File(...)):
+async def upload_file(
+    files: list[UploadFile] = File(...),
+    approximate: bool = Form(False),  # Sketch-based profiling for very large files
+    relative_error: float = Form(0.01)
+):
     try:
-        results = {}
+        jobs = {}
         os.makedirs("uploads", exist_ok=True)
         for file in files:
             file_location = f"uploads/{file.filename}"
-            with open(file_location, "wb") as f:
-                f.write(await file.read())
-            
-            df = pd.read_csv(file_location)
-            summary = {
-                "columns": list(df.columns),
-                "rows": len(df),
-                "data_types": df.dtypes.astype(str).to_dict(),
-                "missing_values": df.isnull().sum().to_dict(),
-                "unique_values": {col: df[col].nunique() for col in df.columns},  # Added unique value counts
-                "stats": {
-                    col: df[col].describe().to_dict() 
-                    for col in df.select_dtypes(include=['float64', 'int64']).columns  # Descriptive stats for numeric columns
-                }
-            }
-            insights_data = get_dataset_insights(summary, df)
-            suggested_missing_strategy = suggest_missing_strategy(df)
-            print(f"File: {file.filename}, Suggested missing strategy: {suggested_missing_strategy}")
-            print(f"File: {file.filename}, Suggested task type: {insights_data['suggested_task_type']}")
-            print(f"File: {file.filename}, Suggested target column: {insights_data['suggested_target_column']}")
-            results[file.filename] = {
-                "summary": summary,
+            _, dataset_id = await save_upload(file, file_location)
+            jobs[file.filename] = (run_upload, (file.filename, file_location, dataset_id, approximate, relative_error))
+        results = await run_batch(jobs, "Upload failed")
+        # Workers only do manual analysis; one Gemini call covers every uploaded file
+        summaries = {name: result["summary"] for name, result in results.items() if "summary" in result}
+        api_insights = await asyncio.to_thread(dataset_analyzer.get_batch_insights, summaries)
+        for name, insights_data in api_insights.items():
+            results[name].update({
                 "insights": insights_data["insights"],
                 "suggested_task_type": insights_data["suggested_task_type"],
                 "suggested_target_column": insights_data["suggested_target_column"],
-                "suggested_missing_strategy": suggested_missing_strategy
-            }
+            })
+        for name, result in results.items():
+            if "summary" in result:
+                print(f"File: {name}, Suggested task type: {result['suggested_task_type']}")
+                print(f"File: {name}, Suggested target column: {result['suggested_target_column']}")
         return JSONResponse(content=results)
     except Exception as e:
         print(f"Error in /upload endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Upload failed: {str(e)}"}, status_code=500)
 
+def collect_preprocessed(preprocess_ids):
+    """
+    Resolve /preprocess result ids to the datasets they were built from.
+
+    Returns:
+        dict: filename -> (None, dataset_id, preprocess_id)
+    """
+    datasets = {}
+    for preprocess_id in preprocess_ids or []:
+        try:
+            entry = preprocess_cache.entry(preprocess_id)
+        except KeyError:
+            raise ValueError(f"Unknown preprocess_id '{preprocess_id}'")
+        datasets[entry["filename"]] = (None, entry["dataset_id"], preprocess_id)
+    return datasets
+
+async def collect_datasets(files, dataset_ids):
+    """
+    Save uploaded files and resolve registered dataset ids.
+
+    Returns:
+        dict: filename -> (file_location, dataset_id), file_location is None for registry-only datasets
+    """
+    datasets = {}
+    for file in files or []:
+        file_location = f"uploads/{file.filename}"
+        _, content_id = await save_upload(file, file_location)
+        datasets[file.filename] = (file_location, content_id)
+    for content_id in dataset_ids or []:
+        if content_id not in dataset_registry:
+            raise ValueError(f"Unknown dataset_id '{content_id}'")
+        datasets[dataset_registry.filename(content_id)] = (None, content_id)
+    return datasets
+
 @app.post("/preprocess")
 async def preprocess_endpoint(
-    files: list[UploadFile] = File(...),
+    files: list[UploadFile] = File(None),
+    dataset_id: list[str] = Form(None),
     missing_strategy: str = Form(...),
     scaling: bool = Form(...),
     encoding: str = Form(...),
-    target_column: str = Form(None)  # Optional target column
+    target_column: str = Form(None),  # Optional target column
+    smoothing: float = Form(0.0),  # Prior strength for K-Fold target encoding
+    sparse: bool = Form(False),  # Keep one-hot output sparse (saved as .npz)
+    min_frequency: float = Form(None),  # Rarer levels share one one-hot column
+    max_categories: int = Form(None),
+    chunked: bool = Form(False),  # Two streaming passes for files larger than memory
+    chunk_rows: int = Form(CSV_CHUNK_ROWS),
+    output_format: str = Form("csv")  # csv, parquet, feather or npy (sparse results are always npz)
 ):
     try:
-        results = {}
         os.makedirs("uploads", exist_ok=True)
-        for file in files:
-            file_location = f"uploads/{file.filename}"
-            with open(file_location, "wb") as f:
-                f.write(await file.read())
-            
-            df = pd.read_csv(file_location)
-            # Validate encoding and target_column compatibility
-            if encoding in ["target", "kfold"] and (not target_column or target_column not in df.columns):
-                raise ValueError(f"Target column '{target_column}' is required and must exist in the dataset for {encoding} encoding")
-            
-            df_processed = preprocess_data(df, missing_strategy=missing_strategy, scaling=scaling, encoding=encoding, target_column=target_column)
-            preprocessed_file = save_preprocessed_data(df_processed, filename=f"preprocessed_{file.filename}")
-            results[file.filename] = {"preprocessed_file": preprocessed_file}
+        if missing_strategy.lstrip().startswith("{"):
+            missing_strategy = json.loads(missing_strategy)  # Per-column strategies, e.g. {"age": "median", "city": "mode"}
+        datasets = await collect_datasets(files, dataset_id)
+        jobs = {
+            filename: (run_preprocess, (filename, file_location, content_id, missing_strategy, scaling, encoding, target_column, smoothing, sparse, min_frequency, max_categories, chunked, chunk_rows, output_format))
+            for filename, (file_location, content_id) in datasets.items()
+        }
+        results = await run_batch(jobs, "Preprocessing failed")
         return JSONResponse(content=results)
     except Exception as e:
         print(f"Error in /preprocess endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Preprocessing failed: {str(e)}"}, status_code=500)
 
+@app.get("/preprocess/cache")
+async def preprocess_cache_stats():
+    return JSONResponse(content=preprocess_cache.stats())
+
 @app.post("/train")
 async def train_model_endpoint(
-    files: list[UploadFile] = File(...),
+    files: list[UploadFile] = File(None),
+    dataset_id: list[str] = Form(None),
     target_column: str = Form(None),
     task_type: str = Form(...),
-    model_type: str = Form(None)
+    model_type: str = Form(None),
+    sparse: bool = Form(False),  # Keep one-hot features sparse through training
+    preprocess_id: list[str] = Form(None),  # Train on /preprocess results instead of default preprocessing
+    evaluation: str = Form("both"),  # holdout, cv or both
+    cv_folds: int = Form(CV_FOLDS),
+    leaderboard: bool = Form(False),  # Train every candidate at once and keep the best
+    candidates: list[str] = Form(None),  # Leaderboard subset of model types (default: all)
+    time_budget: float = Form(LEADERBOARD_BUDGET),  # Leaderboard wall-clock seconds
+    params: str = Form(None),  # JSON object of model parameters; with search, parameter -> list of values to try
+    search: bool = Form(False),  # Successive-halving hyperparameter search before the final fit
+    search_budget: float = Form(SEARCH_BUDGET),  # Search wall-clock seconds
+    max_fits: int = Form(SEARCH_MAX_FITS),
+    n_candidates: int = Form(SEARCH_CANDIDATES),
+    auto_scale: bool = Form(AUTO_SCALE)  # Swap models that don't scale to the data for scalable equivalents (default: AUTO_SCALE env, off)
 ):
     try:
-        results = {}
         os.makedirs("uploads", exist_ok=True)
-        for file in files:
-            file_location = f"uploads/{file.filename}"
-            with open(file_location, "wb") as f:
-                f.write(await file.read())
-            
-            df = pd.read_csv(file_location)
-            df_processed = preprocess_data(df)  # Default preprocessing
-            result = train_model(df_processed, target_column, task_type, model_type)
-            if "model" in result:
-                save_model(result["model"], file_path=f"uploads/trained_model_{file.filename.split('.')[0]}.pkl")
-                del result["model"]
-            results[file.filename] = result
+        try:
+            model_params = json.loads(params) if params else None
+        except json.JSONDecodeError as e:
+            return JSONResponse(content={"error": f"params is not valid JSON: {str(e)}"}, status_code=400)
+        if model_params is not None and not isinstance(model_params, dict):
+            return JSONResponse(content={"error": "params must be a JSON object"}, status_code=400)
+        datasets = {filename: (*dataset, None) for filename, dataset in (await collect_datasets(files, dataset_id)).items()}
+        datasets.update(collect_preprocessed(preprocess_id))
+        jobs = {
+            filename: (run_train, (filename, file_location, content_id, target_column, task_type, model_type, sparse, cached_id, evaluation, cv_folds,
+                                   leaderboard, candidates, time_budget, model_params, search, search_budget, max_fits, n_candidates,
+                                   auto_scale))
+            for filename, (file_location, content_id, cached_id) in datasets.items()
+        }
+        results = await run_batch(jobs, "Training failed")
         return JSONResponse(content=results)
     except Exception as e:
         print(f"Error in /train endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Training failed: {str(e)}"}, status_code=500)
 
+@app.post("/train/update")
+async def update_model_endpoint(
+    filename: str = Form(...),  # The dataset the model was trained on
+    files: list[UploadFile] = File(None),
+    dataset_id: list[str] = Form(None),
+    new_estimators: int = Form(None),  # Trees added to warm-started ensembles (default: in proportion to the new rows)
+    compare_retrain: bool = Form(False)  # Also time a full retrain on the original rows plus the new ones
+):
+    try:
+        os.makedirs("uploads", exist_ok=True)
+        datasets = await collect_datasets(files, dataset_id)
+        if len(datasets) != 1:
+            return JSONResponse(content={"error": "Provide exactly one dataset of new rows"}, status_code=400)
+        [(new_filename, (file_location, content_id))] = datasets.items()
+        jobs = {filename: (run_update, (filename, new_filename, file_location, content_id, new_estimators, compare_retrain))}
+        results = await run_batch(jobs, "Update failed")
+        return JSONResponse(content=results)
+    except Exception as e:
+        print(f"Error in /train/update endpoint: {str(e)}")
+        return JSONResponse(content={"error": f"Update failed: {str(e)}"}, status_code=500)
+
+@app.post("/train/jobs")
+async def submit_training_jobs(
+    files: list[UploadFile] = File(None),
+    dataset_id: list[str] = Form(None),
+    target_column: str = Form(None),
+    task_type: str = Form(...),
+    model_type: str = Form(None),
+    sparse: bool = Form(False),  # Keep one-hot features sparse through training
+    preprocess_id: list[str] = Form(None),  # Train on /preprocess results instead of default preprocessing
+    evaluation: str = Form("both"),  # holdout, cv or both
+    cv_folds: int = Form(CV_FOLDS)
+):
+    try:
+        os.makedirs("uploads", exist_ok=True)
+        datasets = {filename: (*dataset, None) for filename, dataset in (await collect_datasets(files, dataset_id)).items()}
+        datasets.update(collect_preprocessed(preprocess_id))
+        results = {}
+        for filename, (file_location, content_id, cached_id) in datasets.items():
+            try:
+                job_id = training_jobs.submit(filename, file_location, content_id, target_column, task_type, model_type, sparse, cached_id,
+                                              evaluation, cv_folds)
+                results[filename] = {"job_id": job_id}
+            except QueueFullError as e:
+                results[filename] = {"error": str(e)}
+        status_code = 429 if all("error" in r for r in results.values()) and results else 202
+        return JSONResponse(content=results, status_code=status_code)
+    except Exception as e:
+        print(f"Error in /train/jobs endpoint: {str(e)}")
+        return JSONResponse(content={"error": f"Job submission failed: {str(e)}"}, status_code=500)
+
+@app.get("/train/jobs/{job_id}")
+async def training_job_status(job_id: str):
+    try:
+        return JSONResponse(content=training_jobs.get(job_id).to_dict())
+    except KeyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
+
+@app.get("/train/jobs/{job_id}/result")
+async def training_job_result(job_id: str):
+    try:
+        job = training_jobs.get(job_id)
+    except KeyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
+    if job.status == "completed":
+        return JSONResponse(content=job.result)
+    if job.status in ("failed", "cancelled"):
+        return JSONResponse(content={"status": job.status, "error": job.error}, status_code=410)
+    return JSONResponse(content={"status": job.status, "stage": job.stage}, status_code=409)
+
+@app.delete("/train/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    try:
+        return JSONResponse(content=training_jobs.cancel(job_id).to_dict())
+    except KeyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
+
+@app.post("/predict/{filename}")
+async def predict(filename: str, request: Request):
+    """Score raw rows with the pipeline trained on `filename`; body is CSV or JSON records."""
+    try:
+        started = time.perf_counter()
+        try:
+            # A cache miss unpickles the pipeline; keep that (and parsing the body) off the event loop
+            pipeline, cache_hit = await asyncio.to_thread(pipeline_cache.get, pipeline_path(filename))
+        except FileNotFoundError:
+            return JSONResponse(content={"error": "Trained pipeline not found"}, status_code=404)
+        body = await request.body()
+        df = await asyncio.to_thread(parse_rows, body, request.headers.get("content-type", ""))
+        result = await asyncio.to_thread(pipeline.predict, df)
+        result.update({
+            "rows": len(df),
+            "cache_hit": cache_hit,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+        return JSONResponse(content=result)
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Prediction failed: {str(e)}"}, status_code=400)
+    except Exception as e:
+        print(f"Error in /predict endpoint: {str(e)}")
+        return JSONResponse(content={"error": f"Prediction failed: {str(e)}"}, status_code=500)
+
 @app.get("/download-model/{filename}")
 async def download_model(filename: str):
     try:
@@ -125,13 +307,65 @@ async def download_model(filename: str):
         print(f"Error in /download-model endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Download failed: {str(e)}"}, status_code=500)
 
+@app.get("/embedding/{filename}")
+async def download_embedding(filename: str, offset: int = 0, limit: int = None, format: str = "ndjson"):
+    """
+    Page through the embedding from a dimensionality_reduction /train run,
+    streamed in batches as NDJSON rows or raw little-endian float32 ("binary").
+    X-Total-Rows, X-Columns and X-Next-Offset describe the page.
+    """
+    try:
+        file_path = embedding_path(filename)
+        if not os.path.exists(file_path):
+            return JSONResponse(content={"error": "Embedding not found"}, status_code=404)
+        if format not in EMBEDDING_FORMATS:
+            return JSONResponse(content={"error": f"Unknown format '{format}'; expected one of {list(EMBEDDING_FORMATS)}"}, status_code=400)
+        if offset < 0 or (limit is not None and limit < 0):
+            return JSONResponse(content={"error": "offset and limit must not be negative"}, status_code=400)
+        rows, columns = embedding_shape(file_path)
+        stop = rows if limit is None else min(rows, offset + limit)
+        headers = {"X-Total-Rows": str(rows), "X-Columns": str(columns)}
+        if stop < rows:
+            headers["X-Next-Offset"] = str(stop)
+        return StreamingResponse(iter_embedding(file_path, offset, limit, format), media_type=EMBEDDING_FORMATS[format], headers=headers)
+    except Exception as e:
+        print(f"Error in /embedding endpoint: {str(e)}")
+        return JSONResponse(content={"error": f"Download failed: {str(e)}"}, status_code=500)
+
 @app.get("/download-preprocessed/{filename}")
-async def download_preprocessed(filename: str):
+async def download_preprocessed(filename: str, request: Request, format: str = None, compression: str = None):
+    """
+    Serve a preprocessing result. `format` (or the Accept header) converts it
+    to csv/parquet/feather/npy; `compression` (or Accept-Encoding) gzips or
+    zstd-compresses it while streaming.
+    """
     try:
-        preprocessed_file = f"uploads/preprocessed_{filename}"
-        if os.path.exists(preprocessed_file):
-            return FileResponse(preprocessed_file, filename=f"preprocessed_{filename}")
-        return JSONResponse(content={"error": "Preprocessed file not found"}, status_code=404)
+        stored_file = preprocessed_file(filename)
+        if stored_file is None:
+            return JSONResponse(content={"error": "Preprocessed file not found"}, status_code=404)
+        try:
+            output_format = negotiate_format(format, request.headers.get("accept"))
+            codec, as_content_encoding = negotiate_compression(compression, request.headers.get("accept-encoding"))
+            stored_format = os.path.splitext(stored_file)[1].lstrip(".")
+            if output_format in (None, stored_format):
+                output_format, file_path, temporary = stored_format, stored_file, False
+            else:
+                file_path, temporary = await asyncio.to_thread(convert_preprocessed, stored_file, output_format), True
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+
+        download_name = f"{os.path.splitext(os.path.basename(stored_file))[0]}.{output_format}"
+        if codec is None and not temporary:
+            return FileResponse(file_path, filename=download_name, media_type=MEDIA_TYPES[output_format])
+        media_type = MEDIA_TYPES[output_format]
+        headers = {}
+        if codec and as_content_encoding:
+            headers["Content-Encoding"] = codec
+        elif codec:
+            extension, media_type = COMPRESSIONS[codec]
+            download_name += extension
+        headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+        return StreamingResponse(iter_file(file_path, codec, remove=temporary), media_type=media_type, headers=headers)
     except Exception as e:
         print(f"Error in /download-preprocessed endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Download failed: {str(e)}"}, status_code=500)
\ No newline at end of file
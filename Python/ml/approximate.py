@@ -0,0 +1,112 @@
+# Python/ml/approximate.py
+from abc import ABCMeta, abstractmethod
+import numpy as np
+from scipy import sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+from sklearn.utils import check_array
+
+class _NystroemSVM(BaseEstimator, metaclass=ABCMeta):
+    """
+    RBF-kernel SVM approximated by a linear SVM on `n_components` Nystroem
+    features: fit time is linear in rows instead of the kernel SVM's
+    quadratic-to-cubic growth. C and gamma mean what they do for SVC/SVR.
+    """
+
+    def __init__(self, C=1.0, gamma="scale", n_components=300, random_state=42):
+        self.C = C
+        self.gamma = gamma
+        self.n_components = n_components
+        self.random_state = random_state
+
+    @abstractmethod
+    def _linear_model(self, n_rows):
+        """The unfitted linear estimator trained on the Nystroem features of `n_rows` rows."""
+
+    def fit(self, X, y):
+        from sklearn.kernel_approximation import Nystroem
+
+        X = check_array(X, accept_sparse="csr")
+        gamma = self.gamma
+        if gamma == "scale":
+            # As SVC: 1 / (n_features * X.var())
+            variance = X.multiply(X).mean() - X.mean() ** 2 if sp.issparse(X) else X.var()
+            gamma = 1.0 / (X.shape[1] * variance) if variance > 0 else 1.0
+        self.features_ = Nystroem(gamma=gamma, n_components=min(self.n_components, X.shape[0]), random_state=self.random_state)
+        self.linear_ = self._linear_model(X.shape[0]).fit(self.features_.fit_transform(X), y)
+        if hasattr(self.linear_, "classes_"):
+            self.classes_ = self.linear_.classes_
+        return self
+
+    def predict(self, X):
+        return self.linear_.predict(self.features_.transform(check_array(X, accept_sparse="csr")))
+
+class NystroemSVMClassifier(ClassifierMixin, _NystroemSVM):
+    def _linear_model(self, n_rows):
+        from sklearn.linear_model import SGDClassifier
+        # SGD's alpha is the SVM's 1 / (C * n); the modified Huber loss keeps predict_proba
+        return SGDClassifier(loss="modified_huber", alpha=1.0 / (self.C * n_rows), random_state=self.random_state)
+
+    def predict_proba(self, X):
+        return self.linear_.predict_proba(self.features_.transform(check_array(X, accept_sparse="csr")))
+
+    def partial_fit(self, X, y):
+        """Further SGD passes over new rows in the fitted Nystroem feature space."""
+        self.linear_.partial_fit(self.features_.transform(check_array(X, accept_sparse="csr")), y)
+        return self
+
+class NystroemSVMRegressor(RegressorMixin, _NystroemSVM):
+    def __init__(self, C=1.0, gamma="scale", epsilon=0.1, n_components=300, random_state=42):
+        super().__init__(C=C, gamma=gamma, n_components=n_components, random_state=random_state)
+        self.epsilon = epsilon
+
+    def _linear_model(self, n_rows):
+        from sklearn.svm import LinearSVR
+        return LinearSVR(C=self.C, epsilon=self.epsilon, dual="auto", max_iter=5000, random_state=self.random_state)
+
+class _ProjectedKNeighbors(BaseEstimator):
+    """
+    Approximate nearest neighbors: rows are projected onto the fewest
+    randomized-SVD directions (at most `max_components`) that keep `variance`
+    of the total variance, and queried from a KD-tree there, instead of a
+    brute-force scan over every training row in the full feature space.
+
+    Not substituted automatically: brute-force search stayed faster through
+    100k rows in benchmarks/bench_autoscale.py, so this is opt-in by name.
+    """
+
+    _knn_class = None
+
+    def __init__(self, n_neighbors=5, weights="uniform", variance=0.9, max_components=32, random_state=42):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.variance = variance
+        self.max_components = max_components
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        from sklearn import neighbors
+        from sklearn.decomposition import TruncatedSVD
+
+        # Uncentered SVD keeps sparse input sparse; distances don't depend on centering
+        projection = TruncatedSVD(n_components=max(1, min(self.max_components, X.shape[1] - 1)), random_state=self.random_state)
+        Z = projection.fit_transform(X)
+        keep = int(np.searchsorted(np.cumsum(projection.explained_variance_ratio_), self.variance)) + 1
+        projection.components_ = projection.components_[:keep]
+        self.projection_ = projection
+        self.knn_ = getattr(neighbors, self._knn_class)(n_neighbors=self.n_neighbors, weights=self.weights, algorithm="kd_tree")
+        self.knn_.fit(np.ascontiguousarray(Z[:, :keep]), y)
+        if hasattr(self.knn_, "classes_"):
+            self.classes_ = self.knn_.classes_
+        return self
+
+    def predict(self, X):
+        return self.knn_.predict(self.projection_.transform(X))
+
+class ProjectedKNeighborsClassifier(ClassifierMixin, _ProjectedKNeighbors):
+    _knn_class = "KNeighborsClassifier"
+
+    def predict_proba(self, X):
+        return self.knn_.predict_proba(self.projection_.transform(X))
+
+class ProjectedKNeighborsRegressor(RegressorMixin, _ProjectedKNeighbors):
+    _knn_class = "KNeighborsRegressor"
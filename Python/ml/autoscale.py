@@ -0,0 +1,77 @@
+# Python/ml/autoscale.py
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Substitute scalable models for ones that don't scale to the design matrix (see scalable_model).
+# Off by default: a substitute trades some accuracy for fit time, so it's opted into per request or here
+AUTO_SCALE = os.getenv("AUTO_SCALE", "0") == "1"
+# Row counts above which each substitution is made (see benchmarks/bench_autoscale.py). Both substitutes
+# are faster from ~1k rows; nystroem_svm gives up some accuracy, so kernel SVMs are kept until their fit
+# passes ~30s, while hist_gradient_boosting matched or beat gradient_boosting's accuracy at every size.
+SVM_MAX_ROWS = int(os.getenv("AUTO_SCALE_SVM_ROWS", 10_000))
+GRADIENT_BOOSTING_MAX_ROWS = int(os.getenv("AUTO_SCALE_GRADIENT_BOOSTING_ROWS", 2000))
+# Largest dense copy made of sparse features for a model that needs dense input
+DENSIFY_MAX_BYTES = int(os.getenv("AUTO_SCALE_DENSIFY_BYTES", 512 * 1024 ** 2))
+
+# Parameters renamed when a model is substituted: (from, to) -> {old name: new name}
+PARAM_ALIASES = {
+    ("gradient_boosting", "hist_gradient_boosting"): {"n_estimators": "max_iter"},
+}
+
+def _substitute(task_type, requested, model_type, params, reason):
+    """Carry `params` over to the substitute model, renaming or dropping those it doesn't take."""
+    from ml.models import MODEL_CATALOG, ModelFactory
+
+    aliases = PARAM_ALIASES.get((requested, model_type), {})
+    accepted = ModelFactory(MODEL_CATALOG[task_type])[model_type]().get_params()
+    renamed = {aliases.get(name, name): value for name, value in (params or {}).items()}
+    kept = {name: value for name, value in renamed.items() if name in accepted}
+    substitution = {"requested": requested, "model_type": model_type, "reason": reason}
+    dropped = sorted(set(renamed) - set(kept))
+    if dropped:
+        substitution["dropped_params"] = dropped
+    logger.info(f"Auto-scale: training {model_type} instead of {requested} ({reason})")
+    return model_type, kept, substitution
+
+def scalable_model(task_type, model_type, params, n_rows, n_features, sparse_input):
+    """
+    Map `model_type` to a scalable equivalent when the design matrix is too
+    large for it:
+
+    - svm -> nystroem_svm (a linear SVM on Nystroem RBF features, fitted by
+      SGD for classifiers) above SVM_MAX_ROWS rows;
+    - gradient_boosting -> hist_gradient_boosting above
+      GRADIENT_BOOSTING_MAX_ROWS rows, unless sparse features would need a
+      dense copy larger than DENSIFY_MAX_BYTES;
+    - kmeans -> minibatch_kmeans and pca -> incremental_pca or randomized
+      SVD, as in the clustering and reduction modules.
+
+    Returns:
+        tuple: (model_type, params, substitution dict or None)
+    """
+    from ml.clustering import MINIBATCH_KMEANS_ROWS
+    from ml.reduction import large_pca
+
+    if task_type in ("classification", "regression"):
+        if model_type == "svm" and n_rows > SVM_MAX_ROWS:
+            return _substitute(task_type, model_type, "nystroem_svm", params,
+                               f"{n_rows} rows > {SVM_MAX_ROWS}; kernel SVM fit time grows super-linearly in rows")
+        if model_type == "gradient_boosting" and n_rows > GRADIENT_BOOSTING_MAX_ROWS:
+            if not sparse_input or n_rows * n_features * 8 <= DENSIFY_MAX_BYTES:
+                return _substitute(task_type, model_type, "hist_gradient_boosting", params,
+                                   f"{n_rows} rows > {GRADIENT_BOOSTING_MAX_ROWS}; histogram splits are binned and multi-threaded")
+    elif task_type == "clustering" and model_type == "kmeans" and n_rows > MINIBATCH_KMEANS_ROWS:
+        return _substitute(task_type, model_type, "minibatch_kmeans", params,
+                           f"{n_rows} rows > {MINIBATCH_KMEANS_ROWS}; mini-batch updates")
+    elif task_type == "dimensionality_reduction":
+        scaled_type, scaled_params = large_pca(model_type, params, n_rows, n_features, sparse_input)
+        if scaled_type != model_type:
+            return _substitute(task_type, model_type, scaled_type, scaled_params,
+                               f"{n_rows} rows{' of sparse features' if sparse_input else ''}; fitted in batches")
+        if scaled_params != dict(params or {}):
+            return model_type, scaled_params, {"requested": model_type, "model_type": model_type,
+                                               "reason": f"{n_features} features; randomized SVD solver",
+                                               "params": {"svd_solver": scaled_params["svd_solver"]}}
+    return model_type, params, None
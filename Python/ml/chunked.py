@@ -0,0 +1,207 @@
+# Python/ml/chunked.py
+import logging
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import StandardScaler
+from ml.ingest import PeakRSS
+from ml.profile import _quantiles
+from ml.preprocess import (FittedPreprocessor, FrameAppender, resolve_missing_strategy, impute,
+                           one_hot_encoder, feature_float_dtype)
+
+logger = logging.getLogger(__name__)
+
+# Target encodings need every row's target at once, so only these stream
+CHUNKED_ENCODINGS = ('onehot', 'label')
+
+class FillStatistics:
+    """
+    Mean, median and mode fill values accumulated chunk by chunk.
+
+    Means come from running float64 sums and counts; medians and modes from
+    merged value counts, so they are exact and equal to fit_fill_values on
+    the whole frame (memory follows the distinct values of those columns).
+    """
+
+    def __init__(self, strategies):
+        self.strategies = strategies
+        self._sums = {}
+        self._counts = {}
+        self._value_counts = {}
+
+    def update(self, chunk):
+        mean_cols = [col for col, strategy in self.strategies.items() if strategy == 'mean']
+        if mean_cols:
+            block = chunk[mean_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+            for col, total, count in zip(mean_cols, np.nansum(block, axis=0), (~np.isnan(block)).sum(axis=0)):
+                self._sums[col] = self._sums.get(col, 0.0) + total
+                self._counts[col] = self._counts.get(col, 0) + count
+        for col, strategy in self.strategies.items():
+            if strategy in ('median', 'mode'):
+                counts = chunk[col].value_counts(dropna=True, sort=False)
+                counts = counts[counts > 0]  # Categoricals list unused categories too
+                seen = self._value_counts.get(col)
+                self._value_counts[col] = counts if seen is None else seen.add(counts, fill_value=0)
+        return self
+
+    def mean_counts(self):
+        """Non-null values each 'mean' fill is averaged over."""
+        return {col: int(count) for col, count in self._counts.items() if count}
+
+    def result(self):
+        fill_values = {}
+        for col, strategy in self.strategies.items():
+            if strategy == 'mean' and self._counts.get(col):
+                fill_values[col] = self._sums[col] / self._counts[col]
+            counts = self._value_counts.get(col)
+            if counts is None or not len(counts):
+                continue
+            if strategy == 'median':
+                counts = counts.sort_index()
+                fill_values[col] = float(_quantiles(counts, counts.sum(), (0.5,))[0])
+            elif strategy == 'mode':
+                tied = counts.index[counts == counts.max()]
+                try:
+                    fill_values[col] = tied.sort_values()[0]
+                except TypeError:  # Mixed types can't be ordered
+                    fill_values[col] = tied[0]
+        return fill_values
+
+def _fold_fills_into_scaler(scaler, columns, missing, fill_values):
+    """
+    Update a scaler fitted on observed values (NaNs skipped) as if the missing
+    values had been filled first: each filled column gains `missing` samples
+    equal to its fill value, merged in with the parallel variance update.
+    """
+    n = np.broadcast_to(scaler.n_samples_seen_, scaler.mean_.shape).astype(np.float64)
+    k = np.array([missing[col] if col in fill_values else 0 for col in columns], dtype=np.float64)
+    fill = np.array([fill_values.get(col, 0.0) for col in columns], dtype=np.float64)
+    total = n + k
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = fill - scaler.mean_
+        mean = np.where(k > 0, scaler.mean_ + delta * k / total, scaler.mean_)
+        var = np.where(k > 0, (scaler.var_ * n + delta ** 2 * n * k / total) / total, scaler.var_)
+    # Same near-constant test StandardScaler.fit applies before dividing
+    eps = np.finfo(np.float64).eps
+    constant = var <= total * eps * var + (total * mean * eps) ** 2
+    scaler.mean_, scaler.var_ = mean, var
+    scaler.scale_ = np.where(constant, 1.0, np.sqrt(var))
+    scaler.n_samples_seen_ = total.astype(np.int64)
+    return scaler
+
+def preprocess_chunked(chunks, output_path, missing_strategy='mean', scaling=True, encoding='onehot', target_column=None,
+                       output_format='csv'):
+    """
+    Preprocess a dataset too large for memory in two streaming passes.
+
+    Pass one fits the fill values, a StandardScaler (partial_fit) and the
+    category vocabularies; pass two transforms each chunk and appends it to
+    `output_path` (CSV, Parquet or Feather, see FrameAppender). Peak memory follows the chunk size, not the file
+    size, and the output matches preprocess_data up to floating-point error.
+
+    Args:
+        chunks (callable): returns a fresh iterator of DataFrame chunks; called once per pass
+
+    Returns:
+        tuple: (FittedPreprocessor, rows written, seconds spent writing, peak RSS in MB)
+    """
+    if encoding not in CHUNKED_ENCODINGS:
+        raise ValueError(f"Chunked preprocessing supports {', '.join(CHUNKED_ENCODINGS)} encoding, not '{encoding}'")
+    rss = PeakRSS()
+
+    # Pass one: statistics
+    strategies = fill_stats = input_columns = numeric_cols = categorical_cols = float_dtype = scaler = None
+    missing, vocab = {}, {}
+    for chunk in chunks():
+        if strategies is None:
+            strategies = resolve_missing_strategy(chunk, missing_strategy)
+            fill_stats = FillStatistics(strategies)
+            features = chunk.drop(columns=[target_column]) if target_column in chunk.columns else chunk
+            input_columns = features.columns.tolist()
+            numeric_cols = features.select_dtypes(include=[np.number]).columns.tolist()
+            categorical_cols = features.select_dtypes(include=['object', 'category']).columns.tolist()
+            float_dtype = feature_float_dtype(chunk, numeric_cols)
+            scaler = StandardScaler()
+        # Fill values see every row, as in preprocess_data; the rest only rows that survive 'drop'
+        fill_stats.update(chunk)
+        chunk = impute(chunk, strategies, {})
+        for col, count in chunk.isna().sum().items():
+            missing[col] = missing.get(col, 0) + int(count)
+        if numeric_cols and len(chunk):
+            scaler.partial_fit(chunk[numeric_cols].astype(float_dtype))
+        for col in categorical_cols:
+            values = chunk[col].dropna()
+            # FittedPreprocessor.prepare hands categories to the encoders as strings
+            vocab.setdefault(col, set()).update(values.astype(str).unique().tolist())
+        rss.sample()
+    if strategies is None:
+        raise ValueError("Dataset is empty")
+    fill_values = fill_stats.result()
+
+    encoders = {}
+    transformers = []
+    if numeric_cols and scaling:
+        transformers.append(('num', StandardScaler(), numeric_cols))
+    elif numeric_cols:
+        transformers.append(('num', 'passthrough', numeric_cols))
+    if categorical_cols:
+        # Values still missing after imputation become their own level, as in the in-memory path
+        unfilled = {col for col in categorical_cols if missing[col] and col not in fill_values}
+        if encoding == 'label':
+            for col in categorical_cols:
+                classes = sorted(vocab.get(col, set()) | ({'nan'} if col in unfilled else set()))
+                encoders[col] = {label: code for code, label in enumerate(classes)}
+            transformers.append(('cat', 'passthrough', categorical_cols))
+        else:
+            encoder = one_hot_encoder(float_dtype)
+            encoder.set_params(categories=[sorted(vocab.get(col, set())) + ([np.nan] if col in unfilled else [])
+                                           for col in categorical_cols])
+            transformers.append(('cat', encoder, categorical_cols))
+    if not transformers:
+        raise ValueError("No feature columns to preprocess")
+
+    fitted = FittedPreprocessor(
+        input_columns=input_columns,
+        missing_strategy=strategies,
+        fill_values=fill_values,
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        encoding=encoding,
+        encoders=encoders,
+        float_dtype=float_dtype,
+        column_transformer=None,
+        feature_names=None,
+        fill_counts=fill_stats.mean_counts(),
+    )
+
+    # Pass two: transform and append
+    appender = FrameAppender(output_path, output_format)
+    try:
+        _transform_chunks(chunks(), fitted, transformers, scaler if numeric_cols and scaling else None,
+                          missing, target_column, appender, rss)
+    finally:
+        appender.close()
+    if fitted.column_transformer is None:
+        raise ValueError("No rows left after handling missing values")
+    fitted.rows_seen = appender.rows
+    logger.info(f"Preprocessed {appender.rows} rows in chunks into {output_path}, peak RSS {rss.peak_mb:.1f} MB")
+    return fitted, appender.rows, appender.write_seconds, rss.peak_mb
+
+def _transform_chunks(chunks, fitted, transformers, scaler, missing, target_column, appender, rss):
+    for chunk in chunks:
+        chunk = impute(chunk, fitted.missing_strategy, fitted.fill_values)
+        if not len(chunk):
+            continue
+        if fitted.column_transformer is None:
+            # Fit on the first chunk for structure, then install the full-data scaler statistics
+            column_transformer = ColumnTransformer(transformers=transformers, remainder='passthrough', verbose_feature_names_out=False)
+            column_transformer.fit(fitted.prepare(chunk))
+            if scaler is not None:
+                column_transformer.named_transformers_['num'].__dict__.update(
+                    _fold_fills_into_scaler(scaler, fitted.numeric_cols, missing, fitted.fill_values).__dict__)
+            fitted.column_transformer = column_transformer
+            fitted.feature_names = column_transformer.get_feature_names_out().tolist()
+        out = fitted.transform(chunk)
+        if target_column in chunk.columns:
+            out[target_column] = chunk[target_column].to_numpy()
+        appender.append(out)
+        rss.sample()
@@ -0,0 +1,123 @@
+# Python/ml/clustering.py
+import os
+import logging
+import numpy as np
+from scipy import sparse as sp
+from sklearn.base import BaseEstimator, ClusterMixin
+from sklearn.utils import check_array
+from ml.evaluation import _rows
+
+logger = logging.getLogger(__name__)
+
+# Rows above which kmeans is trained as mini-batch KMeans
+MINIBATCH_KMEANS_ROWS = int(os.getenv("MINIBATCH_KMEANS_ROWS", 50000))
+# Rows per stratified sample the clustering scores are computed on, and how many samples
+CLUSTER_METRIC_SAMPLE = int(os.getenv("CLUSTER_METRIC_SAMPLE", 5000))
+CLUSTER_METRIC_RESAMPLES = int(os.getenv("CLUSTER_METRIC_RESAMPLES", 5))
+# Query rows per neighborhood batch when building the DBSCAN radius graph
+DBSCAN_CHUNK_ROWS = int(os.getenv("DBSCAN_CHUNK_ROWS", 4096))
+
+class NeighborDBSCAN(ClusterMixin, BaseEstimator):
+    """
+    DBSCAN over a precomputed sparse radius graph, with nearest-core-sample prediction.
+
+    The eps-neighborhoods are queried from a NearestNeighbors index
+    `chunk_rows` rows at a time, so working memory is bounded by the chunk
+    rather than by every row's neighbor list at once; the labels are those of
+    sklearn's DBSCAN. predict() gives a new point the label of its nearest
+    core sample when that sample is within eps, and -1 (noise) otherwise,
+    instead of refitting on the new points.
+    """
+
+    def __init__(self, eps=0.5, min_samples=5, metric="euclidean", chunk_rows=DBSCAN_CHUNK_ROWS, n_jobs=None):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.metric = metric
+        self.chunk_rows = chunk_rows
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None):
+        from sklearn.cluster import DBSCAN
+        from sklearn.neighbors import NearestNeighbors, sort_graph_by_row_values
+
+        X = check_array(X, accept_sparse="csr")
+        index = NearestNeighbors(radius=self.eps, metric=self.metric, n_jobs=self.n_jobs).fit(X)
+        graph = sp.vstack([index.radius_neighbors_graph(X[start:start + self.chunk_rows], mode="distance")
+                           for start in range(0, X.shape[0], self.chunk_rows)], format="csr")
+        graph = sort_graph_by_row_values(graph, copy=False, warn_when_not_sorted=False)
+        dbscan = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric="precomputed").fit(graph)
+        self.labels_ = dbscan.labels_
+        self.core_sample_indices_ = dbscan.core_sample_indices_
+        self.components_ = X[self.core_sample_indices_]
+        self._core_index = (NearestNeighbors(n_neighbors=1, metric=self.metric).fit(self.components_)
+                            if len(self.core_sample_indices_) else None)
+        return self
+
+    def predict(self, X):
+        if self._core_index is None:
+            return np.full(X.shape[0], -1, dtype=self.labels_.dtype)
+        distances, nearest = self._core_index.kneighbors(check_array(X, accept_sparse="csr"), n_neighbors=1)
+        labels = self.labels_[self.core_sample_indices_][nearest[:, 0]]
+        labels[distances[:, 0] > self.eps] = -1
+        return labels
+
+def stratified_sample(labels, size, rng):
+    """Row indices of a sample of about `size` rows with every cluster in proportion (at least one row each)."""
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    take = np.minimum(counts, np.maximum(1, np.round(counts * size / len(labels)).astype(int)))
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.sort(np.concatenate([rng.choice(order[start:start + count], size=n, replace=False)
+                                   for start, count, n in zip(starts, counts, take)]))
+
+def _interval(values):
+    """Mean and normal-approximation 95% confidence interval of per-sample scores."""
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, [mean, mean]
+    half = 1.96 * values.std(ddof=1) / np.sqrt(len(values))
+    return mean, [float(mean - half), float(mean + half)]
+
+def clustering_metrics(X, labels, sample_size=CLUSTER_METRIC_SAMPLE, resamples=CLUSTER_METRIC_RESAMPLES, random_state=42):
+    """
+    Silhouette and Calinski-Harabasz scores on stratified samples of the rows.
+
+    Silhouette is quadratic in the rows scored, so above `sample_size` rows
+    both scores are averaged over `resamples` stratified samples (clusters
+    kept in proportion) and reported with a 95% confidence interval. Smaller
+    inputs are scored exactly and their interval is the score itself.
+
+    Returns:
+        dict: silhouette_score, calinski_harabasz_score, their *_ci bounds and the sample size used
+    """
+    from sklearn.metrics import silhouette_score, calinski_harabasz_score
+
+    labels = np.asarray(labels)
+    n_rows = len(labels)
+    if len(np.unique(labels)) < 2 or n_rows < 3:
+        return {}
+    rng = np.random.default_rng(random_state)
+    samples = ([np.arange(n_rows)] if n_rows <= sample_size
+               else [stratified_sample(labels, sample_size, rng) for _ in range(max(1, resamples))])
+    scores = {"silhouette_score": [], "calinski_harabasz_score": []}
+    for index in samples:
+        X_sample, labels_sample = _rows(X, index), labels[index]
+        if len(np.unique(labels_sample)) < 2:
+            continue
+        try:
+            scores["silhouette_score"].append(silhouette_score(X_sample, labels_sample))
+        except ValueError as e:
+            logger.warning(f"Could not calculate silhouette score: {str(e)}")
+        try:
+            dense = X_sample.toarray() if sp.issparse(X_sample) else X_sample
+            scores["calinski_harabasz_score"].append(calinski_harabasz_score(dense, labels_sample))
+        except ValueError as e:
+            logger.warning(f"Could not calculate Calinski-Harabasz score: {str(e)}")
+    metrics = {}
+    for name, values in scores.items():
+        if values:
+            metrics[name], metrics[f"{name}_ci"] = _interval(values)
+    if metrics:
+        metrics["metric_sample"] = {"rows": int(len(samples[0])), "samples": len(samples), "stratified": n_rows > sample_size}
+    return metrics
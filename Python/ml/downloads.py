@@ -0,0 +1,136 @@
+# Python/ml/downloads.py
+import os
+import zlib
+import tempfile
+import logging
+try:
+    import zstandard
+except ImportError:  # In requirements.txt; without it zstd is neither offered nor accepted
+    zstandard = None
+from ml.preprocess import OUTPUT_FORMATS, SPARSE_EXTENSION, write_frame, load_preprocessed_data
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_BLOCK_BYTES = int(os.getenv("DOWNLOAD_BLOCK_BYTES", 1024 ** 2))
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+    'npy': 'application/x-npy',
+    'npz': 'application/x-npz',
+}
+# Other names clients send for the same formats
+MEDIA_TYPE_ALIASES = {
+    'application/x-parquet': 'parquet',
+    'application/vnd.apache.arrow.stream': 'feather',
+    'application/x-feather': 'feather',
+}
+# Compressions we can produce: codec -> (file extension, media type)
+COMPRESSIONS = {'gzip': ('.gz', 'application/gzip')}
+if zstandard is not None:
+    COMPRESSIONS['zstd'] = ('.zst', 'application/zstd')
+
+def _accept_tokens(header):
+    """Header values in preference order ('q' weights honoured, q=0 dropped)."""
+    tokens = []
+    for position, part in enumerate((header or '').split(',')):
+        value, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    pass
+        if value and quality > 0:
+            tokens.append((-quality, position, value.lower()))
+    return [value for _, _, value in sorted(tokens)]
+
+def negotiate_format(requested=None, accept=None):
+    """
+    Output format for a download: the `format` query parameter if given,
+    else the first Accept media type we can produce, else None (serve the
+    file as stored).
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in OUTPUT_FORMATS and requested != 'npz':
+            raise ValueError(f"Unknown format '{requested}'; expected one of {list(MEDIA_TYPES)}")
+        return requested
+    by_media_type = {media_type: fmt for fmt, media_type in MEDIA_TYPES.items()} | MEDIA_TYPE_ALIASES
+    for media_type in _accept_tokens(accept):
+        if media_type in by_media_type:
+            return by_media_type[media_type]
+    return None
+
+def negotiate_compression(requested=None, accept_encoding=None):
+    """
+    Returns (compression, as_content_encoding).
+
+    A `compression` query parameter downloads a compressed file (.gz/.zst);
+    otherwise an Accept-Encoding the client supports is applied as a
+    transparent Content-Encoding.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package (see requirements.txt)")
+        if requested not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{requested}'; expected one of {list(COMPRESSIONS)}")
+        return requested, False
+    for encoding in _accept_tokens(accept_encoding):
+        if encoding in COMPRESSIONS:
+            return encoding, True
+    return None, False
+
+def _compressor(compression):
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+def iter_file(file_path, compression=None, block_size=DOWNLOAD_BLOCK_BYTES, remove=False):
+    """
+    Stream a file in blocks, compressing on the fly, so neither the file nor
+    its compressed form is ever held in memory. With remove=True the file
+    is deleted once streamed (temporary conversions).
+    """
+    compressor = _compressor(compression)
+    try:
+        with open(file_path, 'rb') as source:
+            while block := source.read(block_size):
+                if compressor is None:
+                    yield block
+                elif out := compressor.compress(block):
+                    yield out
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        if remove:
+            os.remove(file_path)
+
+def convert_preprocessed(file_path, output_format):
+    """
+    Write a saved preprocessing result in another format to a temporary file.
+
+    Sparse results stay .npz: converting them would densify the matrix.
+
+    Returns:
+        str: path of the temporary file; the caller removes it
+    """
+    if file_path.endswith(SPARSE_EXTENSION):
+        raise ValueError("Sparse preprocessing results are only available as npz")
+    if output_format == 'npz':
+        raise ValueError("npz is only available for sparse preprocessing results")
+    df = load_preprocessed_data(file_path)
+    handle, temp_path = tempfile.mkstemp(suffix=OUTPUT_FORMATS[output_format], dir=os.path.dirname(file_path) or None)
+    os.close(handle)
+    try:
+        write_frame(df, temp_path, output_format)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    logger.info(f"Converted {file_path} to {output_format} for download")
+    return temp_path
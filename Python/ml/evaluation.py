@@ -0,0 +1,143 @@
+# Python/ml/evaluation.py
+import os
+import time
+import logging
+import multiprocessing
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# holdout: fit on the train split, score on the test split; cv: K-Fold over all rows; both: CV on the train split plus holdout
+EVALUATION_MODES = ("holdout", "cv", "both")
+CV_FOLDS = int(os.getenv("CV_FOLDS", 5))
+# Worker processes for the fold fits (joblib semantics: -1 is every core available, see available_cores)
+CV_JOBS = int(os.getenv("CV_JOBS", -1))
+
+# Metric reported as cv_scores, as cross_val_score's default scorer did
+PRIMARY_METRIC = {"classification": "accuracy", "regression": "r2_score"}
+
+def available_cores():
+    """
+    Cores this process may use for parallel fits: its share when it is one of
+    several ML pool workers (ML_WORKER_CORES, set by pipelines.get_pool), else every core.
+    """
+    return int(os.getenv("ML_WORKER_CORES", 0)) or os.cpu_count() or 1
+
+def classification_metrics(y_true, y_pred):
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+    # One pass over the confusion counts for all three weighted scores
+    precision, recall, f1, _ = precision_recall_fscore_support(y_true, y_pred, average='weighted', zero_division=0)
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+def regression_metrics(y_true, y_pred):
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+    return {
+        "r2_score": float(r2_score(y_true, y_pred)),
+        "mean_squared_error": float(mean_squared_error(y_true, y_pred)),
+        "mean_absolute_error": float(mean_absolute_error(y_true, y_pred)),
+    }
+
+METRICS = {"classification": classification_metrics, "regression": regression_metrics}
+
+def _rows(data, index):
+    """Row subset of a DataFrame/Series, sparse matrix or array."""
+    return data.iloc[index] if hasattr(data, "iloc") else data[index]
+
+def _fit_and_score(estimator, X, y, train_index, test_index, task_type):
+    """
+    Fit `estimator` on the train rows and compute every metric from one
+    predict on the test rows. Runs in a worker process.
+
+    Returns:
+        dict: metrics plus fit_seconds and score_seconds
+    """
+    started = time.perf_counter()
+    estimator.fit(_rows(X, train_index), _rows(y, train_index))
+    fit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    y_pred = estimator.predict(_rows(X, test_index))
+    result = METRICS[task_type](_rows(y, test_index), y_pred)
+    result.update({"fit_seconds": fit_seconds, "score_seconds": time.perf_counter() - started})
+    return result
+
+def _fit_final(estimator, X, y):
+    started = time.perf_counter()
+    estimator.fit(X, y)
+    return estimator, time.perf_counter() - started
+
+def evaluate_supervised(estimator, task_type, X_train, y_train, X_test=None, y_test=None, mode="both",
+                        n_splits=CV_FOLDS, n_jobs=CV_JOBS, progress=None):
+    """
+    Fit the final model and run every CV fold as one parallel batch, computing
+    all of the task's metrics from a single predict per fold.
+
+    In "cv" mode the folds and the final model use X_train/y_train only
+    (pass the full data there and no test split). The final fit runs
+    alongside the folds, so with enough cores evaluation takes about one
+    fit of wall-clock time instead of six.
+
+    Returns:
+        tuple: (fitted final estimator, results dict)
+    """
+    from joblib import Parallel, delayed
+    from sklearn.base import clone, is_classifier
+    from sklearn.model_selection import check_cv
+
+    if mode not in EVALUATION_MODES:
+        raise ValueError(f"Unknown evaluation mode '{mode}'; expected one of {list(EVALUATION_MODES)}")
+    if mode != "cv" and X_test is None:
+        raise ValueError(f"Evaluation mode '{mode}' needs a holdout split")
+    report = progress or (lambda stage: None)
+    started = time.perf_counter()
+
+    tasks = [delayed(_fit_final)(clone(estimator), X_train, y_train)]
+    folds = []
+    if mode in ("cv", "both"):
+        # Stratified for classifiers, as cross_val_score(cv=n) splits
+        splitter = check_cv(n_splits, y_train, classifier=is_classifier(estimator))
+        folds = list(splitter.split(np.zeros((X_train.shape[0], 1)), y_train))
+        tasks += [delayed(_fit_and_score)(clone(estimator), X_train, y_train, train_index, test_index, task_type)
+                  for train_index, test_index in folds]
+
+    # One stage for the final fit and the CV folds: they run together below
+    report("fit")
+    # Processes for parallel fits; large arrays are memory-mapped to the workers rather than copied.
+    # Daemonic processes (background training jobs) can't start children, so they use threads.
+    backend = "threading" if multiprocessing.current_process().daemon else "loky"
+    n_jobs = min(len(tasks), available_cores()) if n_jobs == -1 else n_jobs
+    outcomes = Parallel(n_jobs=n_jobs, backend=backend)(tasks)
+    model, fit_seconds = outcomes[0]
+    fold_results = outcomes[1:]
+
+    results = {}
+    timings = {"fit_seconds": round(fit_seconds, 4)}
+    report("evaluate")
+    if mode in ("holdout", "both"):
+        predict_started = time.perf_counter()
+        y_pred = model.predict(X_test)
+        timings["predict_seconds"] = round(time.perf_counter() - predict_started, 4)
+        results.update(METRICS[task_type](y_test, y_pred))
+
+    if fold_results:
+        primary = PRIMARY_METRIC[task_type]
+        cv_scores = np.array([fold[primary] for fold in fold_results])
+        metric_names = [name for name in fold_results[0] if not name.endswith("_seconds")]
+        results.update({
+            "cv_scores": cv_scores.tolist(),
+            "cv_mean": float(cv_scores.mean()),
+            "cv_std": float(cv_scores.std()),
+            "cv_metrics": {name: float(np.mean([fold[name] for fold in fold_results])) for name in metric_names},
+            "folds": [
+                {"fold": i, "train_rows": len(train_index), "test_rows": len(test_index),
+                 **{name: (round(value, 4) if name.endswith("_seconds") else value) for name, value in fold.items()}}
+                for i, ((train_index, test_index), fold) in enumerate(zip(folds, fold_results))
+            ],
+        })
+    timings["wall_seconds"] = round(time.perf_counter() - started, 4)
+    results["evaluation"] = {"mode": mode, "n_splits": len(folds), **timings}
+    return model, results
@@ -0,0 +1,170 @@
+# Python/ml/incremental.py
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from ml.models import ModelTrainer
+from ml.evaluation import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Rows of the original test split kept with a trained model to evaluate its updates on
+HOLDOUT_ROWS = int(os.getenv("HOLDOUT_ROWS", 5000))
+# Tree ensembles grown with warm_start; other models need partial_fit to be updated
+WARM_START_MODELS = ("random_forest", "gradient_boosting", "hist_gradient_boosting")
+
+def holdout_path(filename):
+    """Where the retained holdout rows of the model trained on `filename` are stored."""
+    return f"uploads/holdout_{filename.split('.')[0]}.joblib"
+
+def training_split(n_rows, split=True):
+    """
+    Rows the model was fitted on and the positions of train_model's test split
+    (train_test_split with test_size=0.2, random_state=42 shuffles by row count
+    alone), capped at HOLDOUT_ROWS. No holdout when there was no split
+    (CV-only evaluation, dimensionality reduction).
+
+    Returns:
+        tuple: (training rows, holdout row positions)
+    """
+    from sklearn.model_selection import train_test_split
+
+    if not split or n_rows < 2:
+        return n_rows, np.array([], dtype=np.int64)
+    train_index, test_index = train_test_split(np.arange(n_rows), test_size=0.2, random_state=42)
+    return len(train_index), test_index[:HOLDOUT_ROWS]
+
+def update_method(model, model_type):
+    """How `model` takes new rows: "partial_fit", "warm_start", or None if it can only be retrained."""
+    if hasattr(model, "partial_fit"):
+        return "partial_fit"
+    if model_type in WARM_START_MODELS:
+        return "warm_start"
+    return None
+
+def _score(task_type, model, X, y):
+    if X.shape[0] == 0:
+        return None
+    if task_type in METRICS:
+        return METRICS[task_type](y, model.predict(X))
+    if task_type == "clustering":
+        from ml.clustering import clustering_metrics
+        return clustering_metrics(X, model.predict(X))
+    if hasattr(model, "explained_variance_ratio_"):
+        return {"explained_variance": float(np.sum(model.explained_variance_ratio_))}
+    return {}
+
+def _grow(model, new_estimators):
+    """Add `new_estimators` trees (boosting iterations) fitted on the next fit() call's rows."""
+    if "max_iter" in model.get_params():
+        # Early stopping may have ended below max_iter
+        model.set_params(warm_start=True, max_iter=model.n_iter_ + new_estimators)
+    else:
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_estimators)
+
+def update_pipeline(pipeline, new_df, holdout=None, new_estimators=None, progress=None, retrain_df=None):
+    """
+    Update a trained ModelPipeline with new raw rows instead of retraining it.
+
+    The preprocessor's mean fills are updated first (FittedPreprocessor.partial_fit);
+    its scaler stays frozen, so the model keeps the feature space it was
+    fitted in. Then the model: partial_fit for estimators that have it (SGD
+    models, naive Bayes, mini-batch KMeans, incremental PCA), or
+    `new_estimators` more trees fitted on the new rows for warm-startable
+    ensembles (default: the ensemble's size times the new rows' share of all
+    rows seen). The old and updated models are scored on the new slice and on
+    the retained holdout (processed rows of the original test split).
+    Given `retrain_df` (the raw rows the model was trained on), a fresh copy
+    of the model is also fitted on those plus the new rows, and the update's
+    fit time is compared with that full retrain's.
+
+    Returns:
+        tuple: (updated pipeline, update report)
+    """
+    from sklearn.base import clone
+
+    report = progress or (lambda stage: None)
+    preprocessor, model, task_type = pipeline.preprocessor, pipeline.model, pipeline.task_type
+    target_column = pipeline.target_column
+    method = update_method(model, pipeline.model_type)
+    if method is None:
+        raise ValueError(f"{pipeline.model_type} models can't be updated incrementally; retrain with /train "
+                         f"or train a model supporting partial_fit/warm_start")
+    supervised = task_type in METRICS
+    if supervised and (not target_column or target_column not in new_df.columns):
+        raise ValueError(f"New rows need the target column '{target_column}'")
+    drop_columns = [col for col, strategy in preprocessor.missing_strategy.items() if strategy == 'drop']
+    required = drop_columns + ([target_column] if supervised else [])
+    new_df = new_df.dropna(subset=required)
+    if new_df.empty:
+        raise ValueError("No usable new rows")
+    # Pipelines saved before training metadata was recorded fall back to the preprocessor's row count
+    training = getattr(pipeline, "training", None) or {}
+    rows_before = training.get("rows") or preprocessor.rows_seen or 0
+
+    def design(features, target=None):
+        if target is not None:
+            features = features.copy()
+            features[target_column] = target
+        X, y, _ = ModelTrainer.design_matrix(features, target_column if supervised else None, task_type, pipeline.model_type)
+        return X, y
+
+    report("evaluate")
+    target = new_df[target_column].array if supervised else None
+    X_new, y_new = design(preprocessor.transform(new_df), target)
+    X_holdout, y_holdout = design(holdout) if holdout is not None and len(holdout) else (None, None)
+    before = {"new_slice": _score(task_type, model, X_new, y_new),
+              "holdout": _score(task_type, model, X_holdout, y_holdout) if X_holdout is not None else None}
+
+    report("preprocess")
+    started = time.perf_counter()
+    preprocessor.partial_fit(new_df)
+    X_new, y_new = design(preprocessor.transform(new_df), target)
+    preprocess_seconds = time.perf_counter() - started
+
+    report("fit")
+    # The untouched configuration, for the full retrain the update is compared with
+    fresh = clone(model) if retrain_df is not None else None
+    started = time.perf_counter()
+    if method == "partial_fit":
+        model.partial_fit(X_new, y_new) if supervised else model.partial_fit(X_new)
+    else:
+        size = model.n_iter_ if hasattr(model, "n_iter_") else len(model.estimators_)
+        added = new_estimators or max(1, round(size * X_new.shape[0] / max(rows_before + X_new.shape[0], 1)))
+        _grow(model, added)
+        model.fit(X_new, y_new)
+        model.set_params(warm_start=False)
+    fit_seconds = time.perf_counter() - started
+
+    after = {"new_slice": _score(task_type, model, X_new, y_new),
+             "holdout": _score(task_type, model, X_holdout, y_holdout) if X_holdout is not None else None}
+
+    rows_after = rows_before + X_new.shape[0]
+    update = {
+        "method": method,
+        "new_rows": int(X_new.shape[0]),
+        "rows_seen": int(rows_after),
+        "preprocess_seconds": round(preprocess_seconds, 4),
+        "fit_seconds": round(fit_seconds, 4),
+    }
+    if method == "warm_start":
+        update["estimators_added"] = int(added)
+    if fresh is not None:
+        report("retrain")
+        all_rows = pd.concat([retrain_df.dropna(subset=required), new_df], ignore_index=True)
+        X_all, y_all = design(preprocessor.transform(all_rows), all_rows[target_column].array if supervised else None)
+        started = time.perf_counter()
+        fresh.fit(X_all, y_all) if supervised else fresh.fit(X_all)
+        retrain_seconds = time.perf_counter() - started
+        update["full_retrain"] = {"rows": int(X_all.shape[0]), "fit_seconds": round(retrain_seconds, 4)}
+        update["speedup"] = round(retrain_seconds / max(fit_seconds, 1e-9), 1)
+    training["rows"] = int(rows_after)
+    training.setdefault("updates", []).append({key: update[key] for key in ("method", "new_rows", "fit_seconds")})
+    pipeline.training = training
+    logger.info(f"Updated {pipeline.model_type} with {X_new.shape[0]} rows by {method} in {fit_seconds:.3f}s")
+
+    results = {"new_slice": {"before": before["new_slice"], "after": after["new_slice"], "rows": int(X_new.shape[0])}}
+    if X_holdout is not None:
+        results["holdout"] = {"before": before["holdout"], "after": after["holdout"], "rows": int(X_holdout.shape[0])}
+    return pipeline, {"update": update, "results": results}
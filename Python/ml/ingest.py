@@ -0,0 +1,138 @@
+# Python/ml/ingest.py
+import os
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from ml.profile import DatasetProfiler, profile_frame
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request body per write, and rows parsed per CSV chunk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CSV_CHUNK_ROWS = 100_000
+
+# String columns with at most this many distinct values per row become `category`
+CATEGORY_RATIO = 0.5
+
+async def save_upload(file, file_location, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Stream an UploadFile to disk in fixed-size chunks.
+
+    Returns:
+        tuple: (bytes written, SHA-256 hex digest of the content)
+    """
+    written = 0
+    digest = hashlib.sha256()
+    with open(file_location, "wb") as f:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            f.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+    return written, digest.hexdigest()
+
+def read_csv_chunks(file_location, chunksize=CSV_CHUNK_ROWS, **kwargs):
+    """Iterate over a CSV file as DataFrames of at most `chunksize` rows."""
+    return pd.read_csv(file_location, chunksize=chunksize, **kwargs)
+
+def current_rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Non-Linux fallback: lifetime high-water mark (KB on Linux, bytes on macOS)
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class PeakRSS:
+    """Track the highest RSS observed across explicit samples."""
+
+    def __init__(self):
+        self.peak_mb = current_rss_mb()
+
+    def sample(self):
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+        return self.peak_mb
+
+def profile_csv(file_location, chunksize=CSV_CHUNK_ROWS, approximate=False, relative_error=0.01):
+    """
+    Build a DatasetProfile from a CSV without loading it in full.
+
+    See DatasetProfiler for what `approximate` and `relative_error` trade off.
+
+    Returns:
+        tuple: (DatasetProfile, peak RSS in MB sampled after every chunk)
+    """
+    profiler = DatasetProfiler(approximate=approximate, relative_error=relative_error)
+    rss = PeakRSS()
+    for chunk in read_csv_chunks(file_location, chunksize=chunksize):
+        profiler.update(chunk)
+        rss.sample()
+    profile = profiler.result()
+    logger.info(f"Profiled {file_location}: {profile.rows} rows, peak RSS {rss.peak_mb:.1f} MB")
+    return profile, rss.peak_mb
+
+def plan_dtypes(profile, category_ratio=CATEGORY_RATIO):
+    """
+    Smallest lossless dtype for every column of a profiled dataset.
+
+    Integers are downcast to the narrowest signed type that holds their
+    min/max, float64 columns become float32 when every value round-trips
+    exactly, and string columns with at most `category_ratio` distinct values
+    per row become `category`.
+    """
+    plan = {}
+    for col, dtype in profile.dtypes.items():
+        plan[col] = dtype
+        stats = profile.stats.get(col)
+        if dtype == np.int64 and stats and stats["count"]:
+            for candidate in (np.int8, np.int16, np.int32):
+                info = np.iinfo(candidate)
+                if info.min <= stats["min"] and stats["max"] <= info.max:
+                    plan[col] = np.dtype(candidate)
+                    break
+        elif dtype == np.float64 and profile.float32_safe.get(col):
+            plan[col] = np.dtype(np.float32)
+        elif dtype == object and profile.rows:
+            counts = profile.value_counts.get(col)
+            if counts is None or len(counts) > category_ratio * profile.rows:
+                continue
+            categories = counts.index
+            # read_csv only maps raw strings onto string categories
+            if all(isinstance(value, str) for value in categories):
+                plan[col] = pd.CategoricalDtype(sorted(categories))
+    return plan
+
+def memory_report(profile, plan):
+    """Per-column bytes as parsed by read_csv (before) and with the planned dtypes (after)."""
+    columns = {}
+    for col, dtype in plan.items():
+        before = profile.memory_bytes.get(col, 0)
+        if isinstance(dtype, pd.CategoricalDtype):
+            codes = pd.Categorical([], dtype=dtype).codes.dtype
+            after = profile.rows * codes.itemsize + int(dtype.categories.memory_usage(deep=True))
+        elif dtype == object:
+            after = before
+        else:
+            after = profile.rows * np.dtype(dtype).itemsize
+        columns[col] = {"dtype": str(dtype), "before": before, "after": after}
+    return {
+        "columns": columns,
+        "total_before": sum(c["before"] for c in columns.values()),
+        "total_after": sum(c["after"] for c in columns.values()),
+    }
+
+def read_compact_csv(file_location, plan):
+    """Parse a CSV straight into the planned compact dtypes."""
+    return pd.read_csv(file_location, dtype=plan)
+
+def compact_frame(df, category_ratio=CATEGORY_RATIO):
+    """Apply plan_dtypes to a DataFrame that is already in memory."""
+    return df.astype(plan_dtypes(profile_frame(df), category_ratio))
@@ -0,0 +1,178 @@
+# Python/ml/jobs.py
+import os
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import multiprocessing
+from ml.pipelines import run_train
+from ml.evaluation import CV_FOLDS
+
+logger = logging.getLogger(__name__)
+
+# Jobs training at once, and jobs allowed to wait behind them
+TRAINING_CONCURRENCY = int(os.getenv("TRAINING_CONCURRENCY", 2))
+TRAINING_QUEUE_SIZE = int(os.getenv("TRAINING_QUEUE_SIZE", 32))
+# Finished (completed, failed or cancelled) jobs are kept this many seconds, and at most this many of them
+TRAINING_JOB_TTL = float(os.getenv("TRAINING_JOB_TTL", 3600))
+TRAINING_JOB_HISTORY = int(os.getenv("TRAINING_JOB_HISTORY", 256))
+
+TRAINING_STAGES = ["load", "preprocess", "fit", "evaluate", "save"]
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+def _train_job_process(messages, args):
+    """Child-process entry point: run one training job and report back through `messages`."""
+    try:
+        result = run_train(*args, progress=lambda stage: messages.put(("stage", stage)))
+        if "error" in result:
+            messages.put(("error", result["error"]))
+        else:
+            messages.put(("result", result))
+    except Exception as e:
+        messages.put(("error", str(e)))
+
+class TrainingJob:
+    def __init__(self, filename, args):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.args = args
+        self.status = "queued"
+        self.stage = None
+        self.stages = {stage: "pending" for stage in TRAINING_STAGES}
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+
+    def advance(self, stage):
+        """Mark `stage` as running and every earlier stage as done."""
+        if self.stage is not None:
+            self.stages[self.stage] = "done"
+        self.stage = stage
+        self.stages[stage] = "running"
+
+    def finish(self, status):
+        self.status = status
+        self.finished_at = time.time()
+        if self.stage is not None:
+            self.stages[self.stage] = "done" if status == "completed" else status
+        # Stages that never ran (e.g. cv for clustering) are skipped, not pending
+        if status == "completed":
+            self.stages = {stage: "skipped" if state == "pending" else state for stage, state in self.stages.items()}
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class TrainingJobManager:
+    """
+    Bounded queue of training jobs.
+
+    At most `concurrency` jobs train at once, each in its own spawned process
+    so it can be cancelled mid-fit; up to `max_pending` more wait in the queue.
+    Finished jobs and their results are dropped `ttl` seconds after they
+    finish, or sooner (oldest first) beyond `history` finished jobs.
+    """
+
+    def __init__(self, concurrency=TRAINING_CONCURRENCY, max_pending=TRAINING_QUEUE_SIZE, poll_interval=0.2,
+                 ttl=TRAINING_JOB_TTL, history=TRAINING_JOB_HISTORY):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.ttl = ttl
+        self.history = history
+        self.jobs = {}
+        self._slots = None
+        self._context = multiprocessing.get_context("spawn")
+
+    def pending_count(self):
+        return sum(1 for job in self.jobs.values() if job.status == "queued")
+
+    def prune(self):
+        """Drop finished jobs past the TTL, then the oldest beyond `history`."""
+        finished = sorted((job for job in self.jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at)
+        expired = time.time() - self.ttl
+        excess = len(finished) - self.history
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < expired:
+                del self.jobs[job.job_id]
+
+    def submit(self, filename, file_location, dataset_id, target_column, task_type, model_type=None, sparse=False, preprocess_id=None,
+               evaluation="both", cv_folds=CV_FOLDS):
+        """Queue a training job and return its id; must be called from the event loop."""
+        self.prune()
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError(f"Training queue is full ({self.max_pending} jobs waiting)")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        job = TrainingJob(filename, (filename, file_location, dataset_id, target_column, task_type, model_type, sparse, preprocess_id, evaluation, cv_folds))
+        self.jobs[job.job_id] = job
+        asyncio.get_running_loop().create_task(self._run(job))
+        return job.job_id
+
+    def get(self, job_id):
+        self.prune()
+        if job_id not in self.jobs:
+            raise KeyError(f"Unknown or expired job_id '{job_id}'")
+        return self.jobs[job_id]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        job = self.get(job_id)
+        if job.status == "queued":
+            job.finish("cancelled")
+        elif job.status == "running":
+            job.process.terminate()
+            job.finish("cancelled")
+        return job
+
+    async def _run(self, job):
+        async with self._slots:
+            if job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = time.time()
+            messages = self._context.Queue()
+            job.process = self._context.Process(target=_train_job_process, args=(messages, job.args), daemon=True)
+            job.process.start()
+            while job.status == "running":
+                try:
+                    kind, payload = messages.get_nowait()
+                except queue.Empty:
+                    if job.process.is_alive():
+                        await asyncio.sleep(self.poll_interval)
+                        continue
+                    # The child may have exited right after its last put; give the pipe a moment
+                    try:
+                        kind, payload = await asyncio.get_running_loop().run_in_executor(None, messages.get, True, 1)
+                    except queue.Empty:
+                        job.error = f"Training process exited with code {job.process.exitcode}"
+                        job.finish("failed")
+                        break
+                if kind == "stage":
+                    job.advance(payload)
+                elif kind == "result":
+                    job.result = payload
+                    job.finish("completed")
+                else:
+                    job.error = payload
+                    job.finish("failed")
+            job.process.join(timeout=5)
+            logger.info(f"Training job {job.job_id} ({job.filename}) {job.status}")
+
+# Create a global instance for easier imports
+training_jobs = TrainingJobManager()
@@ -0,0 +1,159 @@
+# Python/ml/leaderboard.py
+import os
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import multiprocessing
+import joblib
+import numpy as np
+from ml.models import MODEL_CATALOG, DENSE_ONLY_MODELS, ModelFactory, is_sparse_frame
+from ml.evaluation import METRICS, PRIMARY_METRIC, available_cores
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock seconds for a whole leaderboard, and candidates fitted at once (0: one per core)
+LEADERBOARD_BUDGET = float(os.getenv("LEADERBOARD_BUDGET", 300))
+LEADERBOARD_WORKERS = int(os.getenv("LEADERBOARD_WORKERS", 0))
+LEADERBOARD_POLL_INTERVAL = 0.05
+
+# Lower is better for these; every other metric is maximized
+LOWER_IS_BETTER = {"mean_squared_error", "mean_absolute_error"}
+
+def _candidate_process(messages, data_path, model_dir, task_type, model_type):
+    """
+    Child-process entry point: fit one candidate on the shared, memory-mapped
+    design matrix, score it on the holdout rows and save the fitted model.
+    """
+    try:
+        # mmap_mode="r": every candidate reads the same pages instead of its own pickled copy
+        X_train, X_test, y_train, y_test = joblib.load(data_path, mmap_mode="r")
+        if (task_type, model_type) in DENSE_ONLY_MODELS and hasattr(X_train, "toarray"):
+            X_train, X_test = X_train.toarray(), X_test.toarray()
+        model = ModelFactory(MODEL_CATALOG[task_type]).create(model_type)
+        started = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        y_pred = model.predict(X_test)
+        predict_seconds = time.perf_counter() - started
+        model_path = os.path.join(model_dir, f"{model_type}.pkl")
+        joblib.dump(model, model_path)
+        messages.put((model_type, "done", {
+            **METRICS[task_type](y_test, y_pred),
+            "fit_seconds": round(fit_seconds, 4),
+            "predict_seconds": round(predict_seconds, 4),
+            "predict_us_per_row": round(predict_seconds / max(X_test.shape[0], 1) * 1e6, 3),
+            "model_path": model_path,
+        }))
+    except Exception as e:
+        messages.put((model_type, "failed", {"error": str(e)}))
+
+def _design_matrices(df, target_column):
+    """Features as one float array (or CSR matrix) and the target as an array, for memory-mapping."""
+    X = df.drop(columns=[target_column])
+    X = X.sparse.to_coo().tocsr() if is_sparse_frame(X) else X.to_numpy()
+    return X, df[target_column].to_numpy()
+
+def run_leaderboard(df, target_column, task_type, model_types=None, time_budget=LEADERBOARD_BUDGET, max_workers=LEADERBOARD_WORKERS,
+                    metric=None, progress=None):
+    """
+    Train every candidate model (or `model_types`) at once and rank them on a holdout split.
+
+    Candidates run in their own processes, at most `max_workers` at a time,
+    and read one memory-mapped copy of the design matrix. When `time_budget`
+    seconds have passed, candidates still running are terminated and queued
+    ones never start; both are reported as "timeout".
+
+    Returns:
+        tuple: (winning fitted model or None, results dict with the ranked "leaderboard")
+    """
+    from sklearn.model_selection import train_test_split
+
+    if task_type not in PRIMARY_METRIC:
+        raise ValueError(f"Leaderboards support classification and regression, not {task_type}")
+    catalog = MODEL_CATALOG[task_type]
+    model_types = list(model_types or catalog)
+    unknown = [model_type for model_type in model_types if model_type not in catalog]
+    if unknown:
+        raise ValueError(f"Unsupported {task_type} models: {unknown}")
+    metric = metric or PRIMARY_METRIC[task_type]
+    report = progress or (lambda stage: None)
+
+    X, y = _design_matrices(df, target_column)
+    workdir = tempfile.mkdtemp(prefix="leaderboard_", dir="uploads" if os.path.isdir("uploads") else None)
+    try:
+        data_path = os.path.join(workdir, "design.joblib")
+        joblib.dump(train_test_split(X, y, test_size=0.2, random_state=42), data_path)
+        del X, y
+
+        report("fit")
+        outcomes = _run_candidates(data_path, workdir, task_type, model_types, time_budget,
+                                   max_workers or available_cores())
+
+        report("evaluate")
+        finished = [(model_type, outcome) for model_type, (status, outcome) in outcomes.items() if status == "done"]
+        if finished and metric not in finished[0][1]:
+            raise ValueError(f"Unknown metric '{metric}' for {task_type}")
+        sign = 1 if metric in LOWER_IS_BETTER else -1
+        finished.sort(key=lambda item: sign * item[1][metric])
+        table = [{"rank": rank, "model_type": model_type, "status": "done", "score": outcome[metric],
+                  **{name: value for name, value in outcome.items() if name != "model_path"}}
+                 for rank, (model_type, outcome) in enumerate(finished, start=1)]
+        table += [{"rank": None, "model_type": model_type, "status": status, **outcome}
+                  for model_type, (status, outcome) in outcomes.items() if status != "done"]
+
+        winner = joblib.load(finished[0][1]["model_path"]) if finished else None
+        results = {"metric": metric, "time_budget": time_budget, "leaderboard": table,
+                   "winner": finished[0][0] if finished else None}
+        return winner, results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _run_candidates(data_path, model_dir, task_type, model_types, time_budget, max_workers):
+    """
+    Run one process per candidate, `max_workers` at a time, until all finish
+    or the budget runs out.
+
+    Returns:
+        dict: model_type -> (status, outcome), in `model_types` order
+    """
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    pending = list(model_types)
+    running = {}
+    outcomes = {}
+    deadline = time.perf_counter() + time_budget
+    started_at = {}
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                model_type = pending.pop(0)
+                process = context.Process(target=_candidate_process, args=(messages, data_path, model_dir, task_type, model_type), daemon=True)
+                process.start()
+                running[model_type] = process
+                started_at[model_type] = time.perf_counter()
+            try:
+                model_type, status, outcome = messages.get(timeout=LEADERBOARD_POLL_INTERVAL)
+                outcomes[model_type] = (status, outcome)
+                running.pop(model_type).join()
+            except queue.Empty:
+                # A child that died without reporting (e.g. killed for memory) would otherwise never finish
+                for model_type, process in list(running.items()):
+                    if not process.is_alive() and messages.empty():
+                        outcomes[model_type] = ("failed", {"error": f"Process exited with code {process.exitcode}"})
+                        del running[model_type]
+            if time.perf_counter() >= deadline:
+                break
+    finally:
+        for model_type, process in running.items():
+            process.terminate()
+            process.join()
+            outcomes[model_type] = ("timeout", {"error": f"Stopped after {time.perf_counter() - started_at[model_type]:.1f}s; time budget exhausted"})
+        for model_type in pending:
+            outcomes[model_type] = ("timeout", {"error": "Not started; time budget exhausted"})
+    for model_type, (status, _) in outcomes.items():
+        if status != "done":
+            logger.info(f"Leaderboard candidate {model_type}: {status}")
+    return {model_type: outcomes[model_type] for model_type in model_types}
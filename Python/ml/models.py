@@ -1,26 +1,121 @@
 import logging
+import importlib
+from collections.abc import Mapping
+from functools import lru_cache
 import joblib
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.linear_model import LogisticRegression, LinearRegression, Ridge, Lasso
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier, GradientBoostingRegressor
-from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
-from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
-from sklearn.svm import SVC, SVR
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.metrics import silhouette_score, calinski_harabasz_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
-
-
+from ml.evaluation import evaluate_supervised, EVALUATION_MODES, CV_FOLDS, _rows
+from ml.autoscale import scalable_model, AUTO_SCALE
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# task_type -> model_type -> (module, class name, constructor kwargs).
+# Modules are imported the first time a model of that type is requested.
+MODEL_CATALOG = {
+    "classification": {
+        'logistic_regression': ("sklearn.linear_model", "LogisticRegression", {"max_iter": 1000}),
+        'random_forest': ("sklearn.ensemble", "RandomForestClassifier", {}),
+        'decision_tree': ("sklearn.tree", "DecisionTreeClassifier", {}),
+        'knn': ("sklearn.neighbors", "KNeighborsClassifier", {}),
+        'svm': ("sklearn.svm", "SVC", {"probability": True}),
+        'gradient_boosting': ("sklearn.ensemble", "GradientBoostingClassifier", {}),
+        # Incrementally updatable with partial_fit (see ml.incremental)
+        'sgd': ("sklearn.linear_model", "SGDClassifier", {"loss": "log_loss", "random_state": 42}),
+        'naive_bayes': ("sklearn.naive_bayes", "GaussianNB", {}),
+        # Scalable equivalents substituted by the auto-scale policy (see ml.autoscale)
+        'nystroem_svm': ("ml.approximate", "NystroemSVMClassifier", {}),
+        'hist_gradient_boosting': ("sklearn.ensemble", "HistGradientBoostingClassifier", {}),
+        'approximate_knn': ("ml.approximate", "ProjectedKNeighborsClassifier", {})
+    },
+    "regression": {
+        'linear_regression': ("sklearn.linear_model", "LinearRegression", {}),
+        'random_forest': ("sklearn.ensemble", "RandomForestRegressor", {}),
+        'decision_tree': ("sklearn.tree", "DecisionTreeRegressor", {}),
+        'knn': ("sklearn.neighbors", "KNeighborsRegressor", {}),
+        'svm': ("sklearn.svm", "SVR", {}),
+        'ridge': ("sklearn.linear_model", "Ridge", {}),
+        'lasso': ("sklearn.linear_model", "Lasso", {}),
+        'gradient_boosting': ("sklearn.ensemble", "GradientBoostingRegressor", {}),
+        # Incrementally updatable with partial_fit (see ml.incremental)
+        'sgd': ("sklearn.linear_model", "SGDRegressor", {"random_state": 42}),
+        # Scalable equivalents substituted by the auto-scale policy (see ml.autoscale)
+        'nystroem_svm': ("ml.approximate", "NystroemSVMRegressor", {}),
+        'hist_gradient_boosting': ("sklearn.ensemble", "HistGradientBoostingRegressor", {}),
+        'approximate_knn': ("ml.approximate", "ProjectedKNeighborsRegressor", {})
+    },
+    "clustering": {
+        'kmeans': ("sklearn.cluster", "KMeans", {"n_clusters": 3}),
+        'minibatch_kmeans': ("sklearn.cluster", "MiniBatchKMeans", {"n_clusters": 3, "batch_size": 4096, "n_init": 3}),
+        'dbscan': ("ml.clustering", "NeighborDBSCAN", {}),
+        'agglomerative': ("sklearn.cluster", "AgglomerativeClustering", {"n_clusters": 3})
+    },
+    "dimensionality_reduction": {
+        'pca': ("sklearn.decomposition", "PCA", {"n_components": 2}),
+        'incremental_pca': ("sklearn.decomposition", "IncrementalPCA", {"n_components": 2}),
+        'tsne': ("ml.reduction", "SampledTSNE", {"n_components": 2})
+    }
+}
+
+# Estimators that reject (or mishandle) sparse input; sparse frames are densified for them
+DENSE_ONLY_MODELS = {
+    ("classification", "svm"),
+    ("regression", "svm"),
+    ("classification", "naive_bayes"),
+    ("classification", "hist_gradient_boosting"),
+    ("regression", "hist_gradient_boosting"),
+    ("clustering", "agglomerative"),
+    ("dimensionality_reduction", "tsne"),
+}
+
+# Model trained when a request doesn't name one
+DEFAULT_MODEL_TYPES = {
+    "classification": "logistic_regression",
+    "regression": "linear_regression",
+    "clustering": "kmeans",
+    "dimensionality_reduction": "pca",
+}
+
+def is_sparse_frame(df):
+    """True for DataFrames built from a sparse matrix (every column a SparseDtype)"""
+    return len(df.columns) > 0 and all(isinstance(dtype, pd.SparseDtype) for dtype in df.dtypes)
+
+@lru_cache(maxsize=None)
+def load_estimator_class(module, name):
+    """Import and return an estimator class by module and name"""
+    return getattr(importlib.import_module(module), name)
+
+class ModelFactory(Mapping):
+    """
+    Mapping of model_type -> estimator class for one task type.
+
+    Classes (and the sklearn modules defining them) are imported on first
+    lookup. create() builds a new, independently configured estimator on
+    every call, so concurrent trainings never share fitted state.
+    """
+    
+    def __init__(self, catalog):
+        self._catalog = catalog
+    
+    def __getitem__(self, model_type):
+        module, name, _ = self._catalog[model_type]
+        return load_estimator_class(module, name)
+    
+    def __contains__(self, model_type):
+        return model_type in self._catalog
+    
+    def __iter__(self):
+        return iter(self._catalog)
+    
+    def __len__(self):
+        return len(self._catalog)
+    
+    def create(self, model_type, params=None):
+        """Return a fresh estimator with the catalog defaults, overridden by `params`"""
+        _, _, defaults = self._catalog[model_type]
+        return self[model_type](**{**defaults, **(params or {})})
+
 class ModelTrainer:
     """
     Class for training and evaluating machine learning models
@@ -28,38 +123,13 @@ class ModelTrainer:
     
     def __init__(self):
         """Initialize the model trainer with available models"""
-        self.classification_models = {
-            'logistic_regression': LogisticRegression(max_iter=1000),
-            'random_forest': RandomForestClassifier(),
-            'decision_tree': DecisionTreeClassifier(),
-            'knn': KNeighborsClassifier(),
-            'svm': SVC(probability=True),
-            'gradient_boosting': GradientBoostingClassifier()
-        }
-        
-        self.regression_models = {
-            'linear_regression': LinearRegression(),
-            'random_forest': RandomForestRegressor(),
-            'decision_tree': DecisionTreeRegressor(),
-            'knn': KNeighborsRegressor(),
-            'svm': SVR(),
-            'ridge': Ridge(),
-            'lasso': Lasso(),
-            'gradient_boosting': GradientBoostingRegressor()
-        }
-        
-        self.clustering_models = {
-            'kmeans': KMeans(n_clusters=3),
-            'dbscan': DBSCAN(),
-            'agglomerative': AgglomerativeClustering(n_clusters=3)
-        }
-        
-        self.dimensionality_reduction = {
-            'pca': PCA(n_components=2),
-            'tsne': TSNE(n_components=2)
-        }
+        self.classification_models = ModelFactory(MODEL_CATALOG["classification"])
+        self.regression_models = ModelFactory(MODEL_CATALOG["regression"])
+        self.clustering_models = ModelFactory(MODEL_CATALOG["clustering"])
+        self.dimensionality_reduction = ModelFactory(MODEL_CATALOG["dimensionality_reduction"])
 
-    def train_model(self, df, target_column=None, task_type="clustering", model_type=None, params=None):
+    def train_model(self, df, target_column=None, task_type="clustering", model_type=None, params=None, progress=None,
+                    evaluation="both", cv_folds=CV_FOLDS, auto_scale=AUTO_SCALE):
         """
         Train a model based on the specified task type and model type
         
@@ -69,202 +139,175 @@ class ModelTrainer:
             task_type (str): Type of ML task (classification, regression, clustering)
             model_type (str): Type of model to use
             params (dict): Optional parameters for the model
+            progress (callable): Optional callback receiving each stage name as it starts ("fit", "evaluate", "cv")
+            evaluation (str): Supervised evaluation mode, one of EVALUATION_MODES ("holdout", "cv" or "both")
+            cv_folds (int): Number of CV folds for the "cv" and "both" modes
+            auto_scale (bool): Swap model_type for a scalable equivalent when the data is too large for it
+                (see scalable_model); the swap is reported as "auto_scale"
             
         Returns:
             dict: Dictionary with model results
         """
+        from sklearn.model_selection import train_test_split
+        
         try:
             if task_type not in ["classification", "regression", "clustering", "dimensionality_reduction"]:
                 logger.error(f"Unsupported task type: {task_type}")
                 return {"error": f"Unsupported task type: {task_type}"}
+            if evaluation not in EVALUATION_MODES:
+                logger.error(f"Unsupported evaluation mode: {evaluation}")
+                return {"error": f"Unsupported evaluation mode: {evaluation}"}
                 
             logger.info(f"Training with task_type: {task_type}, model_type: {model_type}, target_column: {target_column}")
             logger.debug(f"DataFrame columns: {df.columns.tolist()}")
             
             # Set default model type if not specified
             if model_type is None:
-                if task_type == "classification":
-                    model_type = "logistic_regression"
-                elif task_type == "regression":
-                    model_type = "linear_regression"
-                elif task_type == "clustering":
-                    model_type = "kmeans"
-                elif task_type == "dimensionality_reduction":
-                    model_type = "pca"
+                model_type = DEFAULT_MODEL_TYPES[task_type]
+            
+            substitution = None
+            if auto_scale:
+                features = df.columns.drop(target_column) if target_column in df.columns else df.columns
+                model_type, params, substitution = scalable_model(task_type, model_type, params, len(df), len(features),
+                                                                  is_sparse_frame(df[features]))
             
-            # Handle supervised tasks (classification, regression)
-            if task_type in ["classification", "regression"]:
-                if target_column and target_column in df.columns:
-                    X = df.drop(columns=[target_column])
-                    y = df[target_column]
-                    logger.debug(f"Features (X) shape: {X.shape}, Target (y) shape: {y.shape}")
-                    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-                else:
-                    logger.error(f"No valid target column '{target_column}' provided for {task_type}")
-                    return {"error": f"No valid target column '{target_column}' provided for {task_type}"}
+            try:
+                X, y, feature_names = self.design_matrix(df, target_column, task_type, model_type)
+            except ValueError as e:
+                logger.error(str(e))
+                return {"error": str(e)}
+            
+            if y is not None and evaluation == "cv":
+                # CV-only: the folds cover every row and the final model is fit on all of them
+                X_train, X_test, y_train, y_test = X, None, y, None
+            elif y is not None:
+                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            elif task_type == "dimensionality_reduction":
+                # Nothing is scored on held-out rows; every row is embedded, in dataset order
+                X_train, X_test = X, None
             else:
-                # Handle unsupervised tasks
-                X = df
                 X_train, X_test = train_test_split(X, test_size=0.2, random_state=42)
-                y = None
-            
-            if X.empty:
-                logger.error("Error: Feature set (X) is empty after preprocessing.")
-                return {"error": "No features available for training after preprocessing"}
             
             # Select model based on task type and model type
             if task_type == "classification":
-                return self._train_classification(X_train, X_test, y_train, y_test, model_type, params)
+                result = self._train_classification(X_train, X_test, y_train, y_test, model_type, params, progress, feature_names,
+                                                    evaluation, cv_folds)
             elif task_type == "regression":
-                return self._train_regression(X_train, X_test, y_train, y_test, model_type, params)
+                result = self._train_regression(X_train, X_test, y_train, y_test, model_type, params, progress, feature_names,
+                                                evaluation, cv_folds)
             elif task_type == "clustering":
-                return self._train_clustering(X_train, X_test, model_type, params)
-            elif task_type == "dimensionality_reduction":
-                return self._train_dimensionality_reduction(X_train, model_type, params)
-            
-            logger.error("Reached default case: No valid task logic executed")
-            return {"error": "No valid task provided"}
+                result = self._train_clustering(X_train, X_test, model_type, params, progress)
+            else:
+                result = self._train_dimensionality_reduction(X_train, model_type, params, progress)
+            if substitution and "error" not in result:
+                result["auto_scale"] = substitution
+            return result
         
         except Exception as e:
             logger.error(f"Error in train_model: {str(e)}")
             return {"error": f"Training failed: {str(e)}"}
     
-    def _train_classification(self, X_train, X_test, y_train, y_test, model_type, params=None):
+    def _train_classification(self, X_train, X_test, y_train, y_test, model_type, params=None, progress=None, feature_names=None,
+                              evaluation="both", cv_folds=CV_FOLDS):
         """Train a classification model"""
         if model_type not in self.classification_models:
             logger.error(f"Unsupported classification model: {model_type}")
             return {"error": f"Unsupported classification model: {model_type}"}
         
-        # Create a copy of the model to avoid modifying the original
-        model = self.classification_models[model_type]
-        
-        # Apply parameters if provided
-        if params:
-            model.set_params(**params)
+        # A new estimator per call, so concurrent trainings never share state
+        model = self.classification_models.create(model_type, params)
         
-        # Train the model
-        model.fit(X_train, y_train)
-        
-        # Evaluate the model
-        y_pred = model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
-        recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
-        f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
+        # Final fit, holdout scoring and CV folds in one parallel pass
+        model, results = evaluate_supervised(model, "classification", X_train, y_train, X_test, y_test,
+                                             mode=evaluation, n_splits=cv_folds, progress=progress)
         
         # Get feature importance if available
-        feature_importance = self._get_feature_importance(model, X_train.columns)
-        
-        # Cross-validation score
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5)
+        feature_importance = self._get_feature_importance(model, X_train.columns if feature_names is None else feature_names)
         
-        logger.info(f"Classification metrics: Accuracy={accuracy:.4f}, Precision={precision:.4f}, Recall={recall:.4f}, F1={f1:.4f}")
+        if "accuracy" in results:
+            logger.info(f"Classification metrics: Accuracy={results['accuracy']:.4f}, Precision={results['precision']:.4f}, "
+                        f"Recall={results['recall']:.4f}, F1={results['f1_score']:.4f}")
+        if "cv_mean" in results:
+            logger.info(f"Classification CV accuracy: {results['cv_mean']:.4f} ± {results['cv_std']:.4f}")
         
         return {
             "task_type": "classification",
             "model_type": model_type,
-            "results": {
-                "accuracy": float(accuracy),
-                "precision": float(precision),
-                "recall": float(recall),
-                "f1_score": float(f1),
-                "cv_scores": cv_scores.tolist(),
-                "cv_mean": float(cv_scores.mean()),
-                "cv_std": float(cv_scores.std())
-            },
+            "results": results,
             "feature_importance": feature_importance,
             "model": model
         }
     
-    def _train_regression(self, X_train, X_test, y_train, y_test, model_type, params=None):
+    def _train_regression(self, X_train, X_test, y_train, y_test, model_type, params=None, progress=None, feature_names=None,
+                          evaluation="both", cv_folds=CV_FOLDS):
         """Train a regression model"""
         if model_type not in self.regression_models:
             logger.error(f"Unsupported regression model: {model_type}")
             return {"error": f"Unsupported regression model: {model_type}"}
         
-        # Create a copy of the model to avoid modifying the original
-        model = self.regression_models[model_type]
+        # A new estimator per call, so concurrent trainings never share state
+        model = self.regression_models.create(model_type, params)
         
-        # Apply parameters if provided
-        if params:
-            model.set_params(**params)
-        
-        # Train the model
-        model.fit(X_train, y_train)
-        
-        # Evaluate the model
-        y_pred = model.predict(X_test)
-        r2 = r2_score(y_test, y_pred)
-        mse = mean_squared_error(y_test, y_pred)
-        mae = mean_absolute_error(y_test, y_pred)
+        # Final fit, holdout scoring and CV folds in one parallel pass
+        model, results = evaluate_supervised(model, "regression", X_train, y_train, X_test, y_test,
+                                             mode=evaluation, n_splits=cv_folds, progress=progress)
         
         # Get feature importance if available
-        feature_importance = self._get_feature_importance(model, X_train.columns)
-        
-        # Cross-validation score
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
+        feature_importance = self._get_feature_importance(model, X_train.columns if feature_names is None else feature_names)
         
-        logger.info(f"Regression metrics: R²={r2:.4f}, MSE={mse:.4f}, MAE={mae:.4f}")
+        if "r2_score" in results:
+            logger.info(f"Regression metrics: R²={results['r2_score']:.4f}, MSE={results['mean_squared_error']:.4f}, "
+                        f"MAE={results['mean_absolute_error']:.4f}")
+        if "cv_mean" in results:
+            logger.info(f"Regression CV R²: {results['cv_mean']:.4f} ± {results['cv_std']:.4f}")
         
         return {
             "task_type": "regression",
             "model_type": model_type,
-            "results": {
-                "r2_score": float(r2),
-                "mean_squared_error": float(mse),
-                "mean_absolute_error": float(mae),
-                "cv_scores": cv_scores.tolist(),
-                "cv_mean": float(cv_scores.mean()),
-                "cv_std": float(cv_scores.std())
-            },
+            "results": results,
             "feature_importance": feature_importance,
             "model": model
         }
     
-    def _train_clustering(self, X_train, X_test, model_type, params=None):
-        """Train a clustering model"""
+    def _train_clustering(self, X_train, X_test, model_type, params=None, progress=None):
+        """
+        Train a clustering model.
+        
+        Above MINIBATCH_KMEANS_ROWS training rows kmeans is trained as
+        mini-batch KMeans. Models with predict() are scored on their labels
+        for the test split; the rest (agglomerative) on their training labels
+        rather than by refitting on the test rows. Scores are computed on
+        stratified samples (see clustering_metrics).
+        """
+        from ml.clustering import clustering_metrics, MINIBATCH_KMEANS_ROWS
+        
         if model_type not in self.clustering_models:
             logger.error(f"Unsupported clustering model: {model_type}")
             return {"error": f"Unsupported clustering model: {model_type}"}
+        if model_type == "kmeans" and X_train.shape[0] > MINIBATCH_KMEANS_ROWS:
+            logger.info(f"{X_train.shape[0]} rows; training kmeans as minibatch_kmeans")
+            model_type = "minibatch_kmeans"
         
-        # Create a copy of the model to avoid modifying the original
-        model = self.clustering_models[model_type]
-        
-        # Apply parameters if provided
-        if params:
-            model.set_params(**params)
+        # A new estimator per call, so concurrent trainings never share state
+        model = self.clustering_models.create(model_type, params)
         
         # Train the model
+        self._report(progress, "fit")
         model.fit(X_train)
         
-        # Not all clustering models provide labels the same way
-        try:
-            labels = model.predict(X_test)
-        except:
-            try:
-                labels = model.fit_predict(X_test)
-            except:
-                logger.warning(f"Could not get labels for {model_type} on test data")
-                labels = None
-        
-        # Evaluate the model if labels are available
-        metrics = {}
-        if labels is not None and len(np.unique(labels)) > 1 and len(X_test) > 1:
-            try:
-                silhouette = silhouette_score(X_test, labels)
-                metrics["silhouette_score"] = float(silhouette)
-            except:
-                logger.warning("Could not calculate silhouette score")
-            
-            try:
-                calinski = calinski_harabasz_score(X_test, labels)
-                metrics["calinski_harabasz_score"] = float(calinski)
-            except:
-                logger.warning("Could not calculate Calinski-Harabasz score")
+        self._report(progress, "evaluate")
+        if hasattr(model, "predict"):
+            X_scored, labels = X_test, model.predict(X_test)
+        else:
+            X_scored, labels = X_train, model.labels_
+        metrics = clustering_metrics(X_scored, labels)
         
         # For KMeans, include inertia
-        if model_type == "kmeans":
+        if model_type in ("kmeans", "minibatch_kmeans"):
             metrics["inertia"] = float(model.inertia_)
+        if hasattr(model, "core_sample_indices_"):
+            metrics["core_samples"] = int(len(model.core_sample_indices_))
+            metrics["noise_fraction"] = float(np.mean(model.labels_ == -1))
         
         logger.info(f"Clustering metrics: {metrics}")
         
@@ -275,28 +318,38 @@ class ModelTrainer:
             "model": model
         }
     
-    def _train_dimensionality_reduction(self, X_train, model_type, params=None):
-        """Train a dimensionality reduction model"""
+    def _train_dimensionality_reduction(self, X_train, model_type, params=None, progress=None):
+        """
+        Train a dimensionality reduction model.
+        
+        Large inputs get a scalable variant (see large_pca): incremental PCA
+        for tall or sparse data, randomized SVD for wide data; t-SNE is fitted
+        on a sample (see SampledTSNE). Only the preview rows are transformed
+        here; write_embedding streams the full embedding to disk in batches.
+        """
+        from ml.reduction import large_pca
+        
         if model_type not in self.dimensionality_reduction:
             logger.error(f"Unsupported dimensionality reduction model: {model_type}")
             return {"error": f"Unsupported dimensionality reduction model: {model_type}"}
+        model_type, params = large_pca(model_type, params, X_train.shape[0], X_train.shape[1], hasattr(X_train, "tocsr"))
         
-        # Create a copy of the model to avoid modifying the original
-        model = self.dimensionality_reduction[model_type]
-        
-        # Apply parameters if provided
-        if params:
-            model.set_params(**params)
+        # A new estimator per call, so concurrent trainings never share state
+        model = self.dimensionality_reduction.create(model_type, params)
         
-        # Transform the data
-        X_reduced = model.fit_transform(X_train)
+        self._report(progress, "fit")
+        model.fit(X_train)
         
         # Metrics specific to dimensionality reduction
+        self._report(progress, "evaluate")
         metrics = {}
-        if model_type == "pca":
+        if hasattr(model, "explained_variance_ratio_"):
             explained_variance = model.explained_variance_ratio_
             metrics["explained_variance_ratio"] = explained_variance.tolist()
             metrics["cumulative_variance"] = np.cumsum(explained_variance).tolist()
+        if hasattr(model, "sample_index_"):
+            metrics["fit_rows"] = int(len(model.sample_index_))
+            metrics["kl_divergence"] = float(model.kl_divergence_)
         
         logger.info(f"Dimensionality reduction complete: {model_type}")
         
@@ -304,21 +357,68 @@ class ModelTrainer:
             "task_type": "dimensionality_reduction",
             "model_type": model_type,
             "results": metrics,
-            "transformed_data": X_reduced.tolist()[:100],  # Limit to first 100 samples
+            # Only the first 100 rows are transformed here, not the whole input
+            "transformed_data": np.asarray(model.transform(_rows(X_train, slice(0, 100)))).tolist(),
             "model": model
         }
     
+    @staticmethod
+    def design_matrix(df, target_column, task_type, model_type):
+        """
+        Split a preprocessed frame into the estimator's inputs.
+        
+        Sparse one-hot features become a CSR matrix, or dense columns for
+        models in DENSE_ONLY_MODELS; y is None for unsupervised tasks.
+        
+        Returns:
+            tuple: (X, y, feature_names)
+        """
+        # Sparse one-hot features go to the estimator as-is unless it needs dense input
+        features = df.columns.drop(target_column) if target_column in df.columns else df.columns
+        sparse_features = is_sparse_frame(df[features])
+        if sparse_features and (task_type, model_type) in DENSE_ONLY_MODELS:
+            logger.info(f"{model_type} needs dense input; densifying sparse features")
+            df = df.astype({col: df[col].dtype.subtype for col in features})
+            sparse_features = False
+        
+        # Handle supervised tasks (classification, regression)
+        if task_type in ["classification", "regression"]:
+            if not target_column or target_column not in df.columns:
+                raise ValueError(f"No valid target column '{target_column}' provided for {task_type}")
+            X = df.drop(columns=[target_column])
+            y = df[target_column]
+            logger.debug(f"Features (X) shape: {X.shape}, Target (y) shape: {y.shape}")
+        else:
+            # Handle unsupervised tasks
+            X = df
+            y = None
+        
+        if X.empty:
+            raise ValueError("No features available for training after preprocessing")
+        
+        feature_names = X.columns
+        if sparse_features:
+            # Row-indexing a frame of sparse columns costs a take per column; a CSR matrix slices rows directly
+            X = X.sparse.to_coo().tocsr()
+        return X, y, feature_names
+    
+    @staticmethod
+    def _report(progress, stage):
+        """Notify an optional progress callback that a stage has started"""
+        if progress is not None:
+            progress(stage)
+    
     def _get_feature_importance(self, model, feature_names):
         """Extract feature importance from a model if available"""
-        importance_dict = {}
-        
         if hasattr(model, 'feature_importances_'):
-            importance_dict = dict(zip(feature_names, model.feature_importances_))
+            importances = model.feature_importances_
         elif hasattr(model, 'coef_'):
-            if len(model.coef_.shape) == 1:
-                importance_dict = dict(zip(feature_names, abs(model.coef_)))
-            else:
-                importance_dict = dict(zip(feature_names, np.mean(abs(model.coef_), axis=0)))
+            coef = np.abs(model.coef_)
+            importances = coef if coef.ndim == 1 else coef.mean(axis=0)
+        else:
+            importances = []
+        # Plain floats: coef_ follows the design matrix's dtype (float32 for compact features), which JSON can't encode
+        importance_dict = {name: float(value) for name, value in zip(feature_names, importances)}
         
         # Sort by importance and convert to list of tuples
         sorted_importance = sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
@@ -328,9 +428,10 @@ class ModelTrainer:
 model_trainer = ModelTrainer()
 
 # For backwards compatibility
-def train_model(df, target_column=None, task_type="clustering", model_type=None, params=None):
+def train_model(df, target_column=None, task_type="clustering", model_type=None, params=None, progress=None,
+                evaluation="both", cv_folds=CV_FOLDS, auto_scale=AUTO_SCALE):
     """Wrapper function for backward compatibility"""
-    return model_trainer.train_model(df, target_column, task_type, model_type, params)
+    return model_trainer.train_model(df, target_column, task_type, model_type, params, progress, evaluation, cv_folds, auto_scale)
 
 def save_model(model, file_path="uploads/trained_model.pkl"):
     """Save a trained model to disk"""
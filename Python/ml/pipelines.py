@@ -0,0 +1,393 @@
+# Python/ml/pipelines.py
+import os
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+import joblib
+from concurrent.futures import ProcessPoolExecutor
+from ml.ingest import profile_csv, plan_dtypes, memory_report, read_compact_csv, CSV_CHUNK_ROWS
+from ml.registry import dataset_registry
+from ml.preprocess import preprocess_data, save_preprocessed_data, suggest_missing_strategy, remove_other_formats, OUTPUT_FORMATS
+from ml.chunked import preprocess_chunked
+from ml.preprocess_cache import preprocess_cache, preprocess_params
+from ml.models import train_model, save_model, ModelTrainer, DEFAULT_MODEL_TYPES, is_sparse_frame
+from ml.autoscale import scalable_model, AUTO_SCALE
+from ml.reduction import write_embedding, embedding_path
+from ml.evaluation import CV_FOLDS
+from ml.leaderboard import run_leaderboard, LEADERBOARD_BUDGET
+from ml.search import successive_halving, SEARCH_CANDIDATES, SEARCH_BUDGET, SEARCH_MAX_FITS
+from ml.serving import ModelPipeline, save_pipeline, pipeline_path
+from ml.incremental import update_pipeline, training_split, holdout_path
+from ml.utils import get_dataset_insights
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for per-file pipelines; 0 runs them on the event loop's thread pool instead
+ML_WORKERS = int(os.getenv("ML_WORKERS", os.cpu_count() or 1))
+
+_pool = None
+
+def _init_worker(cores):
+    """
+    Give a pool worker its share of the cores, so ML_WORKERS concurrent
+    pipelines each running parallel CV folds (and BLAS threads) don't
+    oversubscribe the host ML_WORKERS x cpu_count ways.
+    """
+    from threadpoolctl import threadpool_limits
+
+    os.environ["ML_WORKER_CORES"] = str(cores)
+    threadpool_limits(cores)
+
+def get_pool():
+    """Lazily start the shared process pool (None when ML_WORKERS is 0)."""
+    global _pool
+    if _pool is None and ML_WORKERS > 0:
+        cores = max(1, (os.cpu_count() or 1) // ML_WORKERS)
+        # spawn, not fork: the Gemini client's gRPC channel is not fork-safe
+        _pool = ProcessPoolExecutor(max_workers=ML_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_init_worker, initargs=(cores,))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+async def run_batch(jobs, error_prefix):
+    """
+    Run one pipeline call per file concurrently and gather the results.
+
+    Args:
+        jobs (dict): filename -> (function, args)
+        error_prefix (str): e.g. "Training failed", used for per-file errors
+
+    Each result is checked against the JSON encoding the response uses
+    (numpy scalars and arrays become plain numbers and lists), so one file's
+    unencodable result becomes that file's error instead of failing the batch.
+
+    Returns:
+        dict: filename -> result, or {"error": ...} for files that failed
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    names = list(jobs)
+    outcomes = await asyncio.gather(
+        *(loop.run_in_executor(pool, fn, *args) for fn, args in jobs.values()),
+        return_exceptions=True,
+    )
+    results = {}
+    for name, outcome in zip(names, outcomes):
+        if not isinstance(outcome, BaseException):
+            try:
+                # Same rules as the JSONResponse it ends up in (no NaN/inf)
+                results[name] = json.loads(json.dumps(outcome, allow_nan=False, default=_json_default))
+                continue
+            except (TypeError, ValueError) as e:
+                outcome = ValueError(f"result could not be encoded as JSON: {str(e)}")
+        logger.error(f"{error_prefix} for {name}: {str(outcome)}")
+        results[name] = {"error": f"{error_prefix}: {str(outcome)}"}
+    return results
+
+def _json_default(value):
+    """numpy scalars and arrays as the Python numbers and lists they hold."""
+    import numpy as np
+
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def load_dataset(filename, file_location=None, dataset_id=None):
+    """
+    Load one dataset as a DataFrame with compact dtypes.
+
+    Registered content is memory-mapped from the registry; a new file is
+    parsed once and registered.
+    """
+    if dataset_id in dataset_registry:
+        return dataset_registry.load(dataset_id)
+    if file_location is None:
+        raise ValueError(f"Unknown dataset_id '{dataset_id}'")
+    profile, _ = profile_csv(file_location)
+    df = read_compact_csv(file_location, plan_dtypes(profile))
+    try:
+        dataset_registry.add_frame(dataset_id, df, filename)
+    except Exception as e:
+        logger.warning(f"Could not register {filename}: {str(e)}")
+    return df
+
+def register_csv(filename, file_location, dataset_id, approximate=False, relative_error=0.01):
+    """
+    Profile a CSV chunk by chunk and register it with compact dtypes, never
+    loading it whole.
+
+    Returns:
+        tuple: (DatasetProfile, dtype plan, peak RSS in MB)
+    """
+    profile, peak_rss_mb = profile_csv(file_location, approximate=approximate, relative_error=relative_error)
+    dtype_plan = plan_dtypes(profile)
+    dataset_registry.add_csv(dataset_id, file_location, filename, dtype_plan)
+    return profile, dtype_plan, peak_rss_mb
+
+def run_upload(filename, file_location, dataset_id, approximate=False, relative_error=0.01):
+    """Profile one uploaded CSV and build its /upload response entry."""
+    # Summary is built from a chunked read so the full CSV is never held in memory
+    profile, dtype_plan, peak_rss_mb = register_csv(filename, file_location, dataset_id, approximate, relative_error)
+    summary = profile.to_summary()
+    summary["memory_usage"] = memory_report(profile, dtype_plan)  # Bytes before/after dtype compaction
+    # Gemini insights are requested for the whole batch by the caller; this is the fallback
+    insights_data = get_dataset_insights(summary, profile=profile, use_api=False)
+    suggested_missing_strategy = suggest_missing_strategy(profile=profile)
+    print(f"File: {filename}, Peak RSS: {peak_rss_mb:.1f} MB")
+    print(f"File: {filename}, Suggested missing strategy: {suggested_missing_strategy}")
+    return {
+        "dataset_id": dataset_id,
+        "summary": summary,
+        "insights": insights_data["insights"],
+        "suggested_task_type": insights_data["suggested_task_type"],
+        "suggested_target_column": insights_data["suggested_target_column"],
+        "suggested_missing_strategy": suggested_missing_strategy,
+        "peak_rss_mb": round(peak_rss_mb, 1)
+    }
+
+def run_preprocess(filename, file_location, dataset_id, missing_strategy, scaling, encoding, target_column=None, smoothing=0.0,
+                   sparse=False, min_frequency=None, max_categories=None, chunked=False, chunk_rows=CSV_CHUNK_ROWS, output_format="csv"):
+    """
+    Preprocess one dataset and save the result in `output_format` (csv,
+    parquet, feather or npy; sparse results are always .npz).
+
+    With chunked=True the dataset is streamed from the registry `chunk_rows`
+    rows at a time (see preprocess_chunked), for files larger than memory.
+    The response reports the saved file's size and how long writing it took.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'; expected one of {list(OUTPUT_FORMATS)}")
+    if chunked:
+        return run_preprocess_chunked(filename, file_location, dataset_id, missing_strategy, scaling, encoding, target_column,
+                                      sparse, min_frequency, max_categories, chunk_rows, output_format)
+    df_processed, _, preprocess_id, cache_hit = preprocess_cached(
+        filename, file_location, dataset_id, missing_strategy=missing_strategy, scaling=scaling, encoding=encoding,
+        target_column=target_column, smoothing=smoothing, sparse=sparse, min_frequency=min_frequency, max_categories=max_categories,
+    )
+    started = time.perf_counter()
+    preprocessed_file = save_preprocessed_data(df_processed, filename=f"preprocessed_{filename}", output_format=output_format)
+    return {**output_report(preprocessed_file, time.perf_counter() - started), "preprocess_id": preprocess_id, "cache_hit": cache_hit}
+
+def preprocess_cached(filename, file_location, dataset_id, progress=None, **params):
+    """
+    preprocess_data (with return_preprocessor=True) memoized in preprocess_cache
+    by dataset content hash and parameters. `progress`, if given, is called
+    with "preprocess" once a cache miss has loaded the dataset.
+
+    Returns:
+        tuple: (df_processed, FittedPreprocessor, preprocess_id, cache_hit)
+    """
+    params = preprocess_params(**params)
+
+    def compute():
+        df = load_dataset(filename, file_location, dataset_id)
+        if progress:
+            progress("preprocess")
+        # Validate encoding and target_column compatibility
+        target_column = params["target_column"]
+        if params["encoding"] in ["target", "kfold"] and (not target_column or target_column not in df.columns):
+            raise ValueError(f"Target column '{target_column}' is required and must exist in the dataset for {params['encoding']} encoding")
+        return preprocess_data(df, return_preprocessor=True, **params)
+
+    return preprocess_cache.get_or_compute(dataset_id, filename, params, compute)
+
+def load_cached_preprocessing(preprocess_id, target_column, task_type):
+    """
+    A /preprocess result referenced by id, checked against the training target.
+
+    Returns:
+        tuple: (df_processed, FittedPreprocessor, supervised target column or None)
+    """
+    try:
+        cached_target = preprocess_cache.entry(preprocess_id)["params"]["target_column"]
+    except KeyError:
+        raise ValueError(f"Unknown preprocess_id '{preprocess_id}'")
+    cached = preprocess_cache.get(preprocess_id)
+    if cached is None:
+        raise ValueError(f"Preprocessing result '{preprocess_id}' was evicted; run /preprocess again")
+    df_processed, preprocessor = cached
+    if task_type in ("classification", "regression"):
+        if cached_target != target_column:
+            raise ValueError(f"Preprocessing result '{preprocess_id}' was built with target_column={cached_target!r}, not {target_column!r}")
+        return df_processed, preprocessor, target_column
+    if cached_target is not None and cached_target in df_processed.columns:
+        # The fitted preprocessor never sees the target, so unsupervised models must not either
+        df_processed = df_processed.drop(columns=[cached_target])
+    return df_processed, preprocessor, None
+
+def output_report(preprocessed_file, write_seconds):
+    return {
+        "preprocessed_file": preprocessed_file,
+        "size_bytes": os.path.getsize(preprocessed_file),
+        "write_seconds": round(write_seconds, 3),
+    }
+
+def run_preprocess_chunked(filename, file_location, dataset_id, missing_strategy, scaling, encoding, target_column,
+                           sparse, min_frequency, max_categories, chunk_rows, output_format):
+    if sparse or min_frequency is not None or max_categories is not None:
+        raise ValueError("sparse, min_frequency and max_categories are not supported with chunked preprocessing")
+    if dataset_id not in dataset_registry:
+        if file_location is None:
+            raise ValueError(f"Unknown dataset_id '{dataset_id}'")
+        register_csv(filename, file_location, dataset_id)
+    preprocessed_file = f"uploads/preprocessed_{os.path.splitext(filename)[0]}{OUTPUT_FORMATS[output_format]}"
+    _, rows, write_seconds, peak_rss_mb = preprocess_chunked(
+        lambda: dataset_registry.iter_chunks(dataset_id, chunk_rows), preprocessed_file,
+        missing_strategy=missing_strategy, scaling=scaling, encoding=encoding, target_column=target_column,
+        output_format=output_format,
+    )
+    remove_other_formats(preprocessed_file)
+    print(f"File: {filename}, Chunked preprocessing peak RSS: {peak_rss_mb:.1f} MB")
+    return {**output_report(preprocessed_file, write_seconds), "rows": rows, "peak_rss_mb": round(peak_rss_mb, 1)}
+
+def run_train(filename, file_location, dataset_id, target_column, task_type, model_type=None, sparse=False, preprocess_id=None,
+              evaluation="both", cv_folds=CV_FOLDS, leaderboard=False, candidates=None, time_budget=LEADERBOARD_BUDGET,
+              params=None, search=False, search_budget=SEARCH_BUDGET, max_fits=SEARCH_MAX_FITS, n_candidates=SEARCH_CANDIDATES,
+              auto_scale=AUTO_SCALE, progress=None):
+    """
+    Preprocess and train on one dataset, saving the fitted model and the
+    preprocessing + model pipeline used by /predict.
+
+    `progress`, if given, is called with each stage name as it starts:
+    load, preprocess (skipped on a preprocessing cache hit), fit (the final
+    model and any CV folds, which are fitted together), evaluate and save.
+    With sparse=True, one-hot features stay sparse through training.
+    Preprocessing comes from preprocess_cache: the /preprocess result named by
+    `preprocess_id`, or the default preprocessing, computed once per dataset.
+    `evaluation` and `cv_folds` choose holdout, CV or both (see evaluate_supervised).
+    With leaderboard=True every candidate model (or `candidates`) is trained
+    at once within `time_budget` seconds (see run_leaderboard) and only the
+    best one is saved.
+    `params` override the model's catalog defaults. With search=True they are
+    instead found by successive halving within `search_budget` seconds or
+    `max_fits` fits (see successive_halving), and `params`, if given, is the
+    search space (parameter -> values); the best configuration is refit and
+    evaluated like any other, and the trial history is returned as "search".
+    With auto_scale=True a model too slow for the data's size is swapped for
+    a scalable equivalent, reported as "auto_scale" (see scalable_model).
+    Dimensionality reduction embeds every row into embedding_path(filename),
+    in batches, for paging through /embedding.
+    The test split's processed rows are kept at holdout_path(filename) to
+    evaluate later updates (see run_update).
+    """
+    report = progress or (lambda stage: None)
+    report("load")
+    if preprocess_id:
+        df_processed, preprocessor, supervised_target = load_cached_preprocessing(preprocess_id, target_column, task_type)
+        cache_hit = True
+    else:
+        # Default preprocessing; a supervised target is left untransformed
+        supervised_target = target_column if task_type in ("classification", "regression") else None
+        df_processed, preprocessor, preprocess_id, cache_hit = preprocess_cached(
+            filename, file_location, dataset_id, progress, target_column=supervised_target, sparse=sparse)
+    started = time.perf_counter()
+    if leaderboard:
+        result = train_leaderboard(df_processed, supervised_target, task_type, candidates, time_budget, progress)
+    elif search:
+        result = train_searched(df_processed, target_column, task_type, model_type, params, search_budget, max_fits, n_candidates,
+                                evaluation, cv_folds, progress, auto_scale)
+    else:
+        result = train_model(df_processed, target_column, task_type, model_type, params, progress=progress, evaluation=evaluation, cv_folds=cv_folds,
+                             auto_scale=auto_scale)
+    train_seconds = time.perf_counter() - started
+    if "model" in result:
+        report("save")
+        model_path = f"uploads/trained_model_{filename.split('.')[0]}.pkl"
+        save_model(result["model"], file_path=model_path)
+        split = task_type == "clustering" or (task_type != "dimensionality_reduction" and (leaderboard or evaluation != "cv"))
+        fit_rows, holdout = training_split(len(df_processed), split)
+        fit_seconds = result.get("results", {}).get("evaluation", {}).get("fit_seconds", train_seconds)
+        training = {"fit_rows": fit_rows, "fit_seconds": round(fit_seconds, 4), "rows": fit_rows, "updates": [],
+                    "dataset_id": dataset_id}
+        joblib.dump(df_processed.iloc[holdout], holdout_path(filename))
+        pipeline = ModelPipeline(preprocessor, result["model"], task_type, result["model_type"], supervised_target, training)
+        result["pipeline_path"] = save_pipeline(pipeline, pipeline_path(filename))
+        if task_type == "dimensionality_reduction":
+            X, _, _ = ModelTrainer.design_matrix(df_processed, None, task_type, result["model_type"])
+            result["embedding_path"] = embedding_path(filename)
+            result["embedding_shape"] = list(write_embedding(result["model"], X, result["embedding_path"]))
+        del result["model"]
+        result["model_path"] = model_path
+    if "error" not in result:
+        result.update({"preprocess_id": preprocess_id, "preprocess_cache_hit": cache_hit})
+    return result
+
+def run_update(filename, new_filename, file_location, dataset_id, new_estimators=None, compare_retrain=False, progress=None):
+    """
+    Update the model trained on `filename` with the rows of another dataset
+    instead of retraining it (see update_pipeline), saving the updated model
+    and pipeline in place of the old ones.
+
+    Returns the update's timings and the model's metrics before and after on
+    the new rows and on the retained holdout of the original test split.
+    With compare_retrain=True a fresh model is also fitted on the original
+    dataset (still in the registry) plus the new rows, and its measured fit
+    time is returned as "full_retrain" with the update's "speedup".
+    """
+    report = progress or (lambda stage: None)
+    report("load")
+    path = pipeline_path(filename)
+    if not os.path.exists(path):
+        return {"error": f"No trained model for {filename}; train one with /train first"}
+    pipeline = joblib.load(path)
+    new_df = load_dataset(new_filename, file_location, dataset_id)
+    holdout = joblib.load(holdout_path(filename)) if os.path.exists(holdout_path(filename)) else None
+    retrain_df = None
+    if compare_retrain:
+        trained_on = (getattr(pipeline, "training", None) or {}).get("dataset_id")
+        if trained_on not in dataset_registry:
+            return {"error": f"The dataset {filename}'s model was trained on is no longer registered; "
+                             f"update without compare_retrain or retrain with /train"}
+        retrain_df = dataset_registry.load(trained_on)
+    try:
+        pipeline, result = update_pipeline(pipeline, new_df, holdout, new_estimators, progress, retrain_df)
+    except ValueError as e:
+        logger.error(f"Update of {filename} failed: {str(e)}")
+        return {"error": str(e)}
+    report("save")
+    model_path = f"uploads/trained_model_{filename.split('.')[0]}.pkl"
+    save_model(pipeline.model, file_path=model_path)
+    result.update({"task_type": pipeline.task_type, "model_type": pipeline.model_type, "model_path": model_path,
+                   "pipeline_path": save_pipeline(pipeline, path)})
+    return result
+
+def train_searched(df_processed, target_column, task_type, model_type, space, time_budget, max_fits, n_candidates,
+                   evaluation="both", cv_folds=CV_FOLDS, progress=None, auto_scale=AUTO_SCALE):
+    """
+    Search model_type's hyperparameters (over `space`, or its default space), then train_model with the best ones.
+    With auto_scale, the scalable substitute is what gets searched.
+    """
+    model_type = model_type or DEFAULT_MODEL_TYPES.get(task_type)
+    substitution = None
+    if auto_scale and target_column in df_processed.columns:
+        features = df_processed.columns.drop(target_column)
+        model_type, space, substitution = scalable_model(task_type, model_type, space, len(df_processed), len(features),
+                                                         is_sparse_frame(df_processed[features]))
+    try:
+        best_params, search = successive_halving(df_processed, target_column, task_type, model_type, space=space,
+                                                 n_candidates=n_candidates, time_budget=time_budget, max_fits=max_fits)
+    except (KeyError, ValueError) as e:
+        return {"error": f"Search failed: {str(e)}"}
+    result = train_model(df_processed, target_column, task_type, model_type, best_params, progress=progress,
+                         evaluation=evaluation, cv_folds=cv_folds, auto_scale=False)
+    if "error" not in result:
+        result["search"] = search
+        if substitution:
+            result["auto_scale"] = substitution
+    return result
+
+def train_leaderboard(df_processed, target_column, task_type, candidates, time_budget, progress=None):
+    """run_leaderboard shaped like a train_model result, with the winner as the model."""
+    if not target_column or target_column not in df_processed.columns:
+        return {"error": f"No valid target column '{target_column}' provided for {task_type}"}
+    model, results = run_leaderboard(df_processed, target_column, task_type, candidates, time_budget, progress=progress)
+    if model is None:
+        return {"error": "No candidate model finished within the time budget", "results": results}
+    return {"task_type": task_type, "model_type": results["winner"], "results": results, "model": model}
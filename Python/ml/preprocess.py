@@ -1,23 +1,31 @@
 # Python/ml/preprocess.py
+import os
+import time
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.model_selection import KFold
+from scipy import sparse as sp
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ml.profile import profile_frame
 
-def suggest_missing_strategy(df):
-    # Existing code remains unchanged
-    missing_counts = df.isnull().sum()
-    total_rows = len(df)
+def suggest_missing_strategy(df=None, profile=None):
+    # Reads from a DatasetProfile so chunked uploads never need the full frame
+    if profile is None:
+        profile = profile_frame(df)
+    missing_counts = pd.Series(profile.missing_values, dtype='int64')
+    total_rows = profile.rows
     if missing_counts.sum() == 0:
         return 'mean'
     missing_percentages = missing_counts / total_rows
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+    numeric_cols = pd.Index(profile.numeric_columns)
+    categorical_cols = pd.Index(profile.categorical_columns)
     if any(missing_percentages > 0.5):
         return 'drop'
     if numeric_cols.isin(missing_counts[missing_counts > 0].index).any():
-        skewness = df[numeric_cols].skew()
+        skewness = pd.Series(profile.skewness, dtype='float64')
         if any(abs(skewness) > 1):
             return 'median'
         return 'mean'
@@ -25,44 +33,323 @@ def suggest_missing_strategy(df):
         return 'mode'
     return 'mean'
 
+IMPUTE_STRATEGIES = ('mean', 'median', 'mode', 'drop')
+
+def resolve_missing_strategy(df, missing_strategy):
+    """
+    Expand a strategy into column -> strategy.
+    
+    'mean' and 'median' apply to numeric columns only, 'mode' and 'drop' to
+    every column; a dict assigns strategies per column and leaves the rest alone.
+    """
+    if isinstance(missing_strategy, dict):
+        unknown = set(missing_strategy.values()) - set(IMPUTE_STRATEGIES)
+        if unknown:
+            raise ValueError(f"Unknown missing value strategies: {sorted(unknown)}")
+        return {col: strategy for col, strategy in missing_strategy.items() if col in df.columns}
+    if missing_strategy in ('mean', 'median'):
+        return {col: missing_strategy for col in df.select_dtypes(include=[np.number]).columns}
+    if missing_strategy in ('mode', 'drop'):
+        return {col: missing_strategy for col in df.columns}
+    return {}
+
+def column_modes(df, columns):
+    """
+    Most frequent non-null value of each column (smallest value on ties, like Series.mode()).
+    
+    Counts come from a bincount over integer codes rather than a full value
+    sort, which keeps high-cardinality string columns cheap.
+    """
+    modes = {}
+    for col in columns:
+        codes, uniques = pd.factorize(df[col])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        if not counts.size:
+            continue
+        tied = np.asarray(uniques)[counts == counts.max()]
+        try:
+            modes[col] = np.sort(tied)[0]
+        except TypeError:  # Mixed types can't be ordered; take the first seen
+            modes[col] = tied[0]
+    return modes
+
+def fit_fill_values(df, strategies):
+    """Fill value per column; each statistic is computed for all of its columns in one call."""
+    by_strategy = {}
+    for col, strategy in strategies.items():
+        by_strategy.setdefault(strategy, []).append(col)
+    fill_values = {}
+    if by_strategy.get('mean'):
+        fill_values.update(df[by_strategy['mean']].mean().to_dict())
+    if by_strategy.get('median'):
+        fill_values.update(df[by_strategy['median']].median().to_dict())
+    if by_strategy.get('mode'):
+        fill_values.update(column_modes(df, by_strategy['mode']))
+    # All-missing columns have no statistic to fill with
+    return {col: value for col, value in fill_values.items() if not pd.isna(value)}
+
+def impute(df, strategies, fill_values):
+    """Drop rows missing a 'drop' column, then fill everything else with a single fillna."""
+    drop_columns = [col for col, strategy in strategies.items() if strategy == 'drop']
+    if drop_columns:
+        df = df.dropna(subset=drop_columns)
+    return df.fillna({col: value for col, value in fill_values.items() if col in df.columns})
+
+def target_values(target):
+    """
+    A target column as float64 for target encoding (missing values as NaN).
+    
+    A non-numeric target with two classes becomes 1.0 for the later class
+    in sorted order and 0.0 for the other, so category means are that
+    class's share. With more classes a mean has no meaning and this raises.
+    """
+    if pd.api.types.is_numeric_dtype(target.dtype) or pd.api.types.is_bool_dtype(target.dtype):
+        return target.to_numpy(dtype=np.float64, na_value=np.nan)
+    classes = sorted(target.dropna().unique(), key=str)
+    if len(classes) > 2:
+        raise ValueError(f"Target encoding needs a numeric or two-class target; '{target.name}' has {len(classes)} classes. "
+                         f"Use onehot or label encoding instead")
+    positive = (target == classes[-1]).to_numpy(dtype=np.float64) if classes else np.zeros(len(target))
+    return np.where(target.isna().to_numpy(), np.nan, positive)
+
 def target_encode(df, categorical_col, target_col):
     """Perform target encoding on a categorical column using the target variable."""
-    target_means = df.groupby(categorical_col)[target_col].mean()
-    return df[categorical_col].map(target_means)
+    target_means = pd.Series(target_values(df[target_col]), index=df.index).groupby(df[categorical_col], observed=True).mean()
+    return df[categorical_col].map(target_means).astype(float)
+
+def target_encoding_map(df, categorical_col, target_col):
+    """Category -> target mean, plus the overall mean for categories not seen in training."""
+    y = pd.Series(target_values(df[target_col]), index=df.index)
+    target_means = y.groupby(df[categorical_col], observed=True).mean()
+    return target_means.to_dict(), float(y.mean())
+
+class KFoldTargetMap:
+    """
+    Fitted K-Fold target encoding for one column.
+    
+    fold_means[f, k] is the smoothed target mean of category k over every
+    fold except f, used for training rows in fold f; means[k] is the same
+    over all rows, used for new data.
+    """
+    
+    def __init__(self, categories, fold_means, fold_priors, means, prior):
+        self.categories = categories
+        self.fold_means = fold_means
+        self.fold_priors = fold_priors
+        self.means = means
+        self.prior = prior
+    
+    def mapping(self):
+        """(category -> mean, prior for unseen categories), as used by FittedPreprocessor."""
+        return dict(zip(self.categories, self.means.tolist())), self.prior
+
+def _smoothed_means(sums, counts, priors, smoothing):
+    # Categories with no rows (and no smoothing) fall back to the prior
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (sums + smoothing * priors) / (counts + smoothing)
+    return np.where(counts + smoothing > 0, means, priors)
+
+def kfold_target_encode_columns(df, categorical_cols, target_col, n_splits=5, smoothing=0.0, random_state=42):
+    """
+    K-Fold target encode several columns at once.
+    
+    Folds are drawn once; each column is factorized to integer codes and its
+    per-fold target sums and counts come from a single bincount, so no
+    DataFrame is copied or grouped. With smoothing m, a category's mean is
+    shrunk towards the fold's overall mean: (sum + m * prior) / (count + m).
+    Two-class string targets are encoded as in target_values.
+    
+    Returns:
+        (dict, dict): column -> encoded float64 array, column -> KFoldTargetMap
+    """
+    n = len(df)
+    fold_of_row = np.empty(n, dtype=np.int64)
+    for fold, (_, val_idx) in enumerate(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(np.empty((n, 1)))):
+        fold_of_row[val_idx] = fold
+    
+    y = target_values(df[target_col])
+    has_y = ~np.isnan(y)
+    y_filled = np.where(has_y, y, 0.0)
+    fold_y = np.bincount(fold_of_row, weights=y_filled, minlength=n_splits)
+    fold_n = np.bincount(fold_of_row, weights=has_y, minlength=n_splits)
+    # Prior for fold f is the target mean of the rows outside f
+    fold_priors = (fold_y.sum() - fold_y) / (fold_n.sum() - fold_n)
+    prior = float(fold_y.sum() / fold_n.sum())
+    
+    encoded, maps = {}, {}
+    for col in categorical_cols:
+        codes, categories = pd.factorize(df[col])
+        k = len(categories)
+        seen = codes >= 0
+        cell = fold_of_row[seen] * k + codes[seen]
+        sums = np.bincount(cell, weights=y_filled[seen], minlength=n_splits * k).reshape(n_splits, k)
+        counts = np.bincount(cell, weights=has_y[seen], minlength=n_splits * k).reshape(n_splits, k)
+        total_sums, total_counts = sums.sum(axis=0), counts.sum(axis=0)
+        fold_means = _smoothed_means(total_sums - sums, total_counts - counts, fold_priors[:, None], smoothing)
+        values = fold_priors[fold_of_row]
+        values[seen] = fold_means[fold_of_row[seen], codes[seen]]
+        encoded[col] = values
+        maps[col] = KFoldTargetMap(
+            categories=np.asarray(categories).tolist(),
+            fold_means=fold_means,
+            fold_priors=fold_priors,
+            means=_smoothed_means(total_sums, total_counts, prior, smoothing),
+            prior=prior,
+        )
+    return encoded, maps
 
 def kfold_target_encode(df, categorical_col, target_col, n_splits=5):
     """Perform K-Fold target encoding to prevent data leakage."""
-    kf = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+    encoded, _ = kfold_target_encode_columns(df, [categorical_col], target_col, n_splits=n_splits)
     df_encoded = df.copy()
-    encoded_col = np.zeros(len(df))
+    df_encoded[categorical_col] = encoded[categorical_col]
+    return df_encoded
+
+def feature_float_dtype(df, numeric_cols):
+    """float32 when every numeric feature already fits in it exactly (compact ingest), else float64."""
+    exact_in_float32 = (np.float32, np.int8, np.int16, np.uint8, np.uint16)
+    if all(df[col].dtype in exact_in_float32 for col in numeric_cols):
+        return np.float32
+    return np.float64
+
+def one_hot_encoder(float_dtype, sparse=False, min_frequency=None, max_categories=None):
+    """
+    OneHotEncoder for preprocess_data.
     
-    for train_idx, val_idx in kf.split(df):
-        train_df, val_df = df.iloc[train_idx], df.iloc[val_idx]
-        target_means = train_df.groupby(categorical_col)[target_col].mean()
-        encoded_col[val_idx] = val_df[categorical_col].map(target_means).fillna(train_df[target_col].mean())
+    min_frequency (a count, or a fraction of rows if below 1) and max_categories
+    fold rare levels into one 'infrequent' column, which unseen levels also
+    map to at prediction time.
+    """
+    if min_frequency is not None and min_frequency >= 1:
+        min_frequency = int(min_frequency)
+    capped = min_frequency is not None or max_categories is not None
+    return OneHotEncoder(
+        drop='first',
+        sparse_output=sparse,
+        handle_unknown='infrequent_if_exist' if capped else 'ignore',
+        min_frequency=min_frequency,
+        max_categories=max_categories,
+        dtype=float_dtype,
+    )
+
+def _as_frame(data, columns, index=None):
+    """Wrap transformer output; sparse matrices become SparseDtype columns without densifying."""
+    if sp.issparse(data):
+        frame = pd.DataFrame.sparse.from_spmatrix(data, columns=columns)
+        if index is not None:
+            frame.index = index
+        return frame
+    return pd.DataFrame(data, columns=columns, index=index, copy=False)
+
+class FittedPreprocessor:
+    """
+    Everything preprocess_data fitted on the training frame, so the same
+    transformation can be replayed on new raw rows at prediction time.
+    """
     
-    df_encoded[categorical_col] = encoded_col
-    return df_encoded
+    def __init__(self, input_columns, missing_strategy, fill_values, numeric_cols, categorical_cols,
+                 encoding, encoders, float_dtype, column_transformer, feature_names, rows_seen=None, fill_counts=None):
+        self.input_columns = input_columns
+        self.missing_strategy = missing_strategy
+        self.fill_values = fill_values
+        self.numeric_cols = numeric_cols
+        self.categorical_cols = categorical_cols
+        self.encoding = encoding
+        self.encoders = encoders
+        self.float_dtype = float_dtype
+        self.column_transformer = column_transformer
+        self.feature_names = feature_names
+        self.rows_seen = rows_seen
+        # Non-null values each 'mean' fill was averaged over
+        self.fill_counts = fill_counts
+    
+    def prepare(self, df):
+        """Impute and encode raw rows up to the column transformer's input."""
+        missing = [col for col in self.input_columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing input columns: {missing}")
+        df = df[self.input_columns].copy()
+        drop_columns = [col for col, strategy in self.missing_strategy.items() if strategy == 'drop' and col in df.columns]
+        if df[drop_columns].isna().any().any():
+            raise ValueError(f"Rows missing values in {drop_columns} cannot be scored; the model was trained with missing_strategy='drop' for them")
+        df = impute(df, {}, self.fill_values)
+        
+        if self.numeric_cols:
+            df[self.numeric_cols] = df[self.numeric_cols].apply(pd.to_numeric).astype(self.float_dtype)
+        for col in self.categorical_cols:
+            # Raw CSV/JSON values are compared as strings, like the fitted categories
+            values = df[col].astype(object)
+            df[col] = values.where(values.isna(), values.astype(str))
+            if self.encoding == 'label':
+                df[col] = df[col].astype(str).map(self.encoders[col]).fillna(-1).astype(self.float_dtype)
+            elif self.encoding in ('target', 'kfold'):
+                means, default = self.encoders[col]
+                df[col] = df[col].map(means).astype(float).fillna(default).astype(self.float_dtype)
+        return df
+    
+    def transform(self, df):
+        """Transform raw rows (training columns, target optional) into model features."""
+        df = self.prepare(df)
+        transformed = self.column_transformer.transform(df)
+        return _as_frame(transformed, self.feature_names, index=df.index)
+    
+    def scaler(self):
+        """The fitted StandardScaler of the numeric columns, or None when they pass through unscaled."""
+        if self.column_transformer is None or not self.numeric_cols:
+            return None
+        scaler = self.column_transformer.named_transformers_.get('num')
+        return scaler if isinstance(scaler, StandardScaler) else None
+    
+    def partial_fit(self, df):
+        """
+        Fold new raw rows into the 'mean' fill values: running means weighted
+        by each column's non-null count. Everything the features are computed
+        with is left as fitted so existing models still apply: the numeric
+        scaler, one-hot/label vocabularies, target encodings and median/mode
+        fills stay frozen, and unseen categories are handled as at prediction time.
+        """
+        counts = getattr(self, 'fill_counts', None)
+        if counts is None:
+            # Preprocessors pickled before counts were kept: every row taken as observed
+            counts = {col: self.rows_seen or 0 for col, strategy in self.missing_strategy.items() if strategy == 'mean'}
+        for col, strategy in self.missing_strategy.items():
+            if strategy != 'mean' or col not in self.fill_values or col not in df.columns:
+                continue
+            observed = pd.to_numeric(df[col], errors='coerce').dropna()
+            seen = counts.get(col, 0)
+            if len(observed):
+                self.fill_values[col] = (self.fill_values[col] * seen + float(observed.sum())) / (seen + len(observed))
+                counts[col] = seen + len(observed)
+        self.fill_counts = counts
+        self.rows_seen = (self.rows_seen or 0) + len(df)
+        return self
 
-def preprocess_data(df, missing_strategy='mean', scaling=True, encoding='onehot', target_column=None):
+def preprocess_data(df, missing_strategy='mean', scaling=True, encoding='onehot', target_column=None, return_preprocessor=False, smoothing=0.0,
+                    sparse=False, min_frequency=None, max_categories=None):
+    """
+    Impute, encode and scale a dataset for training.
+    
+    missing_strategy is one of IMPUTE_STRATEGIES or a {column: strategy} dict.
+    
+    The target column, if given, is kept out of the fitted transforms and
+    appended as the last column. With return_preprocessor=True, returns
+    (df_processed, FittedPreprocessor) so new rows can be transformed the same way.
+    `smoothing` shrinks K-Fold target encodings of rare categories towards the overall mean.
+    
+    With sparse=True the one-hot block stays a CSR matrix end to end and the
+    features come back as SparseDtype columns (target stays dense);
+    min_frequency/max_categories bound the number of one-hot columns.
+    """
     try:
         df_processed = df.copy()
         
         # Handle missing values
         print(f"Handling missing values with strategy: {missing_strategy}")
-        if missing_strategy == 'mean':
-            numeric_cols = df_processed.select_dtypes(include=[np.number]).columns
-            for col in numeric_cols:
-                df_processed[col].fillna(df_processed[col].mean(), inplace=True)
-        elif missing_strategy == 'median':
-            numeric_cols = df_processed.select_dtypes(include=[np.number]).columns
-            for col in numeric_cols:
-                df_processed[col].fillna(df_processed[col].median(), inplace=True)
-        elif missing_strategy == 'mode':
-            for col in df_processed.columns:
-                df_processed[col].fillna(df_processed[col].mode()[0], inplace=True)
-        elif missing_strategy == 'drop':
-            df_processed.dropna(inplace=True)
+        strategies = resolve_missing_strategy(df_processed, missing_strategy)
+        fill_values = fit_fill_values(df_processed, strategies)
+        fill_counts = {col: int(df_processed[col].notna().sum()) for col, strategy in strategies.items()
+                       if strategy == 'mean' and col in fill_values}
+        df_processed = impute(df_processed, strategies, fill_values)
 
         # Identify numeric and categorical columns dynamically
         numeric_cols = df_processed.select_dtypes(include=[np.number]).columns.tolist()
@@ -78,7 +365,14 @@ def preprocess_data(df, missing_strategy='mean', scaling=True, encoding='onehot'
         print(f"Numeric columns: {numeric_cols}")
         print(f"Categorical columns: {categorical_cols}")
 
+        # Keep compact ingest dtypes compact instead of letting sklearn widen them to float64
+        float_dtype = feature_float_dtype(df_processed, numeric_cols)
+        if float_dtype == np.float32 and numeric_cols:
+            df_processed[numeric_cols] = df_processed[numeric_cols].astype(float_dtype)
+
         # Create preprocessing pipeline
+        encoders = {}
+        applied_encoding = encoding
         transformers = []
         if numeric_cols and scaling:
             transformers.append(('num', StandardScaler(), numeric_cols))
@@ -87,65 +381,211 @@ def preprocess_data(df, missing_strategy='mean', scaling=True, encoding='onehot'
         
         if categorical_cols:
             if encoding == 'onehot':
-                transformers.append(('cat', OneHotEncoder(drop='first', sparse_output=False, handle_unknown='ignore'), categorical_cols))
+                transformers.append(('cat', one_hot_encoder(float_dtype, sparse, min_frequency, max_categories), categorical_cols))
             elif encoding == 'label':
                 # Apply Label Encoding to each categorical column
                 for col in categorical_cols:
                     le = LabelEncoder()
-                    df_processed[col] = le.fit_transform(df_processed[col].astype(str))
+                    df_processed[col] = le.fit_transform(df_processed[col].astype(str)).astype(float_dtype)
+                    encoders[col] = {label: code for code, label in enumerate(le.classes_)}
                 transformers.append(('cat', 'passthrough', categorical_cols))
             elif encoding == 'target' and target_column and target_column in df_processed.columns:
                 # Apply Target Encoding
                 for col in categorical_cols:
-                    df_processed[col] = target_encode(df_processed, col, target_column)
+                    encoders[col] = target_encoding_map(df_processed, col, target_column)
+                    df_processed[col] = target_encode(df_processed, col, target_column).astype(float_dtype)
                 transformers.append(('cat', 'passthrough', categorical_cols))
             elif encoding == 'kfold' and target_column and target_column in df_processed.columns:
-                # Apply K-Fold Target Encoding
+                # Apply K-Fold Target Encoding to all categorical columns in one pass
+                encoded, fold_maps = kfold_target_encode_columns(df_processed, categorical_cols, target_column, smoothing=smoothing)
                 for col in categorical_cols:
-                    df_processed = kfold_target_encode(df_processed, col, target_column)
+                    df_processed[col] = encoded[col].astype(float_dtype)
+                    # New rows get the full-data means; no fold ever held them out
+                    encoders[col] = fold_maps[col].mapping()
                 transformers.append(('cat', 'passthrough', categorical_cols))
             else:
                 # Fallback to onehot if target_column is not provided or invalid encoding
                 print(f"Warning: Invalid encoding '{encoding}' or missing target column. Falling back to one-hot encoding.")
-                transformers.append(('cat', OneHotEncoder(drop='first', sparse_output=False, handle_unknown='ignore'), categorical_cols))
+                applied_encoding = 'onehot'
+                transformers.append(('cat', one_hot_encoder(float_dtype, sparse, min_frequency, max_categories), categorical_cols))
 
         if not transformers:
+            if return_preprocessor:
+                raise ValueError("No feature columns to build a preprocessing pipeline from")
             print("No columns to preprocess after handling missing values")
             # Ensure target column is preserved if provided
             if target_column and target_column in df.columns:
                 return df_processed[[target_column] + [col for col in df_processed.columns if col != target_column]]
             return df_processed
 
-        preprocessor = ColumnTransformer(transformers=transformers, remainder='passthrough')
-        transformed_data = preprocessor.fit_transform(df_processed)
+        # The target stays out of the transformer, so the remainder passthrough can't duplicate it
+        has_target = bool(target_column) and target_column in df.columns
+        features = df_processed.drop(columns=[target_column]) if has_target else df_processed
+        preprocessor = ColumnTransformer(transformers=transformers, remainder='passthrough', verbose_feature_names_out=False,
+                                         sparse_threshold=1.0 if sparse else 0.3)
+        transformed_data = preprocessor.fit_transform(features)
         
         # Get feature names after transformation
-        feature_names = []
-        for name, transformer, cols in preprocessor.transformers_:
-            if name == 'num':
-                feature_names.extend(cols)
-            elif name == 'cat' and encoding == 'onehot':
-                feature_names.extend(preprocessor.named_transformers_['cat'].get_feature_names_out(cols))
-            else:
-                feature_names.extend(cols)
+        feature_names = preprocessor.get_feature_names_out().tolist()
+        fitted = FittedPreprocessor(
+            input_columns=features.columns.tolist(),
+            missing_strategy=strategies,
+            fill_values=fill_values,
+            numeric_cols=numeric_cols,
+            categorical_cols=categorical_cols,
+            encoding=applied_encoding,
+            encoders=encoders,
+            float_dtype=float_dtype,
+            column_transformer=preprocessor,
+            feature_names=list(feature_names),
+            rows_seen=len(features),
+            fill_counts=fill_counts,
+        )
         
-        # If target_column exists, ensure it's included in the output
-        if target_column and target_column in df.columns:
-            target_data = df_processed[[target_column]].values
-            transformed_data = np.hstack((transformed_data, target_data))
-            feature_names.append(target_column)
-
-        df_processed = pd.DataFrame(transformed_data, columns=feature_names)
+        # Features stay one typed block (sparse, or a float ndarray wrapped without copying);
+        # the target is appended as its own column with its own dtype, never stacked into the features
+        target_data = df_processed[target_column].array if has_target else None
+        if sp.issparse(transformed_data):
+            transformed_data = transformed_data.tocsr()
+        df_processed = _as_frame(transformed_data, feature_names)
+        if has_target:
+            df_processed[target_column] = target_data
+        if return_preprocessor:
+            return df_processed, fitted
         return df_processed
     except Exception as e:
         print(f"Error in preprocess_data: {str(e)}")
         raise
 
-def save_preprocessed_data(df, filename="preprocessed_data.csv"):
-    try:
-        file_path = f"uploads/{filename}"
+# Dense output formats -> file extension; sparse results are always saved as .npz
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'npy': '.npy'}
+SPARSE_EXTENSION = '.npz'
+
+def _remove_stale(file_path):
+    """Drop a result saved earlier in another format, so downloads never serve it."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def _check_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'; expected one of {list(OUTPUT_FORMATS)}")
+
+def write_frame(df, file_path, output_format='csv'):
+    """
+    Write a dense frame as CSV, Parquet, Feather or .npy.
+    
+    .npy holds only the values as one 2-D array (no column names), so it
+    needs every column to be numeric.
+    """
+    _check_format(output_format)
+    if output_format == 'csv':
         df.to_csv(file_path, index=False)
+    elif output_format == 'parquet':
+        df.to_parquet(file_path, index=False)
+    elif output_format == 'feather':
+        df.reset_index(drop=True).to_feather(file_path)
+    else:
+        non_numeric = [col for col, dtype in df.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+        if non_numeric:
+            raise ValueError(f"npy output needs all-numeric columns; {non_numeric} are not")
+        np.save(file_path, df.to_numpy())
+    return file_path
+
+class FrameAppender:
+    """
+    Write a frame chunk by chunk to CSV, Parquet (one row group per chunk) or
+    Feather, for outputs that never exist in memory as a whole.
+    """
+    
+    def __init__(self, file_path, output_format='csv'):
+        _check_format(output_format)
+        if output_format == 'npy':
+            raise ValueError("npy output cannot be written in chunks")
+        self.file_path = file_path
+        self.output_format = output_format
+        self._writer = None
+        self.rows = 0
+        self.write_seconds = 0.0  # Time spent serializing, excluding whatever produced the chunks
+    
+    def append(self, df):
+        started = time.perf_counter()
+        if self.output_format == 'csv':
+            df.to_csv(self.file_path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None and self.output_format == 'parquet':
+                self._writer = pq.ParquetWriter(self.file_path, table.schema)
+            elif self._writer is None:
+                # lz4, as DataFrame.to_feather writes by default
+                self._writer = pa.ipc.new_file(self.file_path, table.schema, options=pa.ipc.IpcWriteOptions(compression='lz4'))
+            self._writer.write_table(table)
+        self.rows += len(df)
+        self.write_seconds += time.perf_counter() - started
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def preprocessed_file(filename):
+    """Path of the saved preprocessing result for `filename`, in whichever format it was written, or None."""
+    stem = f"uploads/preprocessed_{os.path.splitext(filename)[0]}"
+    for extension in (*OUTPUT_FORMATS.values(), SPARSE_EXTENSION):
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
+
+def remove_other_formats(file_path):
+    """Remove results for the same dataset saved in any other format."""
+    stem, extension = os.path.splitext(file_path)
+    for other in (*OUTPUT_FORMATS.values(), SPARSE_EXTENSION):
+        if other != extension:
+            _remove_stale(stem + other)
+
+def save_preprocessed_data(df, filename="preprocessed_data.csv", output_format='csv'):
+    """
+    Save in `output_format` (see OUTPUT_FORMATS), or as a compressed .npz
+    holding the CSR matrix when the features are sparse.
+    """
+    try:
+        stem = os.path.splitext(filename)[0]
+        sparse_cols = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+        if sparse_cols:
+            file_path = f"uploads/{stem}{SPARSE_EXTENSION}"
+            matrix = df[sparse_cols].sparse.to_coo().tocsr()
+            dense = df.drop(columns=sparse_cols)
+            np.savez_compressed(
+                file_path,
+                data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=matrix.shape,
+                columns=np.array(sparse_cols, dtype=str),
+                dense_columns=np.array(dense.columns, dtype=str),
+                # Object columns (e.g. string targets) are stored as text so loading needs no pickle
+                **{f"dense_{i}": dense[col].to_numpy(dtype=None if pd.api.types.is_numeric_dtype(dense[col]) else str)
+                   for i, col in enumerate(dense.columns)},
+            )
+        else:
+            _check_format(output_format)
+            file_path = write_frame(df, f"uploads/{stem}{OUTPUT_FORMATS[output_format]}", output_format)
+        remove_other_formats(file_path)
         return file_path
     except Exception as e:
         print(f"Error saving preprocessed data: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def load_preprocessed_data(file_path):
+    """Read back a file written by save_preprocessed_data (or FrameAppender)."""
+    extension = os.path.splitext(file_path)[1]
+    if extension == '.parquet':
+        return pd.read_parquet(file_path)
+    if extension == '.feather':
+        return pd.read_feather(file_path)
+    if extension == '.npy':
+        return pd.DataFrame(np.load(file_path))
+    if extension != SPARSE_EXTENSION:
+        return pd.read_csv(file_path)
+    with np.load(file_path) as stored:
+        matrix = sp.csr_matrix((stored["data"], stored["indices"], stored["indptr"]), shape=tuple(stored["shape"]))
+        df = _as_frame(matrix, stored["columns"].tolist())
+        for i, col in enumerate(stored["dense_columns"].tolist()):
+            df[col] = stored[f"dense_{i}"]
+    return df
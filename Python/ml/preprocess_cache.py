@@ -0,0 +1,225 @@
+# Python/ml/preprocess_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from scipy import sparse as sp
+from ml.registry import locked_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("PREPROCESS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# preprocess_data arguments that change its result, with their defaults
+PREPROCESS_PARAMS = {
+    "missing_strategy": "mean",
+    "scaling": True,
+    "encoding": "onehot",
+    "target_column": None,
+    "smoothing": 0.0,
+    "sparse": False,
+    "min_frequency": None,
+    "max_categories": None,
+}
+
+def preprocess_params(**params):
+    """Every result-affecting preprocess_data argument, defaults filled in."""
+    unknown = set(params) - set(PREPROCESS_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing parameters: {sorted(unknown)}")
+    return {**PREPROCESS_PARAMS, **params}
+
+class PreprocessCache:
+    """
+    Disk cache of preprocess_data results, keyed by dataset content hash and
+    preprocessing parameters.
+
+    Each entry is a directory holding the features as raw .npy arrays (a 2-D
+    float matrix, or the three CSR arrays when sparse), memory-mapped back
+    without parsing; the target as a one-column Arrow file so it keeps its
+    dtype; and the FittedPreprocessor. Entries are evicted least-recently-used
+    first once the cache exceeds `max_bytes`. Hit and miss counts live in the
+    shared index, so they cover every worker process.
+    """
+
+    def __init__(self, root="uploads/preprocess_cache", max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root, "index.json")
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _index(self, write=False):
+        return locked_json(self._index_path, self._lock, write)
+
+    @staticmethod
+    def key(dataset_id, params):
+        """Cache key for a dataset and a full parameter dict (see preprocess_params)."""
+        payload = json.dumps([dataset_id, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def __contains__(self, key):
+        with self._index() as index:
+            return key in index.get("entries", {}) and os.path.isdir(self._path(key))
+
+    def entry(self, key):
+        """Index entry (dataset_id, filename, params, size) of a cached result."""
+        with self._index() as index:
+            if key not in index.get("entries", {}):
+                raise KeyError(f"Unknown preprocess_id '{key}'")
+            return index["entries"][key]
+
+    def stats(self):
+        with self._index() as index:
+            entries = index.get("entries", {})
+            return {
+                "entries": len(entries),
+                "bytes": sum(entry["size"] for entry in entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": index.get("hits", 0),
+                "misses": index.get("misses", 0),
+            }
+
+    def _record(self, key, hit):
+        with self._index(write=True) as index:
+            counter = "hits" if hit else "misses"
+            index[counter] = index.get(counter, 0) + 1
+            if hit and key in index.get("entries", {}):
+                index["entries"][key]["last_used"] = time.time()
+
+    def get(self, key):
+        """Return (df_processed, FittedPreprocessor), or None on a miss."""
+        if key not in self:
+            self._record(key, hit=False)
+            return None
+        try:
+            result = self._read(self._path(key))
+        except (OSError, ValueError) as e:
+            # Evicted by another process between the lookup and the read
+            logger.warning(f"Could not read cached preprocessing {key}: {str(e)}")
+            self._record(key, hit=False)
+            return None
+        self._record(key, hit=True)
+        return result
+
+    def put(self, key, df, preprocessor, dataset_id, filename, params):
+        """Store a result; a concurrent put of the same key keeps whichever finished first."""
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            self._write(tmp, df, preprocessor, params.get("target_column"))
+            size = sum(entry.stat().st_size for entry in os.scandir(tmp))
+            try:
+                os.rename(tmp, self._path(key))
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        with self._index(write=True) as index:
+            index.setdefault("entries", {})[key] = {
+                "dataset_id": dataset_id,
+                "filename": filename,
+                "params": params,
+                "size": size,
+                "last_used": time.time(),
+            }
+            self._evict(index["entries"], keep=key)
+        return key
+
+    def get_or_compute(self, dataset_id, filename, params, compute):
+        """
+        Cached result for (dataset_id, params), computing and storing it on a miss.
+
+        Args:
+            compute (callable): returns (df_processed, FittedPreprocessor)
+
+        Returns:
+            tuple: (df_processed, FittedPreprocessor, preprocess_id, cache_hit)
+        """
+        key = self.key(dataset_id, params)
+        cached = self.get(key)
+        if cached is not None:
+            return (*cached, key, True)
+        df, preprocessor = compute()
+        try:
+            self.put(key, df, preprocessor, dataset_id, filename, params)
+        except Exception as e:
+            logger.warning(f"Could not cache preprocessing for {filename}: {str(e)}")
+        return df, preprocessor, key, False
+
+    def _evict(self, entries, keep=None):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        total = sum(entry["size"] for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= entry["size"]
+            del entries[key]
+            logger.info(f"Evicted preprocessing result {key} from cache")
+
+    @staticmethod
+    def _write(path, df, preprocessor, target_column):
+        has_target = target_column is not None and target_column in df.columns
+        features = df.drop(columns=[target_column]) if has_target else df
+        sparse_cols = [col for col, dtype in features.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+        if sparse_cols and len(sparse_cols) == features.shape[1]:
+            layout = "sparse"
+            matrix = features.sparse.to_coo().tocsr()
+            for name in ("data", "indices", "indptr"):
+                np.save(os.path.join(path, f"{name}.npy"), getattr(matrix, name))
+        elif not sparse_cols and all(pd.api.types.is_float_dtype(dtype) for dtype in features.dtypes):
+            layout = "dense"
+            np.save(os.path.join(path, "features.npy"), np.ascontiguousarray(features.to_numpy()))
+        else:
+            # Mixed passthrough columns: keep the frame as Arrow instead of a matrix
+            layout = "frame"
+            features = features.astype({col: features[col].dtype.subtype for col in sparse_cols})
+            _write_arrow(os.path.join(path, "features.arrow"), features)
+        if has_target:
+            _write_arrow(os.path.join(path, "target.arrow"), df[[target_column]])
+        joblib.dump(preprocessor, os.path.join(path, "preprocessor.pkl"))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"layout": layout, "columns": features.columns.tolist(), "shape": list(features.shape),
+                       "target_column": target_column if has_target else None}, f)
+
+    @staticmethod
+    def _read(path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["layout"] == "sparse":
+            arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("data", "indices", "indptr")]
+            df = pd.DataFrame.sparse.from_spmatrix(sp.csr_matrix(tuple(arrays), shape=tuple(meta["shape"])), columns=meta["columns"])
+        elif meta["layout"] == "dense":
+            # Read-only view on the mapped file; one float block, no copy
+            df = pd.DataFrame(np.load(os.path.join(path, "features.npy"), mmap_mode="r"), columns=meta["columns"], copy=False)
+        else:
+            df = _read_arrow(os.path.join(path, "features.arrow"))
+        if meta["target_column"] is not None:
+            df[meta["target_column"]] = _read_arrow(os.path.join(path, "target.arrow"))[meta["target_column"]].array
+        return df, joblib.load(os.path.join(path, "preprocessor.pkl"))
+
+def _write_arrow(file_path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(file_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def _read_arrow(file_path):
+    # The map stays open for as long as the returned columns reference it
+    source = pa.memory_map(file_path, "r")
+    return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+# Create a global instance for easier imports
+preprocess_cache = PreprocessCache()
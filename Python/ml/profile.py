@@ -0,0 +1,342 @@
+# Python/ml/profile.py
+import os
+import numpy as np
+import pandas as pd
+from ml.sketches import HyperLogLog, KLLSketch
+
+DESCRIBE_PERCENTILES = (0.25, 0.5, 0.75)
+# Distinct values counted exactly per column, even without approximate=True, before the sketches take over
+EXACT_DISTINCT_MAX = int(os.getenv("PROFILE_EXACT_DISTINCT_MAX", 100_000))
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def _is_categorical(dtype):
+    return dtype == object or isinstance(dtype, pd.CategoricalDtype)
+
+def _resolve_dtype(dtypes):
+    """Combine the dtypes one column had across chunks the way a full read_csv would."""
+    unique = list(dict.fromkeys(dtypes))
+    if len(unique) == 1:
+        return unique[0]
+    if all(_is_numeric(d) for d in unique):
+        return np.result_type(*unique)
+    return np.dtype(object)
+
+class Moments:
+    """
+    Count, mean, M2, M3, min and max for a block of columns at once.
+
+    Two Moments over the same columns merge exactly (Chan et al. / Pebay update),
+    so chunks can be folded in any order.
+    """
+
+    def __init__(self, width):
+        self.n = np.zeros(width)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.m3 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    @classmethod
+    def from_block(cls, block):
+        """Moments of every column of a 2D float array, ignoring NaNs."""
+        moments = cls(block.shape[1])
+        present = ~np.isnan(block)
+        moments.n = present.sum(axis=0).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moments.mean = np.where(present, block, 0.0).sum(axis=0) / moments.n
+        moments.mean = np.nan_to_num(moments.mean)
+        dev = np.where(present, block - moments.mean, 0.0)
+        moments.m2 = (dev ** 2).sum(axis=0)
+        moments.m3 = (dev ** 3).sum(axis=0)
+        moments.min = np.where(present, block, np.inf).min(axis=0)
+        moments.max = np.where(present, block, -np.inf).max(axis=0)
+        return moments
+
+    def extend(self, width):
+        """Append `width` empty columns."""
+        empty = Moments(width)
+        for name in ("n", "mean", "m2", "m3", "min", "max"):
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(empty, name)]))
+        return self
+
+    def merge(self, other, idx=slice(None)):
+        """Fold `other` into the columns `idx` of this instance."""
+        na, nb = self.n[idx], other.n
+        n = na + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = other.mean - self.mean[idx]
+            mean = np.where(n > 0, self.mean[idx] + delta * nb / n, 0.0)
+            m2 = self.m2[idx] + other.m2 + np.where(n > 0, delta ** 2 * na * nb / n, 0.0)
+            m3 = (self.m3[idx] + other.m3
+                  + np.where(n > 0, delta ** 3 * na * nb * (na - nb) / n ** 2, 0.0)
+                  + np.where(n > 0, 3 * delta * (na * other.m2 - nb * self.m2[idx]) / n, 0.0))
+        self.n[idx], self.mean[idx], self.m2[idx], self.m3[idx] = n, mean, m2, m3
+        self.min[idx] = np.minimum(self.min[idx], other.min)
+        self.max[idx] = np.maximum(self.max[idx], other.max)
+        return self
+
+    def std(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+    def skew(self):
+        """Bias-corrected sample skewness, matching pandas Series.skew."""
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            g1 = (n * (n - 1)) ** 0.5 / (n - 2) * (self.m3 / n) / (self.m2 / n) ** 1.5
+        g1 = np.where(self.m2 == 0, 0.0, g1)
+        return np.where(n < 3, np.nan, g1)
+
+def _quantiles(counts, total, percentiles=DESCRIBE_PERCENTILES):
+    """Linearly interpolated quantiles (as Series.quantile) from sorted value counts."""
+    values = counts.index.to_numpy(dtype=float)
+    cumulative = np.cumsum(counts.to_numpy(dtype=float))
+    h = (total - 1) * np.asarray(percentiles)
+    lo = values[np.searchsorted(cumulative, np.floor(h), side="right")]
+    hi = values[np.searchsorted(cumulative, np.ceil(h), side="right")]
+    return lo + (h - np.floor(h)) * (hi - lo)
+
+class DatasetProfile:
+    """
+    Every per-column statistic /upload needs, computed once.
+
+    The summary, DatasetAnalyzer's heuristics and suggest_missing_strategy all
+    read these attributes instead of rescanning the data.
+    """
+
+    def __init__(self, columns, rows, dtypes, missing_values, unique_values,
+                 top_frequency, stats, skewness, estimated_fields=None,
+                 memory_bytes=None, float32_safe=None, value_counts=None):
+        self.columns = columns
+        self.rows = rows
+        self.dtypes = dtypes
+        self.data_types = {col: str(dtype) for col, dtype in dtypes.items()}
+        self.missing_values = missing_values
+        self.unique_values = unique_values
+        self.top_frequency = top_frequency
+        self.stats = stats
+        self.skewness = skewness
+        self.estimated_fields = estimated_fields or []
+        # Inputs for ingest-time dtype compaction (see ml.ingest.plan_dtypes)
+        self.memory_bytes = memory_bytes or {}
+        self.float32_safe = float32_safe or {}
+        self.value_counts = value_counts or {}
+        self.numeric_columns = [col for col, dtype in dtypes.items() if _is_numeric(dtype)]
+        self.categorical_columns = [col for col, dtype in dtypes.items() if _is_categorical(dtype)]
+        self.datetime_columns = [col for col, dtype in dtypes.items()
+                                 if pd.api.types.is_datetime64_dtype(dtype)]
+
+    def to_summary(self):
+        """The /upload summary dict."""
+        return {
+            "columns": self.columns,
+            "rows": self.rows,
+            "data_types": self.data_types,
+            "missing_values": self.missing_values,
+            "unique_values": self.unique_values,
+            "stats": self.stats,
+            "estimated_fields": self.estimated_fields,
+        }
+
+class DatasetProfiler:
+    """
+    Accumulates a DatasetProfile chunk by chunk.
+
+    Per chunk, missing counts come from one isna() over the frame and moments
+    from one pass over the numeric block as a 2D array. By default value counts
+    are kept between chunks (as one dict per column) for exact distinct counts
+    and percentiles, so memory follows the number of distinct values, up to
+    `exact_distinct_max` per column.
+
+    Past that limit, or with approximate=True past `exact_distinct_limit`, a
+    column's distinct count comes from a HyperLogLog sketch and its
+    percentiles from a KLL sketch, both sized from `relative_error` (exact
+    mode seeds them from the counts kept so far). Such fields are listed in
+    the profile's `estimated_fields`. Profilers built with the same settings
+    can be merged, so chunks or whole files can be profiled in parallel.
+    """
+
+    def __init__(self, approximate=False, relative_error=0.01, exact_distinct_limit=1000,
+                 exact_distinct_max=EXACT_DISTINCT_MAX):
+        self.approximate = approximate
+        self.relative_error = relative_error
+        self.exact_distinct_limit = exact_distinct_limit if approximate else exact_distinct_max
+        self.columns = []
+        self.rows = 0
+        self._position = {}
+        self._dtypes = {}
+        self._missing = {}
+        self._memory = {}
+        self._float32_safe = {}
+        self._counts = {}
+        self._moments = Moments(0)
+        self._distinct = {}
+        self._quantile_sketches = {}
+
+    def _add_columns(self, columns):
+        new = [col for col in columns if col not in self._dtypes]
+        if new:
+            self.columns.extend(new)
+            self._moments.extend(len(new))
+            for col in new:
+                self._position[col] = len(self._position)
+                self._dtypes[col] = []
+                self._missing[col] = 0
+                self._memory[col] = 0
+                self._float32_safe[col] = True
+                self._counts[col] = {}
+                if self.approximate:
+                    self._add_sketches(col)
+        return [self._position[col] for col in columns]
+
+    def _sketch_counts(self, counts=None):
+        """Distinct-count and quantile sketches of the values in a value-count dict."""
+        distinct = HyperLogLog.for_error(self.relative_error)
+        quantiles = KLLSketch.for_error(self.relative_error)
+        if counts:
+            values = pd.Series(list(counts))
+            distinct.update(values)
+            if _is_numeric(values.dtype):
+                quantiles.update(np.repeat(values.to_numpy(dtype=np.float64), list(counts.values())))
+        return distinct, quantiles
+
+    def _add_sketches(self, col, counts=None):
+        """Start `col`'s sketches, from its value counts so far if given."""
+        self._distinct[col], self._quantile_sketches[col] = self._sketch_counts(counts)
+
+    def _merge_counts(self, col, counts):
+        """Add value counts (a Series or dict) into `col`'s running counts."""
+        merged = self._counts.get(col)
+        if merged is None:
+            return
+        items = zip(counts.index.tolist(), counts.tolist()) if isinstance(counts, pd.Series) else counts.items()
+        for value, count in items:
+            merged[value] = merged.get(value, 0) + count
+        # High-cardinality columns hand over to the sketches
+        if len(merged) > self.exact_distinct_limit:
+            if col not in self._distinct:
+                self._add_sketches(col, merged)
+            self._counts[col] = None
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the profile."""
+        positions = self._add_columns(list(chunk.columns))
+        self.rows += len(chunk)
+        for col, missing in zip(chunk.columns, chunk.isna().to_numpy().sum(axis=0).tolist()):
+            self._missing[col] += missing
+        for col, nbytes in chunk.memory_usage(deep=True, index=False).items():
+            self._memory[col] += int(nbytes)
+
+        numeric_idx = []
+        for i, (col, dtype) in enumerate(chunk.dtypes.items()):
+            self._dtypes[col].append(dtype)
+            if _is_numeric(dtype):
+                numeric_idx.append(i)
+            # Sketches already running take the chunk itself; a hand-over seeds them from counts including it
+            sketched = col in self._distinct
+            if sketched:
+                self._distinct[col].update(chunk[col])
+                if _is_numeric(dtype):
+                    self._quantile_sketches[col].update(chunk[col].to_numpy(dtype=np.float64, na_value=np.nan))
+            if self._counts[col] is not None:
+                self._merge_counts(col, chunk[col].value_counts(dropna=True, sort=False))
+
+        if numeric_idx:
+            block = chunk.iloc[:, numeric_idx].to_numpy(dtype=np.float64, na_value=np.nan)
+            self._moments.merge(Moments.from_block(block), [positions[i] for i in numeric_idx])
+            with np.errstate(over="ignore"):
+                exact = (block.astype(np.float32) == block) | np.isnan(block)
+            for i, safe in zip(numeric_idx, exact.all(axis=0)):
+                self._float32_safe[chunk.columns[i]] &= bool(safe)
+        return self
+
+    def merge(self, other):
+        """Fold another profiler (another chunk range or file) into this one."""
+        if ((other.approximate, other.relative_error, other.exact_distinct_limit)
+                != (self.approximate, self.relative_error, self.exact_distinct_limit)):
+            raise ValueError("Cannot merge profilers built with different approximation settings")
+        positions = self._add_columns(other.columns)
+        self.rows += other.rows
+        self._moments.merge(other._moments, positions)
+        for col in other.columns:
+            self._dtypes[col].extend(other._dtypes[col])
+            self._missing[col] += other._missing[col]
+            self._memory[col] += other._memory[col]
+            self._float32_safe[col] &= other._float32_safe[col]
+            if col in other._distinct and col not in self._distinct:
+                # Only the other side has handed over to sketches; this side's counts join them
+                self._add_sketches(col, self._counts[col])
+                self._counts[col] = None
+            if col in self._distinct:
+                if col in other._distinct:
+                    self._distinct[col].merge(other._distinct[col])
+                    self._quantile_sketches[col].merge(other._quantile_sketches[col])
+                else:
+                    distinct, quantiles = self._sketch_counts(other._counts[col])
+                    self._distinct[col].merge(distinct)
+                    self._quantile_sketches[col].merge(quantiles)
+            if other._counts[col] is None:
+                self._counts[col] = None
+            else:
+                self._merge_counts(col, other._counts[col])
+        return self
+
+    def result(self):
+        """Freeze the accumulated state into a DatasetProfile."""
+        dtypes = {col: _resolve_dtype(self._dtypes[col]) for col in self.columns}
+        estimated = []
+        unique, top = {}, {}
+        # Value counts become Series once, here, rather than on every chunk
+        value_counts = {col: None if counts is None else pd.Series(counts, dtype=np.float64)
+                        for col, counts in self._counts.items()}
+        for col in self.columns:
+            counts = value_counts[col]
+            if counts is None:
+                unique[col] = int(round(self._distinct[col].estimate()))
+                top[col] = np.nan
+                estimated.append(f"unique_values.{col}")
+            else:
+                unique[col] = len(counts)
+                top[col] = float(counts.max() / counts.sum()) if len(counts) else 0.0
+
+        moments = self._moments
+        std, skew = moments.std(), moments.skew()
+        position = self._position
+
+        skewness = {col: float(skew[position[col]]) for col, dtype in dtypes.items() if _is_numeric(dtype)}
+        stats = {}
+        for col, dtype in dtypes.items():
+            if str(dtype) not in ("float64", "int64"):
+                continue
+            i = position[col]
+            n = moments.n[i]
+            if n == 0:
+                stats[col] = {"count": 0.0, "mean": np.nan, "std": np.nan, "min": np.nan,
+                              "25%": np.nan, "50%": np.nan, "75%": np.nan, "max": np.nan}
+                continue
+            if value_counts[col] is not None:
+                q25, q50, q75 = _quantiles(value_counts[col].sort_index(), n)
+            else:
+                q25, q50, q75 = self._quantile_sketches[col].quantiles(DESCRIBE_PERCENTILES)
+                estimated.extend(f"stats.{col}.{int(p * 100)}%" for p in DESCRIBE_PERCENTILES)
+            stats[col] = {
+                "count": float(n),
+                "mean": float(moments.mean[i]),
+                "std": float(std[i]),
+                "min": float(moments.min[i]),
+                "25%": float(q25),
+                "50%": float(q50),
+                "75%": float(q75),
+                "max": float(moments.max[i]),
+            }
+        missing = {col: self._missing[col] for col in self.columns}
+        return DatasetProfile(self.columns, self.rows, dtypes, missing, unique, top, stats, skewness,
+                              estimated_fields=estimated, memory_bytes=dict(self._memory),
+                              float32_safe=dict(self._float32_safe), value_counts=value_counts)
+
+def profile_frame(df, **kwargs):
+    """Profile an in-memory DataFrame in one pass."""
+    return DatasetProfiler(**kwargs).update(df).result()
@@ -0,0 +1,131 @@
+# Python/ml/reduction.py
+import os
+import json
+import logging
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils import check_array
+from ml.evaluation import _rows
+
+logger = logging.getLogger(__name__)
+
+# Rows transformed (and streamed) per batch; bounds the memory of embedding a dataset
+REDUCTION_BATCH_ROWS = int(os.getenv("REDUCTION_BATCH_ROWS", 10_000))
+# Above these sizes pca is fitted incrementally (rows) or by randomized SVD (features)
+INCREMENTAL_PCA_ROWS = int(os.getenv("INCREMENTAL_PCA_ROWS", 100_000))
+RANDOMIZED_PCA_FEATURES = int(os.getenv("RANDOMIZED_PCA_FEATURES", 500))
+# Rows t-SNE is fitted on; the rest are placed from their nearest sampled rows
+TSNE_SAMPLE = int(os.getenv("TSNE_SAMPLE", 5000))
+
+EMBEDDING_FORMATS = {"ndjson": "application/x-ndjson", "binary": "application/octet-stream"}
+
+def embedding_path(filename):
+    """Where the embedding of the dataset `filename` is stored."""
+    return f"uploads/embedding_{filename.split('.')[0]}.npy"
+
+class SampledTSNE(TransformerMixin, BaseEstimator):
+    """
+    t-SNE fitted on a random sample of at most `sample_size` rows.
+
+    Every other row (and any new row) is embedded as the distance-weighted
+    mean of its `n_neighbors` nearest sampled rows, so transform() works in
+    batches and the quadratic t-SNE fit stays the size of the sample. With
+    no more rows than `sample_size` the fit is ordinary t-SNE on all of them.
+    """
+
+    def __init__(self, n_components=2, perplexity=30.0, learning_rate="auto", max_iter=1000, init="pca",
+                 sample_size=TSNE_SAMPLE, n_neighbors=5, random_state=42):
+        self.n_components = n_components
+        self.perplexity = perplexity
+        self.learning_rate = learning_rate
+        self.max_iter = max_iter
+        self.init = init
+        self.sample_size = sample_size
+        self.n_neighbors = n_neighbors
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        from sklearn.manifold import TSNE
+        from sklearn.neighbors import NearestNeighbors
+
+        X = check_array(X, accept_sparse="csr")
+        rng = np.random.default_rng(self.random_state)
+        index = np.sort(rng.choice(X.shape[0], size=min(self.sample_size, X.shape[0]), replace=False))
+        self.sample_ = X[index]
+        self.sample_index_ = index
+        tsne = TSNE(n_components=self.n_components, perplexity=min(self.perplexity, len(index) - 1),
+                    learning_rate=self.learning_rate, max_iter=self.max_iter, init=self.init, random_state=self.random_state)
+        self.embedding_ = tsne.fit_transform(self.sample_)
+        self.kl_divergence_ = tsne.kl_divergence_
+        self._neighbors = NearestNeighbors(n_neighbors=min(self.n_neighbors, len(index))).fit(self.sample_)
+        return self
+
+    def transform(self, X):
+        distances, nearest = self._neighbors.kneighbors(check_array(X, accept_sparse="csr"))
+        # A sampled row is its own nearest neighbor at distance 0 and keeps its t-SNE position
+        weights = 1.0 / np.maximum(distances, 1e-12)
+        weights /= weights.sum(axis=1, keepdims=True)
+        return np.einsum("ij,ijk->ik", weights, self.embedding_[nearest])
+
+def large_pca(model_type, params, n_rows, n_features, sparse_input):
+    """
+    The PCA variant to fit for this input size: incremental_pca for tall or
+    sparse inputs, randomized SVD for wide ones, else `model_type` unchanged.
+
+    Returns:
+        tuple: (model_type, params)
+    """
+    params = dict(params or {})
+    if model_type != "pca":
+        return model_type, params
+    if n_rows > INCREMENTAL_PCA_ROWS or sparse_input:
+        # Fitted REDUCTION_BATCH_ROWS rows at a time; sparse batches are densified one at a time
+        params = {name: value for name, value in params.items() if name in ("n_components", "whiten")}
+        return "incremental_pca", {"batch_size": REDUCTION_BATCH_ROWS, **params}
+    if n_features > RANDOMIZED_PCA_FEATURES:
+        return model_type, {"svd_solver": "randomized", "random_state": 42, **params}
+    return model_type, params
+
+def write_embedding(model, X, file_path, batch_rows=REDUCTION_BATCH_ROWS):
+    """
+    Transform X in batches straight into a float32 .npy file, so only one
+    batch of input and output is in memory at a time.
+
+    Returns:
+        tuple: embedded shape (rows, components)
+    """
+    first = np.asarray(model.transform(_rows(X, slice(0, min(batch_rows, X.shape[0])))))
+    shape = (X.shape[0], first.shape[1])
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    output = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape)
+    try:
+        output[:len(first)] = first
+        for start in range(len(first), X.shape[0], batch_rows):
+            batch = np.asarray(model.transform(_rows(X, slice(start, start + batch_rows))))
+            output[start:start + len(batch)] = batch
+        output.flush()
+        del output
+        os.replace(tmp, file_path)
+    except Exception:
+        del output
+        os.remove(tmp)
+        raise
+    logger.info(f"Embedding {shape} written to {file_path}")
+    return shape
+
+def iter_embedding(file_path, offset=0, limit=None, fmt="ndjson", batch_rows=REDUCTION_BATCH_ROWS):
+    """
+    Stream rows [offset, offset + limit) of a stored embedding, one batch at a
+    time: NDJSON (one JSON array per row) or raw little-endian float32 rows.
+    """
+    embedding = np.load(file_path, mmap_mode="r")
+    stop = embedding.shape[0] if limit is None else min(embedding.shape[0], offset + limit)
+    for start in range(offset, stop, batch_rows):
+        batch = np.asarray(embedding[start:min(start + batch_rows, stop)], dtype="<f4")
+        if fmt == "binary":
+            yield batch.tobytes()
+        else:
+            yield "".join(json.dumps(row) + "\n" for row in batch.tolist()).encode()
+
+def embedding_shape(file_path):
+    return np.load(file_path, mmap_mode="r").shape
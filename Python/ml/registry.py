@@ -0,0 +1,180 @@
+# Python/ml/registry.py
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+import numpy as np
+import pyarrow as pa
+import pandas as pd
+from ml.ingest import read_csv_chunks, CSV_CHUNK_ROWS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("DATASET_REGISTRY_MAX_BYTES", 2 * 1024 ** 3))
+
+def _arrow_type(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Every batch is parsed against the same categories, so one dictionary serves the file
+        codes = pd.Categorical([], dtype=dtype).codes.dtype
+        return pa.dictionary(pa.from_numpy_dtype(codes), pa.large_string())
+    if dtype == object:
+        return pa.large_string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+@contextmanager
+def locked_json(path, thread_lock, write=False):
+    """
+    Read (and optionally rewrite) a JSON index file under an exclusive lock.
+
+    The file is re-read on every access because worker processes share it.
+    Its directory is created on first use rather than when the store is built,
+    so importing a module with a store instance leaves the filesystem alone.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with thread_lock, open(f"{path}.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        yield entries
+        if write:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, path)
+
+class DatasetRegistry:
+    """
+    Content-addressed store of parsed datasets.
+
+    Each dataset is kept once, keyed by the SHA-256 of its raw CSV bytes, as an
+    uncompressed Arrow IPC file that can be memory-mapped back without parsing.
+    Entries are evicted least-recently-used first once the store exceeds
+    `max_bytes`.
+    """
+
+    def __init__(self, root="uploads/datasets", max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root, "index.json")
+
+    def _path(self, dataset_id):
+        return os.path.join(self.root, f"{dataset_id}.arrow")
+
+    def _tmp_path(self, dataset_id):
+        """Where a dataset is written before being renamed into place; creates the root on first write."""
+        os.makedirs(self.root, exist_ok=True)
+        return f"{self._path(dataset_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _index(self, write=False):
+        return locked_json(self._index_path, self._lock, write)
+
+    def __contains__(self, dataset_id):
+        with self._index() as entries:
+            return dataset_id in entries and os.path.exists(self._path(dataset_id))
+
+    def filename(self, dataset_id):
+        """Original upload name of a registered dataset."""
+        with self._index() as entries:
+            return entries[dataset_id]["filename"]
+
+    def total_bytes(self):
+        with self._index() as entries:
+            return sum(entry["size"] for entry in entries.values())
+
+    def _commit(self, dataset_id, filename):
+        with self._index(write=True) as entries:
+            entries[dataset_id] = {
+                "filename": filename,
+                "size": os.path.getsize(self._path(dataset_id)),
+                "last_used": time.time(),
+            }
+            self._evict(entries, keep=dataset_id)
+        return dataset_id
+
+    def _evict(self, entries, keep=None):
+        """Drop least-recently-used entries until the store fits in max_bytes."""
+        total = sum(entry["size"] for entry in entries.values())
+        for dataset_id, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if dataset_id == keep:
+                continue
+            try:
+                os.remove(self._path(dataset_id))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del entries[dataset_id]
+            logger.info(f"Evicted dataset {dataset_id} from registry")
+
+    def add_csv(self, dataset_id, file_location, filename, dtypes, chunksize=None):
+        """
+        Store a CSV chunk by chunk, with column types fixed up front.
+
+        Args:
+            dtypes (dict): column -> dtype, e.g. the plan from ml.ingest.plan_dtypes
+        """
+        if dataset_id in self:
+            self.touch(dataset_id)
+            return dataset_id
+        schema = pa.schema([(col, _arrow_type(dtype)) for col, dtype in dtypes.items()])
+        kwargs = {"chunksize": chunksize} if chunksize else {}
+        tmp = self._tmp_path(dataset_id)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for chunk in read_csv_chunks(file_location, dtype=dtypes, **kwargs):
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        os.replace(tmp, self._path(dataset_id))
+        return self._commit(dataset_id, filename)
+
+    def add_frame(self, dataset_id, df, filename):
+        """Store an already parsed DataFrame."""
+        if dataset_id in self:
+            self.touch(dataset_id)
+            return dataset_id
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp = self._tmp_path(dataset_id)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, self._path(dataset_id))
+        return self._commit(dataset_id, filename)
+
+    def touch(self, dataset_id):
+        with self._index(write=True) as entries:
+            if dataset_id in entries:
+                entries[dataset_id]["last_used"] = time.time()
+
+    def load(self, dataset_id):
+        """Memory-map a registered dataset back into a DataFrame."""
+        if dataset_id not in self:
+            raise KeyError(f"Unknown dataset_id '{dataset_id}'")
+        self.touch(dataset_id)
+        source = pa.memory_map(self._path(dataset_id), "r")
+        table = pa.ipc.open_file(source).read_all()
+        # split_blocks keeps numeric columns as views on the mapped buffers
+        return table.to_pandas(split_blocks=True)
+
+    def iter_chunks(self, dataset_id, chunksize=CSV_CHUNK_ROWS):
+        """Yield a registered dataset as DataFrames of at most `chunksize` rows, never loading it whole."""
+        if dataset_id not in self:
+            raise KeyError(f"Unknown dataset_id '{dataset_id}'")
+        self.touch(dataset_id)
+        with pa.memory_map(self._path(dataset_id), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(start, chunksize).to_pandas()
+
+# Create a global instance for easier imports
+dataset_registry = DatasetRegistry()
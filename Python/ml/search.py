@@ -0,0 +1,211 @@
+# Python/ml/search.py
+import os
+import time
+import logging
+import itertools
+import multiprocessing
+import numpy as np
+from ml.models import MODEL_CATALOG, ModelFactory, ModelTrainer
+from ml.evaluation import METRICS, PRIMARY_METRIC, _rows, available_cores
+
+logger = logging.getLogger(__name__)
+
+# Search defaults: configurations sampled, wall-clock seconds, fits allowed and parallel fits (-1: every core available)
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", 16))
+SEARCH_BUDGET = float(os.getenv("SEARCH_BUDGET", 300))
+SEARCH_MAX_FITS = int(os.getenv("SEARCH_MAX_FITS", 64))
+SEARCH_JOBS = int(os.getenv("SEARCH_JOBS", -1))
+
+# task_type -> model_type -> parameter -> values sampled from
+SEARCH_SPACES = {
+    "classification": {
+        'logistic_regression': {"C": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0], "class_weight": [None, "balanced"]},
+        'random_forest': {"n_estimators": [50, 100, 200, 400], "max_depth": [None, 5, 10, 20],
+                          "min_samples_leaf": [1, 2, 5, 10], "max_features": ["sqrt", "log2", None]},
+        'decision_tree': {"max_depth": [None, 3, 5, 10, 20], "min_samples_leaf": [1, 2, 5, 10, 20],
+                          "criterion": ["gini", "entropy"]},
+        'knn': {"n_neighbors": [3, 5, 7, 11, 15, 25], "weights": ["uniform", "distance"]},
+        'svm': {"C": [0.1, 1.0, 10.0, 100.0], "gamma": ["scale", 0.01, 0.1, 1.0]},
+        'gradient_boosting': {"n_estimators": [50, 100, 200], "learning_rate": [0.03, 0.1, 0.3],
+                              "max_depth": [2, 3, 5], "subsample": [0.7, 1.0]},
+        'sgd': {"alpha": [1e-6, 1e-5, 1e-4, 1e-3, 1e-2], "penalty": ["l2", "l1", "elasticnet"]},
+        'naive_bayes': {"var_smoothing": [1e-11, 1e-9, 1e-7, 1e-5, 1e-3]},
+        'nystroem_svm': {"C": [0.1, 1.0, 10.0, 100.0], "gamma": ["scale", 0.01, 0.1, 1.0]},
+        'hist_gradient_boosting': {"learning_rate": [0.03, 0.1, 0.3], "max_leaf_nodes": [15, 31, 63],
+                                   "min_samples_leaf": [10, 20, 50], "l2_regularization": [0.0, 0.1, 1.0]},
+        'approximate_knn': {"n_neighbors": [3, 5, 7, 11, 15, 25], "weights": ["uniform", "distance"]},
+    },
+    "regression": {
+        'linear_regression': {"fit_intercept": [True, False]},
+        'random_forest': {"n_estimators": [50, 100, 200, 400], "max_depth": [None, 5, 10, 20],
+                          "min_samples_leaf": [1, 2, 5, 10], "max_features": [1.0, "sqrt", 0.5]},
+        'decision_tree': {"max_depth": [None, 3, 5, 10, 20], "min_samples_leaf": [1, 2, 5, 10, 20]},
+        'knn': {"n_neighbors": [3, 5, 7, 11, 15, 25], "weights": ["uniform", "distance"]},
+        'svm': {"C": [0.1, 1.0, 10.0, 100.0], "epsilon": [0.01, 0.1, 0.5], "gamma": ["scale", 0.01, 0.1]},
+        'ridge': {"alpha": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0]},
+        'lasso': {"alpha": [0.0001, 0.001, 0.01, 0.1, 1.0, 10.0]},
+        'gradient_boosting': {"n_estimators": [50, 100, 200], "learning_rate": [0.03, 0.1, 0.3],
+                              "max_depth": [2, 3, 5], "subsample": [0.7, 1.0]},
+        'sgd': {"alpha": [1e-6, 1e-5, 1e-4, 1e-3, 1e-2], "penalty": ["l2", "l1", "elasticnet"]},
+        'nystroem_svm': {"C": [0.1, 1.0, 10.0, 100.0], "epsilon": [0.01, 0.1, 0.5], "gamma": ["scale", 0.01, 0.1]},
+        'hist_gradient_boosting': {"learning_rate": [0.03, 0.1, 0.3], "max_leaf_nodes": [15, 31, 63],
+                                   "min_samples_leaf": [10, 20, 50], "l2_regularization": [0.0, 0.1, 1.0]},
+        'approximate_knn': {"n_neighbors": [3, 5, 7, 11, 15, 25], "weights": ["uniform", "distance"]},
+    },
+}
+
+def sample_configurations(space, n_candidates, random_state=42):
+    """Up to `n_candidates` distinct configurations: the whole grid if it is that small, else a random sample of it."""
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if len(grid) <= n_candidates:
+        return grid
+    rng = np.random.default_rng(random_state)
+    return [grid[i] for i in sorted(rng.choice(len(grid), size=n_candidates, replace=False))]
+
+def stratified_order(y):
+    """
+    Row order whose every prefix keeps the class proportions of `y`: each
+    class's rows are spread evenly through it, and every class appears within
+    the first rows, so small row budgets never see a single class.
+    """
+    _, classes = np.unique(np.asarray(y, dtype=object).astype(str), return_inverse=True)
+    position = np.empty(len(classes), dtype=np.float64)
+    for label in range(classes.max() + 1 if len(classes) else 0):
+        members = np.flatnonzero(classes == label)
+        position[members] = np.arange(len(members)) / len(members)
+    return np.argsort(position, kind="stable")
+
+def _fit_trial(task_type, model_type, params, X_fit, y_fit, X_val, y_val, n_rows):
+    """
+    Fit one configuration on the first `n_rows` fitting rows and score it on the validation rows.
+
+    Returns:
+        tuple: (metrics, fit seconds, error message or None); a configuration that fails leaves no metrics
+    """
+    started = time.perf_counter()
+    try:
+        model = ModelFactory(MODEL_CATALOG[task_type]).create(model_type, params)
+        model.fit(_rows(X_fit, slice(0, n_rows)), _rows(y_fit, slice(0, n_rows)))
+        fit_seconds = time.perf_counter() - started
+        return METRICS[task_type](y_val, model.predict(X_val)), fit_seconds, None
+    except Exception as e:
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {str(e)}"
+
+def successive_halving(df, target_column, task_type, model_type, space=None, n_candidates=SEARCH_CANDIDATES,
+                       factor=3, min_rows=None, time_budget=SEARCH_BUDGET, max_fits=SEARCH_MAX_FITS,
+                       patience=1, tol=1e-4, n_jobs=SEARCH_JOBS, random_state=42, progress=None):
+    """
+    Successive-halving search over training rows.
+
+    Every sampled configuration is fitted on a small row budget; the best
+    1/`factor` of them move on to `factor` times more rows, until one is left
+    or all rows are used. Each round's fits run in parallel. The search stops
+    early once `time_budget` seconds or `max_fits` fits are spent (running
+    fits finish; the rest are skipped), or when the round's best score has
+    improved by less than `tol` for `patience` rounds. Scores come from a
+    validation split held out of the rows given here; for classification the
+    row budgets are stratified prefixes (see stratified_order). A
+    configuration whose fit fails is recorded with status "failed", its error
+    and a score of -inf (reported as null), and is not carried forward.
+
+    Returns:
+        tuple: (best params, search report with the full trial history)
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import train_test_split
+
+    if task_type not in PRIMARY_METRIC:
+        raise ValueError(f"Search supports classification and regression, not {task_type}")
+    space = space or SEARCH_SPACES[task_type].get(model_type)
+    if not space:
+        raise ValueError(f"No search space for {task_type} model '{model_type}'")
+    space = {name: values if isinstance(values, list) else [values] for name, values in space.items()}
+    metric = PRIMARY_METRIC[task_type]
+    report = progress or (lambda stage: None)
+    started = time.perf_counter()
+
+    X, y, _ = ModelTrainer.design_matrix(df, target_column, task_type, model_type)
+    # Shuffled once, so every round's row prefix is a random sample
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=random_state)
+    if task_type == "classification":
+        order = stratified_order(y_fit)
+        X_fit, y_fit = _rows(X_fit, order), _rows(y_fit, order)
+    n_available = X_fit.shape[0]
+
+    configurations = sample_configurations(space, n_candidates, random_state)
+    rounds = max(1, int(np.ceil(np.log(len(configurations)) / np.log(factor))) + 1) if len(configurations) > 1 else 1
+    n_rows = max(min_rows or 0, n_available // factor ** (rounds - 1), min(n_available, 2 * factor * 10))
+    backend = "threading" if multiprocessing.current_process().daemon else "loky"
+    n_jobs = available_cores() if n_jobs == -1 else n_jobs
+
+    report("fit")
+    history = []
+    survivors = list(range(len(configurations)))
+    best_scores = []
+    stopped = "completed"
+    for round_index in range(rounds):
+        n_rows = min(n_rows, n_available)
+        round_trials = []
+        # Batches of n_jobs fits, so the budget is checked while the round runs; the first batch always runs
+        for batch_start in range(0, len(survivors), n_jobs):
+            if history and time.perf_counter() - started >= time_budget:
+                stopped = "time_budget"
+                break
+            batch = survivors[batch_start:batch_start + n_jobs][:max(0, max_fits - len(history))]
+            if not batch:
+                stopped = "max_fits"
+                break
+            outcomes = Parallel(n_jobs=min(len(batch), n_jobs), backend=backend)(
+                delayed(_fit_trial)(task_type, model_type, configurations[i], X_fit, y_fit, X_val, y_val, n_rows) for i in batch)
+            for i, (metrics, fit_seconds, error) in zip(batch, outcomes):
+                trial = {"trial": len(history), "round": round_index, "candidate": i, "params": configurations[i],
+                         "n_rows": int(n_rows), "status": "failed" if error else "ok",
+                         "score": float("-inf") if error else metrics[metric], "metrics": metrics,
+                         "fit_seconds": round(fit_seconds, 4)}
+                if error:
+                    trial["error"] = error
+                    logger.warning(f"Search trial {trial['trial']} ({configurations[i]}) failed: {error}")
+                history.append(trial)
+                round_trials.append(trial)
+        if not round_trials:
+            break
+        # Lower MSE/MAE would need flipping; the primary metrics (accuracy, R²) are maximized
+        round_trials.sort(key=lambda trial: trial["score"], reverse=True)
+        best_scores.append(round_trials[0]["score"])
+        logger.info(f"Search round {round_index}: {len(round_trials)} fits on {n_rows} rows, best {metric}={best_scores[-1]:.4f}")
+        if stopped != "completed":
+            break
+        if len(best_scores) > patience and best_scores[-1] - max(best_scores[:-patience]) < tol and n_rows >= n_available // factor:
+            stopped = "plateau"
+            break
+        fitted = [trial for trial in round_trials if trial["status"] == "ok"]
+        survivors = [trial["candidate"] for trial in fitted[:max(1, len(round_trials) // factor)]]
+        if not survivors:
+            break
+        if len(survivors) == 1 and n_rows >= n_available or round_index == rounds - 1:
+            break
+        n_rows *= factor
+
+    if not history:
+        raise ValueError("max_fits must allow at least one fit")
+    succeeded = [trial for trial in history if trial["status"] == "ok"]
+    if not succeeded:
+        raise ValueError(f"Every configuration failed to fit, e.g. {history[0]['params']}: {history[0]['error']}")
+    # The best configuration from the largest row budget it reached
+    top = max(succeeded, key=lambda trial: (trial["n_rows"], trial["score"]))
+    for trial in history:
+        if trial["status"] == "failed":
+            trial["score"] = None  # -inf ranks it last but isn't valid JSON
+    search = {
+        "model_type": model_type,
+        "metric": metric,
+        "best_params": top["params"],
+        "best_score": top["score"],
+        "candidates": len(configurations),
+        "fits": len(history),
+        "stopped": stopped,
+        "search_seconds": round(time.perf_counter() - started, 4),
+        "trials": history,
+    }
+    return top["params"], search
@@ -0,0 +1,134 @@
+# Python/ml/serving.py
+import io
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+import pandas as pd
+from ml.models import DENSE_ONLY_MODELS, is_sparse_frame
+
+logger = logging.getLogger(__name__)
+
+# Loaded pipelines kept in memory, and rows scored per vectorized batch
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", 8))
+PREDICT_BATCH_ROWS = int(os.getenv("PREDICT_BATCH_ROWS", 50_000))
+
+def pipeline_path(filename):
+    """Where the pipeline artifact trained on `filename` is stored."""
+    return f"uploads/trained_pipeline_{filename.split('.')[0]}.pkl"
+
+class ModelPipeline:
+    """
+    A fitted preprocessor and model, saved together so raw rows can be scored.
+
+    `training` records what the model was fitted on for incremental updates
+    (see ml.incremental): fit_rows and fit_seconds of the original fit, rows
+    seen since, and one entry per update.
+    """
+
+    def __init__(self, preprocessor, model, task_type, model_type, target_column=None, training=None):
+        self.preprocessor = preprocessor
+        self.model = model
+        self.task_type = task_type
+        self.model_type = model_type
+        self.target_column = target_column
+        self.training = training
+
+    def predict(self, df, batch_rows=PREDICT_BATCH_ROWS):
+        """
+        Score raw rows in batches of `batch_rows`.
+
+        Returns:
+            dict: "predictions", plus "probabilities" and "classes" for classifiers that support them
+        """
+        if self.task_type == "dimensionality_reduction":
+            score = self.model.transform
+        elif hasattr(self.model, "predict"):
+            score = self.model.predict
+        else:
+            raise ValueError(f"{self.model_type} models cannot score new rows")
+        with_proba = self.task_type == "classification" and hasattr(self.model, "predict_proba")
+
+        predictions, probabilities = [], []
+        for start in range(0, len(df), batch_rows):
+            X = self.preprocessor.transform(df.iloc[start:start + batch_rows])
+            if is_sparse_frame(X):
+                # Match what the model was fitted on (see ModelTrainer.train_model)
+                dense_only = (self.task_type, self.model_type) in DENSE_ONLY_MODELS
+                X = X.sparse.to_dense() if dense_only else X.sparse.to_coo().tocsr()
+            predictions.append(np.asarray(score(X)))
+            if with_proba:
+                probabilities.append(self.model.predict_proba(X))
+
+        result = {"predictions": np.concatenate(predictions).tolist() if predictions else []}
+        if with_proba:
+            result["classes"] = self.model.classes_.tolist()
+            result["probabilities"] = np.concatenate(probabilities).tolist() if probabilities else []
+        return result
+
+def save_pipeline(pipeline, file_path):
+    # Written aside and renamed into place, so /predict never loads a half-written pickle
+    tmp = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    joblib.dump(pipeline, tmp)
+    os.replace(tmp, file_path)
+    logger.info(f"Pipeline saved to {file_path}")
+    return file_path
+
+class PipelineCache:
+    """
+    In-memory LRU of loaded pipeline artifacts.
+
+    Entries are keyed by path and modification time, so retraining the same
+    file replaces the cached pipeline on its next use.
+    """
+
+    def __init__(self, maxsize=PREDICT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, file_path):
+        """
+        Return (pipeline, cache_hit); raises FileNotFoundError if there is no artifact.
+
+        A miss loads from disk, so call this off the event loop. Concurrent
+        misses on the same artifact wait for one load instead of each loading it.
+        """
+        key = (file_path, os.stat(file_path).st_mtime_ns)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key], True
+            loading = self._loading.setdefault(file_path, threading.Lock())
+        with loading:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key], True
+            pipeline = joblib.load(file_path)
+            self._store(file_path, key, pipeline)
+        return pipeline, False
+
+    def _store(self, file_path, key, pipeline):
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == file_path]:
+                del self._entries[stale]
+            self._entries[key] = pipeline
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+def parse_rows(body, content_type):
+    """Build a DataFrame from a CSV body or a JSON list of records ({"rows": [...]} also accepted)."""
+    if "json" in content_type:
+        rows = json.loads(body)
+        if isinstance(rows, dict):
+            rows = rows.get("rows", [])
+        return pd.DataFrame.from_records(rows)
+    return pd.read_csv(io.BytesIO(body))
+
+# Create a global instance for easier imports
+pipeline_cache = PipelineCache()
@@ -0,0 +1,133 @@
+# Python/ml/sketches.py
+import numpy as np
+import pandas as pd
+
+def _hash_values(values):
+    """64-bit hashes of a column's non-null values; numbers hash by value, not dtype."""
+    values = pd.Series(values).dropna().to_numpy()
+    if values.dtype.kind in "iufb":
+        values = values.astype(np.float64)
+    return pd.util.hash_array(values)
+
+def _bit_length(w):
+    """Vectorized int.bit_length for a nonzero uint64 array."""
+    bits = np.floor(np.log2(w.astype(np.float64))).astype(np.int64) + 1
+    # float64 rounding can overshoot by one just below a power of two
+    overshoot = (np.uint64(1) << (bits - 1).astype(np.uint64)) > w
+    return bits - overshoot
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count estimator.
+
+    Standard error is about 1.04 / sqrt(2 ** precision); use
+    HyperLogLog.for_error to size it from a target relative error.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, relative_error):
+        precision = int(np.ceil(2 * np.log2(1.04 / relative_error)))
+        return cls(min(max(precision, 4), 18))
+
+    def update(self, values):
+        hashes = _hash_values(values)
+        if not len(hashes):
+            return self
+        p = np.uint64(self.precision)
+        idx = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        # Remaining bits, with a sentinel so rank never exceeds 64 - p + 1
+        w = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        rank = (64 - _bit_length(w) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * np.log(m / zeros)
+        return raw
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin, Lang & Liberty).
+
+    Rank error is roughly 2 / k; use KLLSketch.for_error to size it from a
+    target relative error. Values are added a whole array at a time.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, relative_error, seed=None):
+        return cls(max(int(np.ceil(2 / relative_error)), 16), seed=seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind; every other item moves up with double weight
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.compactors[level] = keep
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+                # Capacities shrink when a level is added, so start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.n += len(values)
+            self.compactors[0] = np.concatenate([self.compactors[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(c), 2.0 ** level) for level, c in enumerate(self.compactors)])
+        order = np.argsort(items)
+        items, cumulative = items[order], np.cumsum(weights[order])
+        ranks = np.asarray(qs) * cumulative[-1]
+        return items[np.minimum(np.searchsorted(cumulative, ranks, side="left"), len(items) - 1)]
@@ -1,16 +1,66 @@
 import pandas as pd
 import numpy as np
 import os
+import copy
+import json
+import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Union, Tuple
 from dotenv import load_dotenv
-import google.generativeai as genai
-from google.generativeai import GenerativeModel
+from ml.profile import DatasetProfile, profile_frame
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Hard deadline for one Gemini call, and how long/how many answers are reused
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 10))
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", 3600))
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", 256))
+# Model calls allowed to run at once, including ones that missed their deadline and are still running
+GEMINI_MAX_CALLS = int(os.getenv("GEMINI_MAX_CALLS", 4))
+
+def summary_fingerprint(summary: Dict) -> str:
+    """Stable hash of the parts of a summary the Gemini prompt is built from."""
+    key = {k: summary[k] for k in ("columns", "data_types", "missing_values")}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+class InsightCache:
+    """
+    LRU cache whose entries also expire after `ttl` seconds. Thread-safe:
+    late Gemini results are stored from executor threads while requests read it.
+    """
+    
+    def __init__(self, maxsize: int = GEMINI_CACHE_SIZE, ttl: float = GEMINI_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+    
+    def put(self, key: str, value: Dict) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
 class DatasetAnalyzer:
     """
     A class for analyzing datasets and providing insights and recommendations
@@ -30,31 +80,65 @@ class DatasetAnalyzer:
     DEFAULT_TASK = "clustering"
     DEFAULT_TARGET = None
     
-    def __init__(self):
-        """Initialize the DatasetAnalyzer with Gemini API if available."""
+    BATCH_MARKER = "### Dataset:"
+    
+    def __init__(self, 
+                 model=None, 
+                 api_timeout: float = GEMINI_TIMEOUT, 
+                 cache: Optional[InsightCache] = None):
+        """
+        Initialize the DatasetAnalyzer with Gemini API if available.
+        
+        Args:
+            model: Optional object with a generate_content(prompt) method returning
+                something with a .text attribute; used instead of Gemini (e.g. a local stub)
+            api_timeout: Seconds to wait for a model answer before falling back to manual analysis
+            cache: Optional InsightCache for model answers
+        """
         load_dotenv()
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.model = None
+        self._model = model
+        self._configured = model is not None
+        self.api_timeout = api_timeout
+        self.cache = cache if cache is not None else InsightCache()
+        self._executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CALLS, thread_name_prefix="insights")
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
         
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = GenerativeModel('gemini-1.5-flash')
-                logger.info("Gemini API configured successfully.")
-            except Exception as e:
-                logger.error(f"Error configuring Gemini API: {str(e)}. Will use fallback analysis.")
-        else:
+        if not self.api_key and model is None:
             logger.warning("GEMINI_API_KEY not found in environment variables. Will use fallback analysis.")
     
+    @property
+    def model(self):
+        """The Gemini client, configured on first use so importing this module stays cheap."""
+        if not self._configured:
+            self._configured = True
+            if self.api_key:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel('gemini-1.5-flash')
+                    logger.info("Gemini API configured successfully.")
+                except Exception as e:
+                    logger.error(f"Error configuring Gemini API: {str(e)}. Will use fallback analysis.")
+        return self._model
+    
     def get_dataset_insights(self, 
                            summary: Dict, 
-                           df: Optional[pd.DataFrame] = None) -> Dict:
+                           df: Optional[pd.DataFrame] = None,
+                           profile: Optional[DatasetProfile] = None,
+                           use_api: bool = True) -> Dict:
         """
         Analyze dataset summary and provide insights and recommendations.
         
+        Answers from the API are cached by summary fingerprint; a call that
+        misses the deadline falls back to manual analysis.
+        
         Args:
             summary: Dictionary containing dataset summary (columns, data types, missing values)
             df: Optional DataFrame for fallback analysis if API is unavailable
+            profile: Optional precomputed DatasetProfile, used instead of df
+            use_api: Set to False to skip the API and use manual analysis only
             
         Returns:
             Dictionary with insights, suggested task type, and target column
@@ -67,15 +151,24 @@ class DatasetAnalyzer:
             raise ValueError(f"Summary must contain the following keys: {required_keys}")
             
         # Try using Gemini API if available
-        if self.model:
+        if use_api and self.model:
+            key = summary_fingerprint(summary)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
             try:
-                return self._get_insights_from_api(summary)
+                # An answer arriving after the deadline still fills the cache for the next request
+                result = self._with_deadline(self._get_insights_from_api, summary, on_late=lambda late: self.cache.put(key, late))
+                self.cache.put(key, result)
+                return result
+            except TimeoutError as e:
+                logger.warning(f"{str(e)}. Falling back to manual analysis.")
             except Exception as e:
                 logger.error(f"Error generating insights with Gemini API: {str(e)}")
                 logger.info("Falling back to manual analysis.")
         
         # Fallback to manual analysis
-        return self._get_insights_manually(summary, df)
+        return self._get_insights_manually(summary, df, profile)
     
     def _get_insights_from_api(self, summary: Dict) -> Dict:
         """
@@ -87,15 +180,137 @@ class DatasetAnalyzer:
         Returns:
             Dictionary with insights, suggested task type, and target column
         """
-        columns = summary["columns"]
-        data_types = summary["data_types"]
-        missing_values = summary["missing_values"]
-        
         prompt = (
             f"I have a dataset with the following details:\n"
-            f"Columns: {columns}\n"
-            f"Data Types: {data_types}\n"
-            f"Missing Values: {missing_values}\n\n"
+            f"{self._describe_summary(summary)}\n"
+            f"{self._instructions()}"
+        )
+        
+        response = self.model.generate_content(prompt)
+        response_text = response.text
+        logger.debug(f"Gemini API response preview: {response_text[:100]}...")
+        return self._parse_response(response_text, summary["columns"])
+    
+    def get_batch_insights(self, summaries: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Get API insights for several datasets with at most one model call.
+        
+        Cached datasets are answered from the cache; the rest share one prompt
+        under the same deadline as a single call.
+        
+        Args:
+            summaries: Mapping of dataset name to its summary
+            
+        Returns:
+            Insights for every dataset the API (or cache) answered; callers should
+            use manual analysis for any name that is missing
+        """
+        if not self.model:
+            return {}
+        
+        results = {}
+        pending = {}
+        for name, summary in summaries.items():
+            cached = self.cache.get(summary_fingerprint(summary))
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending[name] = summary
+        
+        def cache_answers(answered):
+            for name, insights in answered.items():
+                self.cache.put(summary_fingerprint(pending[name]), insights)
+        
+        try:
+            if len(pending) == 1:
+                (name, summary), = pending.items()
+                answered = {name: self._with_deadline(self._get_insights_from_api, summary,
+                                                      on_late=lambda late: cache_answers({name: late}))}
+            elif pending:
+                answered = self._with_deadline(self._get_batch_insights_from_api, pending, on_late=cache_answers)
+            else:
+                answered = {}
+        except TimeoutError as e:
+            logger.warning(f"{str(e)}. Falling back to manual analysis.")
+            return results
+        except Exception as e:
+            logger.error(f"Error generating batch insights with Gemini API: {str(e)}")
+            return results
+        
+        cache_answers(answered)
+        results.update(answered)
+        return results
+    
+    def _get_batch_insights_from_api(self, summaries: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Get insights for several datasets from one Gemini API prompt.
+        
+        Args:
+            summaries: Mapping of dataset name to its summary
+            
+        Returns:
+            Insights for every dataset whose section could be found in the response
+        """
+        sections = "\n".join(
+            f"{self.BATCH_MARKER} {name}\n{self._describe_summary(summary)}"
+            for name, summary in summaries.items()
+        )
+        prompt = (
+            f"I have {len(summaries)} datasets with the following details:\n\n"
+            f"{sections}\n"
+            f"Answer separately for each dataset, starting each answer with a line "
+            f"'{self.BATCH_MARKER} <dataset name>'. For each dataset:\n"
+            f"{self._instructions()}"
+        )
+        
+        response = self.model.generate_content(prompt)
+        response_text = response.text
+        logger.debug(f"Gemini API batch response preview: {response_text[:100]}...")
+        
+        results = {}
+        for block in response_text.split(self.BATCH_MARKER)[1:]:
+            header, _, body = block.partition('\n')
+            name = header.strip()
+            if name in summaries:
+                results[name] = self._parse_response(body, summaries[name]["columns"])
+        return results
+    
+    def _with_deadline(self, fn, *args, on_late=None):
+        """
+        Run a blocking model call on the worker threads, raising TimeoutError after api_timeout.
+        
+        A running call can't be interrupted, so one that misses the deadline
+        keeps its thread until it returns (its result then goes to `on_late`).
+        While every thread is held by such calls, new calls fail at once
+        instead of queueing behind them.
+        """
+        with self._in_flight_lock:
+            if len(self._in_flight) >= GEMINI_MAX_CALLS:
+                raise TimeoutError(f"Gemini API busy: {len(self._in_flight)} earlier calls are still running")
+            future = self._executor.submit(fn, *args)
+            self._in_flight.add(future)
+        future.add_done_callback(self._call_done)
+        try:
+            return future.result(timeout=self.api_timeout)
+        except TimeoutError:
+            if on_late is not None:
+                future.add_done_callback(lambda done: done.exception() is None and on_late(done.result()))
+            raise TimeoutError(f"Gemini API did not answer within {self.api_timeout}s") from None
+    
+    def _call_done(self, future):
+        with self._in_flight_lock:
+            self._in_flight.discard(future)
+    
+    @staticmethod
+    def _describe_summary(summary: Dict) -> str:
+        return (
+            f"Columns: {summary['columns']}\n"
+            f"Data Types: {summary['data_types']}\n"
+            f"Missing Values: {summary['missing_values']}\n"
+        )
+    
+    def _instructions(self) -> str:
+        return (
             f"1. Provide 3-5 bullet point insights about the dataset (e.g., potential issues, interesting patterns). "
             f"Format each point as '- Point text here' on a new line.\n"
             f"2. Suggest the most suitable machine learning task type (choose one): "
@@ -103,11 +318,18 @@ class DatasetAnalyzer:
             f"3. If the task type requires a target column (e.g., classification, regression), recommend the best target column from the list of columns. "
             f"If the task type does not require a target column (e.g., clustering), return 'None' for the target column."
         )
+    
+    def _parse_response(self, response_text: str, columns: List[str]) -> Dict:
+        """
+        Parse one dataset's answer from a Gemini API response.
         
-        response = self.model.generate_content(prompt)
-        response_text = response.text
-        logger.debug(f"Gemini API response preview: {response_text[:100]}...")
-        
+        Args:
+            response_text: Response text (or one dataset's section of it)
+            columns: Columns of the dataset, used to validate the target column
+            
+        Returns:
+            Dictionary with insights, suggested task type, and target column
+        """
         # Default values
         insights = []
         suggested_task_type = self.DEFAULT_TASK
@@ -161,13 +383,15 @@ class DatasetAnalyzer:
     
     def _get_insights_manually(self, 
                              summary: Dict, 
-                             df: Optional[pd.DataFrame] = None) -> Dict:
+                             df: Optional[pd.DataFrame] = None,
+                             profile: Optional[DatasetProfile] = None) -> Dict:
         """
         Get dataset insights using manual heuristics when API is unavailable.
         
         Args:
             summary: Dictionary containing dataset summary
             df: Optional DataFrame for analysis
+            profile: Optional precomputed DatasetProfile, used instead of df
             
         Returns:
             Dictionary with insights, suggested task type, and target column
@@ -176,12 +400,15 @@ class DatasetAnalyzer:
         data_types = summary["data_types"]
         missing_values = summary["missing_values"]
         
+        if profile is None and df is not None:
+            profile = profile_frame(df)
+        
         # Initialize insights as list
         insights = []
         
         # Add initial insight about data size
-        if df is not None:
-            insights.append(f"Dataset contains {df.shape[0]} rows and {df.shape[1]} columns")
+        if profile is not None:
+            insights.append(f"Dataset contains {profile.rows} rows and {len(profile.columns)} columns")
         else:
             insights.append(f"Dataset contains {len(columns)} columns")
         
@@ -196,7 +423,7 @@ class DatasetAnalyzer:
         suggested_task_type = self.DEFAULT_TASK
         suggested_target_column = self.DEFAULT_TARGET
         
-        if df is None:
+        if profile is None:
             insights.append("Cannot perform detailed analysis without DataFrame object")
             return {
                 "insights": insights,
@@ -205,20 +432,19 @@ class DatasetAnalyzer:
             }
         
         # Analyze data types
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-        datetime_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+        numeric_cols = profile.numeric_columns
+        categorical_cols = profile.categorical_columns
+        datetime_cols = profile.datetime_columns
         
         # Add insight about data types
         insights.append(f"Dataset contains {len(numeric_cols)} numeric, {len(categorical_cols)} categorical{f', and {len(datetime_cols)} datetime' if datetime_cols else ''} columns")
         
         # Check for potential classification targets
         for col in categorical_cols:
-            unique_values = df[col].nunique()
+            unique_values = profile.unique_values[col]
             if 2 <= unique_values <= 10:
                 # Get class distribution
-                class_dist = df[col].value_counts(normalize=True)
-                balance_info = "balanced" if class_dist.max() < 0.7 else "imbalanced"
+                balance_info = "balanced" if profile.top_frequency[col] < 0.7 else "imbalanced"
                 
                 insights.append(f"Column '{col}' has {unique_values} unique values with {balance_info} distribution")
                 suggested_task_type = "classification"
@@ -228,10 +454,10 @@ class DatasetAnalyzer:
         # Check for potential regression targets if no classification target found
         if suggested_target_column is None:
             for col in numeric_cols:
-                unique_values = df[col].nunique()
+                unique_values = profile.unique_values[col]
                 if unique_values > 20:
                     # Get distribution info
-                    skew = df[col].skew()
+                    skew = profile.skewness[col]
                     skew_desc = "highly skewed" if abs(skew) > 1 else "relatively normal"
                     
                     insights.append(f"Column '{col}' has continuous values with {skew_desc} distribution (skew: {skew:.2f})")
@@ -259,8 +485,8 @@ class DatasetAnalyzer:
 dataset_analyzer = DatasetAnalyzer()
 
 # For backwards compatibility with code using the function
-def get_dataset_insights(summary, df=None):
+def get_dataset_insights(summary, df=None, profile=None, use_api=True):
     """
     Wrapper function for backward compatibility.
     """
-    return dataset_analyzer.get_dataset_insights(summary, df)
\ No newline at end of file
+    return dataset_analyzer.get_dataset_insights(summary, df, profile, use_api)
\ No newline at end of file
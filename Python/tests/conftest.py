@@ -0,0 +1,27 @@
+# Python/tests/conftest.py
+import os
+import sys
+import pytest
+
+# Tests import the app's modules (ml.*, main) the way uvicorn does, from Python/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    Run the app against an empty uploads/ tree in tmp_path, with pipelines on
+    the event loop's thread pool (ML_WORKERS=0) so requests share this process.
+    """
+    import main
+    from ml import pipelines
+    from ml.registry import DatasetRegistry
+    from ml.preprocess_cache import PreprocessCache
+
+    monkeypatch.setattr(pipelines, "ML_WORKERS", 0)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    registry, cache = DatasetRegistry(), PreprocessCache()
+    for module in (main, pipelines):
+        monkeypatch.setattr(module, "dataset_registry", registry)
+        monkeypatch.setattr(module, "preprocess_cache", cache)
+    return tmp_path
@@ -0,0 +1,36 @@
+# Python/tests/test_autoscale.py
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from ml import autoscale
+from ml.models import train_model
+
+def test_catalog_import_leaves_scalable_models_unloaded():
+    # A fresh interpreter: the estimators load with the first model that names them, not at startup
+    code = "import sys, ml.models; print('ml.approximate' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(autoscale.__file__)))
+    assert out.stdout.strip() == "False"
+
+def test_nystroem_base_is_abstract():
+    from ml.approximate import _NystroemSVM
+
+    with pytest.raises(TypeError):
+        _NystroemSVM()
+
+def test_substitution_is_reported(monkeypatch):
+    monkeypatch.setattr(autoscale, "GRADIENT_BOOSTING_MAX_ROWS", 50)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=200), "b": rng.normal(size=200)})
+    df["target"] = (df["a"] + df["b"] > 0).astype(int)
+    params = {"n_estimators": 10}
+
+    kept = train_model(df, "target", "classification", "gradient_boosting", params, evaluation="holdout", auto_scale=False)
+    assert kept["model_type"] == "gradient_boosting" and "auto_scale" not in kept
+
+    scaled = train_model(df, "target", "classification", "gradient_boosting", params, evaluation="holdout", auto_scale=True)
+    assert scaled["model_type"] == "hist_gradient_boosting"
+    assert scaled["auto_scale"]["requested"] == "gradient_boosting"
@@ -0,0 +1,38 @@
+# Python/tests/test_chunked.py
+import numpy as np
+import pandas as pd
+import pytest
+from ml.chunked import preprocess_chunked
+from ml.preprocess import preprocess_data
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(0)
+    rows = 500
+    df = pd.DataFrame({"a": rng.normal(size=rows), "b": rng.integers(0, 50, rows).astype(float),
+                       "c": rng.choice(["x", "y", "z"], rows).astype(object),
+                       "d": rng.choice(["p", "q", "r", "s"], rows).astype(object)})
+    for col, share in (("a", 0.1), ("b", 0.05), ("c", 0.1), ("d", 0.02)):
+        df.loc[rng.random(rows) < share, col] = np.nan
+    df["target"] = rng.normal(size=rows)
+    return df
+
+@pytest.mark.parametrize("encoding", ["onehot", "label"])
+@pytest.mark.parametrize("missing_strategy", ["mean", "median", "mode", "drop"])
+def test_chunked_matches_in_memory(tmp_path, df, missing_strategy, encoding):
+    expected = preprocess_data(df, missing_strategy=missing_strategy, encoding=encoding, target_column="target")
+    output = tmp_path / "out.csv"
+    chunks = lambda: (df.iloc[start:start + 120] for start in range(0, len(df), 120))
+    _, rows, _, _ = preprocess_chunked(chunks, str(output), missing_strategy=missing_strategy, encoding=encoding,
+                                       target_column="target")
+    actual = pd.read_csv(output)
+
+    assert rows == len(expected)
+    assert sorted(actual.columns) == sorted(expected.columns)
+    expected = expected.reset_index(drop=True)[actual.columns]
+    np.testing.assert_allclose(actual.to_numpy(dtype=np.float64), expected.to_numpy(dtype=np.float64), rtol=1e-9, atol=1e-9)
+
+@pytest.mark.parametrize("encoding", ["target", "kfold"])
+def test_target_encodings_are_rejected(tmp_path, df, encoding):
+    with pytest.raises(ValueError, match="Chunked preprocessing supports"):
+        preprocess_chunked(lambda: iter([df]), str(tmp_path / "out.csv"), encoding=encoding, target_column="target")
@@ -0,0 +1,21 @@
+# Python/tests/test_clustering.py
+import numpy as np
+import pandas as pd
+from ml import clustering
+from ml.models import train_model
+
+def blobs(rows):
+    rng = np.random.default_rng(0)
+    centers = rng.choice([-5.0, 0.0, 5.0], size=(rows, 1))
+    return pd.DataFrame(centers + rng.normal(size=(rows, 2)), columns=["a", "b"])
+
+def test_kmeans_above_threshold_trains_minibatch(monkeypatch):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    monkeypatch.setattr(clustering, "MINIBATCH_KMEANS_ROWS", 200)
+    # Without auto_scale: the threshold belongs to clustering training itself
+    small = train_model(blobs(200), None, "clustering", "kmeans", auto_scale=False)
+    large = train_model(blobs(400), None, "clustering", "kmeans", auto_scale=False)
+    assert small["model_type"] == "kmeans" and type(small["model"]) is KMeans
+    assert large["model_type"] == "minibatch_kmeans" and isinstance(large["model"], MiniBatchKMeans)
+    assert "auto_scale" not in large and "inertia" in large["results"]
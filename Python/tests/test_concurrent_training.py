@@ -0,0 +1,68 @@
+# Python/tests/test_concurrent_training.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_classification
+from ml.models import MODEL_CATALOG, ModelFactory, train_model
+
+# Different params per concurrent training: any shared estimator state would leak between them
+PARAMS = [{"n_estimators": 5 + i, "max_depth": 2 + i % 4, "random_state": i} for i in range(8)]
+
+@pytest.fixture(scope="module")
+def df():
+    X, y = make_classification(600, 8, n_informative=5, random_state=0)
+    df = pd.DataFrame(X, columns=[f"f{i}" for i in range(8)])
+    df["target"] = y
+    return df
+
+def fit(df, params, barrier=None):
+    if barrier is not None:
+        barrier.wait()
+    result = train_model(df, "target", "classification", "random_forest", params, evaluation="holdout", auto_scale=False)
+    model = result["model"]
+    return model, model.get_params(), result["results"]["accuracy"], model.predict(df.drop(columns="target"))
+
+def test_factory_builds_independent_estimators():
+    factory = ModelFactory(MODEL_CATALOG["classification"])
+    first = factory.create("random_forest", {"n_estimators": 3})
+    second = factory.create("random_forest")
+    assert first is not second
+    assert first.get_params()["n_estimators"] == 3
+    assert second.get_params()["n_estimators"] == 100
+
+def test_concurrent_trainings_are_isolated(df):
+    sequential = [fit(df, params) for params in PARAMS]
+    barrier = threading.Barrier(len(PARAMS))
+    with ThreadPoolExecutor(max_workers=len(PARAMS)) as pool:
+        concurrent = list(pool.map(lambda params: fit(df, params, barrier), PARAMS))
+
+    assert len({id(model) for model, *_ in concurrent}) == len(PARAMS)
+    for params, (_, seq_params, seq_accuracy, seq_pred), (_, con_params, con_accuracy, con_pred) in zip(PARAMS, sequential, concurrent):
+        assert {name: con_params[name] for name in params} == params
+        assert con_params == seq_params
+        assert con_accuracy == seq_accuracy
+        np.testing.assert_array_equal(con_pred, seq_pred)
+
+def test_concurrent_train_requests_are_isolated(df, workspace):
+    from fastapi.testclient import TestClient
+    import main
+
+    csv = df.to_csv(index=False).encode()
+
+    def post(i):
+        with TestClient(main.app) as client:
+            response = client.post("/train", files=[("files", (f"data{i}.csv", csv))],
+                                    data={"target_column": "target", "task_type": "classification", "model_type": "random_forest",
+                                          "evaluation": "holdout", "auto_scale": "false", "params": pd.Series(PARAMS[i]).to_json()})
+        assert response.status_code == 200
+        return response.json()[f"data{i}.csv"]
+
+    sequential = [post(i) for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        concurrent = list(pool.map(post, range(4)))
+    for seq, con in zip(sequential, concurrent):
+        assert "error" not in con
+        assert con["results"]["accuracy"] == seq["results"]["accuracy"]
+        assert con["feature_importance"] == seq["feature_importance"]
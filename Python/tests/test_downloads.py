@@ -0,0 +1,18 @@
+# Python/tests/test_downloads.py
+import pytest
+from ml import downloads
+from ml.downloads import negotiate_compression, COMPRESSIONS
+
+def test_gzip_is_always_negotiable():
+    assert negotiate_compression("gzip") == ("gzip", False)
+    assert negotiate_compression(accept_encoding="br, gzip;q=0.5") == ("gzip", True)
+
+def test_zstd_is_offered_only_when_installed():
+    if downloads.zstandard is None:
+        assert "zstd" not in COMPRESSIONS
+        assert negotiate_compression(accept_encoding="zstd, gzip;q=0.5") == ("gzip", True)
+        with pytest.raises(ValueError, match="zstandard"):
+            negotiate_compression("zstd")
+    else:
+        assert negotiate_compression("zstd") == ("zstd", False)
+        assert negotiate_compression(accept_encoding="zstd, gzip;q=0.5") == ("zstd", True)
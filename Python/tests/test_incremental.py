@@ -0,0 +1,53 @@
+# Python/tests/test_incremental.py
+import numpy as np
+import pandas as pd
+from ml.preprocess import preprocess_data
+from ml.pipelines import run_train, run_update
+
+def frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"a": rng.normal(size=rows), "b": rng.normal(10, 2, size=rows), "c": rng.choice(["x", "y"], rows)})
+    df["target"] = 3 * df["a"] - df["b"] + rng.normal(size=rows)
+    return df
+
+def test_partial_fit_keeps_scaler_and_weights_fills_by_column():
+    df = pd.DataFrame({"a": [1.0, 2.0, np.nan, np.nan], "b": [1.0, 2.0, 3.0, 4.0]})
+    _, fitted = preprocess_data(df, return_preprocessor=True)
+    scaler = fitted.scaler()
+    mean, scale = scaler.mean_.copy(), scaler.scale_.copy()
+
+    fitted.partial_fit(pd.DataFrame({"a": [6.0, np.nan], "b": [np.nan, 9.0]}))
+    # a: (1 + 2 + 6) / 3 over its non-null values, not the 4 rows seen
+    assert fitted.fill_values["a"] == 3.0
+    assert fitted.fill_values["b"] == (1 + 2 + 3 + 4 + 9) / 5
+    assert fitted.fill_counts == {"a": 3, "b": 5}
+    np.testing.assert_array_equal(scaler.mean_, mean)
+    np.testing.assert_array_equal(scaler.scale_, scale)
+
+def test_update_scores_the_same_holdout(workspace):
+    frame(400, 0).to_csv(workspace / "uploads" / "data.csv", index=False)
+    frame(200, 1).to_csv(workspace / "uploads" / "more.csv", index=False)
+    trained = run_train("data.csv", "uploads/data.csv", None, "target", "regression", "sgd", evaluation="holdout")
+    assert "error" not in trained
+    holdout = (workspace / "uploads" / "holdout_data.joblib").read_bytes()
+
+    first = run_update("data.csv", "more.csv", "uploads/more.csv", None)
+    second = run_update("data.csv", "more.csv", "uploads/more.csv", None)
+    assert "error" not in first and "error" not in second
+    assert first["update"]["rows_seen"] == 520 and second["update"]["rows_seen"] == 720
+    # The holdout is in the frozen feature space, so it isn't rewritten and scores carry over between updates
+    assert (workspace / "uploads" / "holdout_data.joblib").read_bytes() == holdout
+    assert second["results"]["holdout"]["before"] == first["results"]["holdout"]["after"]
+
+def test_speedup_is_measured_only_on_request(workspace):
+    frame(400, 0).to_csv(workspace / "uploads" / "data.csv", index=False)
+    frame(200, 1).to_csv(workspace / "uploads" / "more.csv", index=False)
+    assert "error" not in run_train("data.csv", "uploads/data.csv", "data-id", "target", "regression", "random_forest",
+                                    params={"n_estimators": 20}, evaluation="holdout")
+
+    plain = run_update("data.csv", "more.csv", "uploads/more.csv", None)
+    assert "speedup" not in plain["update"] and "full_retrain" not in plain["update"]
+
+    compared = run_update("data.csv", "more.csv", "uploads/more.csv", None, compare_retrain=True)
+    assert compared["update"]["full_retrain"]["rows"] == 600
+    assert compared["update"]["full_retrain"]["fit_seconds"] > 0 and compared["update"]["speedup"] > 0
@@ -0,0 +1,102 @@
+# Python/tests/test_insights.py
+import threading
+import time
+import pandas as pd
+import pytest
+from ml import utils
+from ml.utils import DatasetAnalyzer, InsightCache
+
+ANSWER = "- Looks clean\n\n2. classification\n\n3. label"
+
+class StubModel:
+    """generate_content stand-in: answers ANSWER, optionally after `release` is set, or raises."""
+
+    def __init__(self, release=None, error=None):
+        self.calls = 0
+        self.release = release
+        self.error = error
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return type("Response", (), {"text": ANSWER})()
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"x": [1.0, 2.0, 3.0, 4.0], "label": ["a", "b", "a", "b"]})
+
+def summary_of(df):
+    return {"columns": list(df.columns), "data_types": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "missing_values": {col: 0 for col in df.columns}}
+
+def test_answers_are_cached_by_summary(df):
+    model = StubModel()
+    analyzer = DatasetAnalyzer(model=model, cache=InsightCache())
+    first = analyzer.get_dataset_insights(summary_of(df), df)
+    second = analyzer.get_dataset_insights(summary_of(df), df)
+    assert model.calls == 1
+    assert first == second
+    assert first["suggested_task_type"] == "classification"
+    assert first["suggested_target_column"] == "label"
+
+def test_model_error_falls_back_to_manual_analysis(df):
+    analyzer = DatasetAnalyzer(model=StubModel(error=RuntimeError("quota")), cache=InsightCache())
+    result = analyzer.get_dataset_insights(summary_of(df), df)
+    assert result == analyzer._get_insights_manually(summary_of(df), df)
+
+def test_timeout_falls_back_and_late_answer_fills_cache(df):
+    release = threading.Event()
+    model = StubModel(release=release)
+    analyzer = DatasetAnalyzer(model=model, api_timeout=0.05, cache=InsightCache())
+    result = analyzer.get_dataset_insights(summary_of(df), df)
+    assert result == analyzer._get_insights_manually(summary_of(df), df)
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while analyzer._in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert analyzer.get_dataset_insights(summary_of(df), df)["suggested_task_type"] == "classification"
+    assert model.calls == 1
+
+def test_hung_calls_do_not_block_later_requests(df):
+    release = threading.Event()
+    model = StubModel(release=release)
+    analyzer = DatasetAnalyzer(model=model, api_timeout=0.05, cache=InsightCache())
+    try:
+        for i in range(utils.GEMINI_MAX_CALLS):
+            analyzer.get_dataset_insights({**summary_of(df), "columns": list(df.columns) + [f"c{i}"]}, df)
+        assert model.calls == utils.GEMINI_MAX_CALLS
+
+        # Every thread is held by a hung call: the next request falls back at once rather than waiting out its deadline
+        analyzer.api_timeout = 5
+        started = time.monotonic()
+        result = analyzer.get_dataset_insights(summary_of(df), df)
+        assert time.monotonic() - started < 1
+        assert model.calls == utils.GEMINI_MAX_CALLS
+        assert result == analyzer._get_insights_manually(summary_of(df), df)
+    finally:
+        release.set()
+
+def test_cache_is_safe_across_threads():
+    cache = InsightCache(maxsize=8, ttl=60)
+    errors = []
+
+    def hammer(worker):
+        try:
+            for i in range(2000):
+                key = f"{(worker + i) % 16}"
+                cache.put(key, {"i": i})
+                cache.get(f"{i % 16}")
+        except Exception as e:  # RuntimeError/KeyError from an unguarded OrderedDict
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache._entries) == 8
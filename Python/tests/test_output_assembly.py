@@ -0,0 +1,26 @@
+# Python/tests/test_output_assembly.py
+import numpy as np
+import pandas as pd
+import pytest
+from ml.preprocess import preprocess_data
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_string_target_keeps_features_in_one_float_block(sparse):
+    rng = np.random.default_rng(0)
+    rows = 2000
+    df = pd.DataFrame({f"num_{i}": rng.normal(size=rows) for i in range(8)})
+    df["city"] = rng.choice(["north", "south", "east", "west"], rows).astype(object)
+    df["label"] = rng.choice(["cat", "dog", "bird"], rows).astype(object)
+
+    processed = preprocess_data(df, target_column="label", sparse=sparse)
+    features = processed.drop(columns=["label"])
+    # No object feature columns: the string target is never stacked into the feature array
+    assert not any(dtype == object for dtype in features.dtypes)
+    assert processed["label"].dtype == df["label"].dtype
+    assert processed["label"].tolist() == df["label"].tolist()
+    if sparse:
+        assert all(isinstance(dtype, pd.SparseDtype) and dtype.subtype in (np.float32, np.float64) for dtype in features.dtypes)
+    else:
+        assert set(features.dtypes) <= {np.dtype(np.float32), np.dtype(np.float64)}
+        blocks = [block.dtype for block in processed._mgr.blocks if block.dtype.kind == "f"]
+        assert len(blocks) == 1
@@ -0,0 +1,93 @@
+# Python/tests/test_predict.py
+import asyncio
+import threading
+import time
+import httpx
+import pandas as pd
+from ml import serving
+from ml.serving import ModelPipeline, PipelineCache, save_pipeline, pipeline_path
+
+class IdentityPreprocessor:
+    def transform(self, df):
+        return df
+
+class SumModel:
+    def predict(self, X):
+        return X.sum(axis=1).to_numpy()
+
+def test_pipeline_load_does_not_block_other_requests(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    save_pipeline(ModelPipeline(IdentityPreprocessor(), SumModel(), "regression", "stub"), pipeline_path("data.csv"))
+    monkeypatch.setattr(main, "pipeline_cache", PipelineCache())
+    load = serving.joblib.load
+
+    def slow_load(path):
+        time.sleep(0.5)
+        return load(path)
+
+    monkeypatch.setattr(serving.joblib, "load", slow_load)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            finished = {}
+
+            async def timed(name, request):
+                response = await request
+                finished[name] = time.perf_counter()
+                return response
+
+            predict, health = await asyncio.gather(
+                timed("predict", client.post("/predict/data.csv", json=[{"a": 1, "b": 2}, {"a": 3, "b": 4}])),
+                timed("health", client.get("/health")),
+            )
+            return predict, health, finished
+
+    predict, health, finished = asyncio.run(run())
+    assert predict.status_code == 200 and health.status_code == 200
+    assert predict.json()["predictions"] == [3, 7]
+    assert predict.json()["cache_hit"] is False
+    # /health answered while the pipeline was still loading
+    assert finished["health"] < finished["predict"] - 0.3
+
+def test_concurrent_misses_load_once(tmp_path, monkeypatch):
+    path = save_pipeline(ModelPipeline(IdentityPreprocessor(), SumModel(), "regression", "stub"), str(tmp_path / "p.pkl"))
+    cache = PipelineCache()
+    loads = []
+    load = serving.joblib.load
+
+    def counting_load(file_path):
+        loads.append(file_path)
+        time.sleep(0.1)
+        return load(file_path)
+
+    monkeypatch.setattr(serving.joblib, "load", counting_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(path))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True]
+    assert len({id(pipeline) for pipeline, _ in results}) == 1
+
+def test_save_pipeline_replaces_the_file_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "pipeline.joblib")
+    save_pipeline(ModelPipeline(IdentityPreprocessor(), SumModel(), "regression", "old"), path)
+    dump = serving.joblib.dump
+    seen = []
+
+    def checked_dump(value, target):
+        dump(value, target)
+        # Mid-save, readers still get the complete previous pipeline
+        seen.append(serving.joblib.load(path).model_type)
+
+    monkeypatch.setattr(serving.joblib, "dump", checked_dump)
+    save_pipeline(ModelPipeline(IdentityPreprocessor(), SumModel(), "regression", "new"), path)
+    assert seen == ["old"]
+    assert serving.joblib.load(path).model_type == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["pipeline.joblib"]
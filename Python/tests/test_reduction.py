@@ -0,0 +1,23 @@
+# Python/tests/test_reduction.py
+import numpy as np
+import pandas as pd
+from ml import reduction
+from ml.models import train_model
+
+def frame(rows, columns):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(rows, columns)), columns=[f"f{i}" for i in range(columns)])
+
+def test_pca_scales_without_auto_scale(monkeypatch):
+    from sklearn.decomposition import IncrementalPCA
+
+    monkeypatch.setattr(reduction, "INCREMENTAL_PCA_ROWS", 300)
+    monkeypatch.setattr(reduction, "RANDOMIZED_PCA_FEATURES", 10)
+    plain = train_model(frame(300, 5), None, "dimensionality_reduction", "pca", auto_scale=False)
+    tall = train_model(frame(400, 5), None, "dimensionality_reduction", "pca", auto_scale=False)
+    wide = train_model(frame(300, 20), None, "dimensionality_reduction", "pca", auto_scale=False)
+
+    assert plain["model_type"] == "pca" and plain["model"].svd_solver == "auto"
+    assert tall["model_type"] == "incremental_pca" and isinstance(tall["model"], IncrementalPCA)
+    assert wide["model_type"] == "pca" and wide["model"].svd_solver == "randomized"
+    assert all("auto_scale" not in result for result in (plain, tall, wide))
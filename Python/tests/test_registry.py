@@ -0,0 +1,25 @@
+# Python/tests/test_registry.py
+import os
+import subprocess
+import sys
+import pandas as pd
+from ml.registry import DatasetRegistry
+from ml.preprocess_cache import PreprocessCache
+
+def test_registry_creates_its_root_on_first_use(tmp_path):
+    registry = DatasetRegistry(root=str(tmp_path / "datasets"))
+    assert not (tmp_path / "datasets").exists()
+    assert "missing" not in registry
+    registry.add_frame("abc", pd.DataFrame({"a": [1, 2]}), "data.csv")
+    assert "abc" in registry and registry.load("abc")["a"].tolist() == [1, 2]
+
+def test_preprocess_cache_creates_its_root_on_first_use(tmp_path):
+    cache = PreprocessCache(root=str(tmp_path / "cache"))
+    assert not (tmp_path / "cache").exists()
+    assert "missing" not in cache
+
+def test_importing_the_app_creates_no_directories(tmp_path):
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"import sys; sys.path.insert(0, {app_dir!r}); import main"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True, capture_output=True)
+    assert list(tmp_path.iterdir()) == []
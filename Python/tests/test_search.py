@@ -0,0 +1,46 @@
+# Python/tests/test_search.py
+import json
+import numpy as np
+import pandas as pd
+from ml.search import successive_halving, stratified_order
+
+def classification_frame(rows, seed=0, separable=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"a": rng.normal(size=rows), "b": rng.normal(size=rows)})
+    signal = df["a"] if separable else df["a"] + df["b"] + rng.normal(scale=0.5, size=rows)
+    df["target"] = np.where(signal > 0, "yes", "no")
+    return df
+
+def test_failing_configuration_is_recorded_and_search_continues():
+    # lbfgs rejects penalty='l1'
+    space = {"penalty": ["l1", "l2"], "C": [0.1, 1.0]}
+    best, search = successive_halving(classification_frame(300), "target", "classification", "logistic_regression",
+                                      space=space, n_jobs=1)
+    failed = [trial for trial in search["trials"] if trial["status"] == "failed"]
+    assert len(failed) == 2 and all(trial["penalty"] == "l1" for trial in (t["params"] for t in failed))
+    assert all(trial["score"] is None and "l1" in trial["error"] for trial in failed)
+    assert best["penalty"] == "l2" and search["best_score"] is not None
+    json.dumps(search, allow_nan=False)
+
+def test_budget_stops():
+    df = classification_frame(300)
+    _, by_fits = successive_halving(df, "target", "classification", "decision_tree", n_candidates=8, max_fits=3, n_jobs=1)
+    assert by_fits["fits"] == 3 and by_fits["stopped"] == "max_fits"
+    # The first batch always runs; nothing after it once the budget is spent
+    _, by_time = successive_halving(df, "target", "classification", "decision_tree", n_candidates=8, time_budget=0, n_jobs=1)
+    assert by_time["fits"] == 1 and by_time["stopped"] == "time_budget"
+
+def test_plateau_stops_before_the_last_round():
+    # One threshold on one feature: every tree is already perfect on the first rows
+    space = {"min_samples_leaf": [1, 2, 3, 4, 5, 6, 7, 8]}
+    _, search = successive_halving(classification_frame(3000, separable=True), "target", "classification", "decision_tree",
+                                   space=space, factor=2, n_jobs=1)
+    assert search["stopped"] == "plateau"
+    assert max(trial["round"] for trial in search["trials"]) < 3
+
+def test_stratified_order_keeps_both_classes_in_small_prefixes():
+    y = np.array(["no"] * 95 + ["yes"] * 5)
+    order = stratified_order(y)
+    assert sorted(order) == list(range(100))
+    assert set(y[order[:2]]) == {"no", "yes"}
+    assert (y[order[:40]] == "yes").sum() == 2
@@ -0,0 +1,32 @@
+# Python/tests/test_target_encoding.py
+import numpy as np
+import pandas as pd
+import pytest
+from ml.preprocess import preprocess_data, kfold_target_encode_columns
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"city": rng.choice(["a", "b", "c"], 300), "x": rng.normal(size=300),
+                       "churn": rng.choice(["no", "yes"], 300)})
+    df.loc[df.city == "a", "churn"] = "yes"
+    return df
+
+@pytest.mark.parametrize("encoding", ["kfold", "target"])
+def test_two_class_string_target_encodes_share_of_later_class(df, encoding):
+    _, preprocessor = preprocess_data(df, encoding=encoding, target_column="churn", return_preprocessor=True)
+    means, prior = preprocessor.encoders["city"]
+    share = (df.churn == "yes").groupby(df.city).mean()
+    assert means == pytest.approx(share.to_dict())
+    assert prior == pytest.approx((df.churn == "yes").mean())
+
+def test_kfold_string_target_matches_numeric_target(df):
+    numeric = df.assign(churn=(df.churn == "yes").astype(int))
+    encoded, _ = kfold_target_encode_columns(df, ["city"], "churn")
+    expected, _ = kfold_target_encode_columns(numeric, ["city"], "churn")
+    np.testing.assert_allclose(encoded["city"], expected["city"])
+
+def test_multiclass_string_target_is_rejected(df):
+    df["churn"] = np.resize(["low", "mid", "high"], len(df))
+    with pytest.raises(ValueError, match="numeric or two-class target"):
+        preprocess_data(df, encoding="kfold", target_column="churn", return_preprocessor=True)
@@ -0,0 +1,51 @@
+# Python/tests/test_train_endpoint.py
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from ml.models import MODEL_CATALOG
+from ml.pipelines import run_train
+
+@pytest.fixture(scope="module")
+def csv():
+    # Quarter steps and small ints: compact ingest keeps every feature float32-exact, so the design matrix is float32
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.integers(-20, 20, 300), "b": np.round(rng.normal(size=300) * 4) / 4,
+                       "c": rng.choice(["x", "y", "z"], 300)})
+    df["target"] = 2 * df["a"] - df["b"] + (df["c"] == "x") + rng.normal(size=300)
+    return df.to_csv(index=False).encode()
+
+@pytest.mark.parametrize("model_type", sorted(MODEL_CATALOG["regression"]))
+def test_regression_results_are_plain_json(workspace, csv, model_type):
+    (workspace / "uploads" / "data.csv").write_bytes(csv)
+    result = run_train("data.csv", "uploads/data.csv", None, "target", "regression", model_type,
+                       evaluation="holdout", auto_scale=False)
+    assert "error" not in result
+    # Strict encoding, as JSONResponse does it: no numpy scalars, no NaN
+    json.dumps(result, allow_nan=False)
+    assert all(type(value) is float for _, value in result["feature_importance"])
+
+def test_train_endpoint_regression_batch(workspace, csv):
+    import main
+
+    files = [("files", (f"data{i}.csv", csv)) for i in range(2)]
+    with TestClient(main.app) as client:
+        for model_type in ("linear_regression", "ridge", "lasso", "sgd"):
+            response = client.post("/train", files=files, data={"target_column": "target", "task_type": "regression",
+                                                                "model_type": model_type, "evaluation": "holdout"})
+            assert response.status_code == 200, response.text
+            for name, result in response.json().items():
+                assert "error" not in result, (model_type, name, result)
+                assert result["results"]["r2_score"] > 0.5
+
+def test_progress_stages_follow_the_work(workspace, csv):
+    (workspace / "uploads" / "data.csv").write_bytes(csv)
+    stages = []
+    for _ in range(2):
+        stages.append([])
+        result = run_train("data.csv", "uploads/data.csv", "data-id", "target", "regression", "ridge",
+                           evaluation="both", progress=stages[-1].append)
+        assert "error" not in result
+    # The second run hits the preprocessing cache, so nothing is preprocessed
+    assert stages == [["load", "preprocess", "fit", "evaluate", "save"], ["load", "fit", "evaluate", "save"]]